@@ -1,91 +1,435 @@
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, g, jsonify, request, send_file, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from flask_jwt_extended import JWTManager
 import os
+import re
 import json
+import hmac
 import hashlib
 import secrets
 import base64
-from datetime import datetime
+import time
+import multiprocessing
+import threading
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+from functools import wraps
+from bisect import bisect_right
+from itertools import islice
+from datetime import datetime, timedelta
+from config import Config
+from predictors import (SimpleCriminalPredictor, SimpleCrimeTypePredictor, PRIOR_CONVICTIONS, encode_features,
+                        recidivism_risk_batch,
+                        load_model, train_models as run_training)
+from biometrics import FaceEmbedder, FaceIndex, FingerprintIndex, extract_minutiae, encode_template
+from caching import ResponseCache, make_etag
+from changes import ChangeBus, StaleVersion
+from dedup import DEDUP_FIELDS, run_dedup
+from bulk import FORMATS, parse_format, read_frames, validate_frame, write_chunks
+from geo import Gazetteer, GeoIndex, radius_bboxes, valid_point
+from lazy import Warmup
+from media import MediaStore
+from metrics import Metrics, SamplingProfiler
+from scan_jobs import QueueFull, ScanQueue
+from search import SearchIndex
+from sessions import SessionManager
+from trends import DIMENSIONS, GRANULARITIES, TrendRollups, bucket_labels, bucket_of, parse_time
+from storage import (LogStorage, CriminalStore, CriminalStats, UserStore, JobStore, SORTABLE_FIELDS, encode_cursor,
+                     decode_cursor, index_key)
 
 app = Flask(__name__)
-CORS(app, resources={r"/api/*": {"origins": ["http://127.0.0.1:5500", "http://localhost:5500"]}})
+CORS(app, resources={r"/api/*": {"origins": ["http://127.0.0.1:5500", "http://localhost:5500"]}},
+     expose_headers=['X-Next-Cursor', 'X-Change-Version', 'ETag', 'Content-Range', 'Accept-Ranges'])
 
 # ========== CONFIGURATION ==========
 app.config['SECRET_KEY'] = 'criminal-system-2024'
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['DATABASE_FILE'] = 'criminals.json'
+app.config['USERS_FILE'] = 'users.json'
+app.config['REVOKED_TOKENS_FILE'] = 'revoked_tokens.log'
+app.config['JWT_SECRET_KEY'] = Config.JWT_SECRET_KEY
+jwt = JWTManager(app)
 
 # Create directories
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs('ml_models', exist_ok=True)
 
-# ========== SIMPLE AI MODELS ==========
-class SimpleCriminalPredictor:
-    def predict(self, features):
-        prior_convictions = features.get('prior_convictions', 0)
-        crime_severity = features.get('crime_severity', 'Medium')
-        
-        if prior_convictions >= 3 or crime_severity == 'High':
-            return 'High'
-        elif prior_convictions >= 1 or crime_severity == 'Medium':
-            return 'Medium'
-        else:
-            return 'Low'
+# ========== INSTRUMENTATION ==========
+# Per-route latency, status and in-flight counts from request hooks that are
+# registered first, so the latency covers every other hook too. Hot internal
+# sections are timed with metrics.timer(<section>). Exposed on /metrics.
+metrics = Metrics()
+request_latency = metrics.histogram('http_request_duration_seconds', 'Request latency until the response is returned',
+                                    ('method', 'route'))
+request_count = metrics.counter('http_requests_total', 'Requests served', ('method', 'route', 'status'))
+requests_in_flight = metrics.gauge('http_requests_in_flight', 'Requests being served', ('route',))
+instrumentation_seconds = metrics.counter('app_instrumentation_seconds_total',
+                                          'Time spent in the instrumentation hooks themselves')
+request_threads = set()
+profiler = SamplingProfiler(Config.PROFILER_INTERVAL, threads=lambda: request_threads)
 
-class SimpleCrimeTypePredictor:
-    def predict(self, features):
-        age = features.get('age', 30)
-        prior_convictions = features.get('prior_convictions', 0)
-        
-        # Simple age-based prediction
-        if age < 25:
-            return 'Theft'
-        elif age < 35:
-            return 'Assault'
-        elif age < 50:
-            return 'Fraud'
-        else:
-            return 'Drug Offense'
+class TimedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        with metrics.timer('json_serialization'):
+            return super().dumps(obj, **kwargs)
+
+app.json = TimedJSONProvider(app)
+
+@app.before_request
+def start_request_metrics():
+    # Proxy lookups cost about a microsecond each, so the request object is
+    # resolved once and the start time rides along in its WSGI environ. The
+    # route template, not the path, keeps label cardinality bounded.
+    started = time.perf_counter()
+    req = request._get_current_object()
+    route = req.url_rule.rule if req.url_rule is not None else 'unmatched'
+    req.environ['metrics.request'] = (started, route)
+    requests_in_flight.inc(route)
+    request_threads.add(threading.get_ident())
+    instrumentation_seconds.inc(amount=time.perf_counter() - started)
 
-# Initialize predictors
+def finish_request_metrics(status):
+    finished = time.perf_counter()
+    req = request._get_current_object()
+    state = req.environ.pop('metrics.request', None)
+    if state is None:
+        return
+    started, route = state
+    request_latency.observe(finished - started, req.method, route)
+    request_count.inc(req.method, route, status)
+    requests_in_flight.dec(route)
+    request_threads.discard(threading.get_ident())
+    instrumentation_seconds.inc(amount=time.perf_counter() - finished)
+
+@app.after_request
+def record_request_metrics(response):
+    finish_request_metrics(response.status_code)
+    return response
+
+@app.teardown_request
+def record_failed_request_metrics(error):
+    # Requests whose after_request hooks never ran, e.g. a view exception
+    # propagated in debug or testing mode
+    finish_request_metrics(500)
+
+if Config.PROFILER_ENABLED:
+    profiler.start()
+
+# ========== AI MODELS ==========
+# Initialize predictors; trained models replace these once available
 decision_tree_predictor = SimpleCriminalPredictor()
 naive_bayes_predictor = SimpleCrimeTypePredictor()
+models_stamp = None
+
+def model_stamp():
+    try:
+        return os.stat(Config.DECISION_TREE_MODEL).st_mtime_ns, os.stat(Config.NAIVE_BAYES_MODEL).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def load_models(decision_tree_path=Config.DECISION_TREE_MODEL, naive_bayes_path=Config.NAIVE_BAYES_MODEL):
+    # Rebinding the module globals is atomic, so in-flight requests keep the
+    # model they already fetched and new requests see the new one
+    global decision_tree_predictor, naive_bayes_predictor, models_stamp
+    try:
+        models_stamp = model_stamp()
+        if os.path.exists(decision_tree_path) and os.path.exists(naive_bayes_path):
+            decision_tree = load_model(decision_tree_path)
+            naive_bayes = load_model(naive_bayes_path)
+            decision_tree_predictor, naive_bayes_predictor = decision_tree, naive_bayes
+            print(f"✓ Loaded trained models (version {decision_tree.version})")
+    except Exception as e:
+        print(f"✗ Error loading models: {e}")
 
 # ========== DATA STORAGE ==========
-users = {}
-criminals = []
-next_criminal_id = 1
+fingerprint_index = FingerprintIndex(candidates=Config.FINGERPRINT_CANDIDATES)
+search_index = SearchIndex(
+    fuzzy_candidates=Config.SEARCH_FUZZY_CANDIDATES,
+    max_expansions=Config.SEARCH_MAX_EXPANSIONS
+)
+gazetteer = Gazetteer(Config.GAZETTEER_FILE)
+geo_index = GeoIndex(gazetteer, cell_degrees=Config.GEO_CELL_DEGREES)
+trends = TrendRollups()
+
+if Config.STORAGE_BACKEND == 'sql':
+    # Shared database through the models.py tables; the database serializes
+    # writers and allocates ids
+    from sql_storage import configure_database, SQLCriminalStore, SQLUserStore
+    configure_database(app, Config)
+    users = SQLUserStore(app)
+    stats = CriminalStats()
+    criminals = SQLCriminalStore(app, listeners=[stats, fingerprint_index, search_index, geo_index, trends],
+                                 change_log_size=Config.SQL_CHANGE_LOG_SIZE)
+    storage = None
+else:
+    # Shared files: writers serialize on a lock file and every worker tails
+    # the log to pick up the others' changes
+    users = UserStore(app.config['USERS_FILE'])
+    stats = CriminalStats()
+    # The trend rollups are saved in the binary snapshot and come back with it
+    criminals = CriminalStore(listeners=[stats, fingerprint_index, search_index, geo_index, trends])
+    storage = LogStorage(app.config['DATABASE_FILE'], criminals)
+
+# ========== BIOMETRIC INDEXES ==========
+face_embedder = FaceEmbedder(Config.FACE_EMBEDDING_MODEL)
+face_index = FaceIndex(
+    Config.FACE_INDEX_PATH,
+    face_embedder.dim,
+    ann_threshold=Config.FACE_ANN_THRESHOLD,
+    nprobe=Config.FACE_ANN_NPROBE
+)
+
+# ========== PHOTO STORAGE ==========
+media = MediaStore(
+    app.config['UPLOAD_FOLDER'],
+    thumbnail_sizes=Config.THUMBNAIL_SIZES,
+    crop_face=face_embedder.crop_face,
+    workers=Config.MEDIA_WORKERS,
+    chunk_size=Config.UPLOAD_CHUNK_SIZE
+)
+
+def photo_expiry():
+    # Rounded up to whole PHOTO_URL_TTL windows, so a URL stays the same (and
+    # browser-cacheable) for a window and is valid for at least one more
+    return (int(time.time()) // Config.PHOTO_URL_TTL + 2) * Config.PHOTO_URL_TTL
+
+def photo_signature(photo_hash, variant, size, expires):
+    message = f"{photo_hash}:{variant}:{size if variant == 'thumb' else ''}:{expires}".encode()
+    return hmac.new(Config.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()[:32]
+
+def photo_url(criminal, variant='thumb', size=Config.THUMBNAIL_SIZES[0]):
+    # Signed, so the URL works as an <img src>, which carries no bearer
+    # token. Records enrolled before content-addressed storage have no
+    # photo_hash.
+    photo_hash = criminal.get('photo_hash')
+    if not photo_hash:
+        return None
+    expires = photo_expiry()
+    signature = photo_signature(photo_hash, variant, size, expires)
+    if variant == 'thumb':
+        return f"/api/photos/{photo_hash}?variant=thumb&size={size}&expires={expires}&sig={signature}"
+    return f"/api/photos/{photo_hash}?variant={variant}&expires={expires}&sig={signature}"
+
+def signed_photo_request():
+    # Whether this GET /api/photos/<hash> carries a valid, unexpired signature
+    expires = request.args.get('expires', type=int)
+    if expires is None or expires < time.time():
+        return False
+    variant = request.args.get('variant', 'original')
+    size = request.args.get('size', Config.THUMBNAIL_SIZES[0], type=int)
+    expected = photo_signature(request.view_args['photo_hash'], variant, size, expires)
+    return secrets.compare_digest(request.args.get('sig', ''), expected)
+
+def geocode(record):
+    # Coordinates for last_known_location from the local gazetteer, unless
+    # the record already carries them
+    if not valid_point(record.get('latitude'), record.get('longitude')):
+        point = gazetteer.lookup(record.get('last_known_location'))
+        record['latitude'], record['longitude'] = point if point is not None else (None, None)
+    return record
+
+def sync_face_index(progress=None):
+    # Enroll photos that have no embedding yet and drop faces of deleted records
+    for criminal_id in [i for i in face_index.record_ids() if i not in criminals]:
+        face_index.remove(criminal_id)
+    photos = [(row['id'], row['photo_path']) for row in criminals.project(('id', 'photo_path')) if row['photo_path']]
+    for done, (criminal_id, photo_path) in enumerate(photos, 1):
+        if criminal_id not in face_index and os.path.exists(photo_path):
+            try:
+                with open(photo_path, 'rb') as f:
+                    face_index.add(criminal_id, face_embedder.embed(f.read()))
+            except Exception as e:
+                print(f"✗ Could not index face for criminal {criminal_id}: {e}")
+        if progress is not None:
+            progress(done, len(photos))
 
 # ========== DATA MANAGEMENT ==========
-def load_data():
-    global criminals, next_criminal_id
+def load_data(background=False):
+    # With background=True the store's listeners (stats, search, geo and
+    # fingerprint indexes) and the face index are left to the warm-up
     try:
-        if os.path.exists(app.config['DATABASE_FILE']):
-            with open(app.config['DATABASE_FILE'], 'r') as f:
-                data = json.load(f)
-                criminals = data.get('criminals', [])
-                if criminals:
-                    next_criminal_id = max(c['id'] for c in criminals) + 1
-                print(f"✓ Loaded {len(criminals)} criminals from database")
+        if storage is not None:
+            storage.load(defer_listeners=background)
+        else:
+            # The SQL backend reads its tables directly and only warms indexes
+            criminals.load(None)
+        print(f"✓ Loaded {len(criminals)} criminals from database")
+        if not background:
+            sync_face_index()
+            print(f"✓ Indexed {len(face_index)} faces")
     except Exception as e:
         print(f"✗ Error loading data: {e}")
 
-def save_data():
+def save_data(criminal=None, deleted_id=None, records=None):
+    # Appends mutations to the storage log (`records` as one batched write);
+    # callers update `criminals` first so a concurrent compaction never
+    # misses them. The SQL backend has already committed by the time this
+    # is called.
+    if storage is None:
+        return
     try:
-        data = {
-            'criminals': criminals,
-            'last_updated': datetime.now().isoformat()
-        }
-        with open(app.config['DATABASE_FILE'], 'w') as f:
-            json.dump(data, f, indent=2)
+        with metrics.timer('save_data'):
+            if criminal is not None:
+                storage.put(criminal)
+            if records:
+                storage.put_many(records)
+            if deleted_id is not None:
+                storage.delete(deleted_id)
     except Exception as e:
         print(f"✗ Error saving data: {e}")
 
-# ========== PASSWORD HASHING ==========
-def hash_password(password, salt=None):
-    if salt is None:
-        salt = secrets.token_hex(16)
-    return hashlib.sha256((password + salt).encode()).hexdigest(), salt
+# ========== CHANGE FEED ==========
+# Mutations made through this worker are published by the routes below;
+# the storage log (or the SQL change log) reports those of other workers
+changes = ChangeBus(Config.CHANGES_BUFFER)
+
+def publish_remote_change(entry):
+    if entry['op'] == 'put':
+        changes.publish('put', entry['record']['id'], entry['record'])
+    elif entry['op'] == 'delete':
+        changes.publish('delete', entry['id'])
+    elif entry['op'] == 'reload':
+        changes.reset()
+
+if storage is not None:
+    storage.on_remote_change = publish_remote_change
+else:
+    criminals.on_remote_change = publish_remote_change
+
+# ========== STARTUP WARM-UP ==========
+# initialize() loads the data (from the binary snapshot when there is one)
+# before the server starts, then warms the rest on a background thread.
+# Routes that need a step that is still warming answer 503 + Retry-After.
+warmup = Warmup()
+
+def warm_data(progress):
+    load_data(background=True)
+
+def warm_indexes(progress):
+    # The SQL store fills its listeners in load()
+    if storage is not None:
+        restored = criminals.is_warm(trends)
+        criminals.warm_listeners(Config.WARMUP_CHUNK_SIZE, progress)
+        if not restored:
+            # Save the trend rollups so the next start does not rebuild them
+            storage.save_binary()
+
+def warm_faces(progress):
+    sync_face_index(progress)
+    print(f"✓ Indexed {len(face_index)} faces")
+    face_embedder.warm()
+
+def warm_models(progress):
+    load_models()
+
+warmup.add('data', warm_data)
+warmup.add('indexes', warm_indexes)
+warmup.add('faces', warm_faces)
+warmup.add('models', warm_models)
+
+def warming_response(*steps):
+    # 503 while any of the warm-up steps is still running, else None
+    if warmup.ready(*steps):
+        return None
+    response = jsonify({'error': 'Warming up, try again shortly', 'warmup': warmup.status()})
+    response.headers['Retry-After'] = str(Config.WARMUP_RETRY_AFTER)
+    response.status_code = 503
+    return response
+
+def requires_warm(*steps):
+    def decorate(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            return warming_response(*steps) or view(*args, **kwargs)
+        return wrapper
+    return decorate
+
+# ========== RESPONSE CACHE ==========
+response_cache = ResponseCache(Config.RESPONSE_CACHE_BYTES)
+CACHED_HEADERS = ('X-Next-Cursor', 'X-Change-Version')
+
+def data_version():
+    # Changes with every add/delete in any worker; read after sync_shared_state()
+    return storage.version if storage is not None else criminals.version
+
+def cached_json(view):
+    # Conditional GET for views whose output depends only on the request and
+    # the criminal data: a matching If-None-Match gets a 304 without running
+    # the view, and serialized 200 bodies are reused until the data changes
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Bodies hold signed photo URLs, so they are also renewed with the expiry
+        key = (request.endpoint, request.query_string, tuple(sorted(kwargs.items())), data_version(), photo_expiry())
+        etag = make_etag(*key)
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            cached = response_cache.get(key)
+            if cached is not None:
+                body, headers = cached
+                response = Response(body, mimetype='application/json', headers=headers)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+                response_cache.put(key, response.get_data(), headers)
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
+
+# ========== SESSIONS ==========
+sessions = SessionManager(
+    app.config['REVOKED_TOKENS_FILE'],
+    ttl=Config.SESSION_TTL,
+    cache_size=Config.SESSION_CACHE_SIZE
+)
+
+def write_lock():
+    # Held around read-modify-write of `criminals` so id allocation and the
+    # log append see every other worker's writes
+    return storage.transaction() if storage is not None else nullcontext()
+
+def sync_records():
+    # Apply record changes made by other worker processes; they reach the
+    # change feed through publish_remote_change
+    if storage is not None:
+        storage.sync()
+    else:
+        criminals.sync()
+
+@app.before_request
+def sync_shared_state():
+    # Apply changes made by other worker processes since the last request
+    try:
+        sync_records()
+        sessions.sync()
+        # The warm-up loads the models the first time
+        if warmup.ready('models') and model_stamp() != models_stamp:
+            load_models()
+    except Exception as e:
+        print(f"✗ Error syncing shared state: {e}")
+
+PUBLIC_ENDPOINTS = {'home', 'test', 'register', 'login', 'static', 'get_metrics', 'ready'}
+
+@app.before_request
+def authenticate_request():
+    # Every route except PUBLIC_ENDPOINTS needs a valid session token;
+    # its claims are available to the route as g.user
+    if request.method == 'OPTIONS' or request.endpoint is None or request.endpoint in PUBLIC_ENDPOINTS:
+        return None
+    if request.endpoint == 'get_photo' and signed_photo_request():
+        return None
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    claims = sessions.verify(token) if token else None
+    if claims is None:
+        return jsonify({'error': 'Unauthorized'}), 401
+    g.user = claims
 
 # ========== API ROUTES ==========
 
@@ -96,12 +440,29 @@ def home():
         'version': '1.0',
         'endpoints': [
             '/api/test - System test',
+            '/api/ready - Readiness and warm-up progress',
             '/api/login - User login',
+            '/api/logout - Revoke the current session',
             '/api/register - User registration',
             '/api/criminals - Criminal database',
+            '/api/criminals/search - Ranked, typo-tolerant name/location search',
+            '/api/criminals/nearby - Radius, bounding-box and hotspot queries',
+            '/api/criminals/import - Bulk import (CSV, NDJSON, Parquet)',
+            '/api/criminals/export - Bulk export (CSV, NDJSON, Parquet)',
+            '/api/changes?since=<version> - Record changes (JSON, or SSE with Accept: text/event-stream)',
+            '/api/photos/<hash> - Photos and thumbnails (ETag, Range)',
             '/api/predict - AI prediction',
+            '/api/predict/batch - Batch AI prediction (JSON array or NDJSON)',
+            '/api/train-models - Train models in the background',
+            '/api/analytics/trends - Counts over time by crime type, severity, location or danger level',
+            '/api/dedup - Find duplicate records in the background',
+            '/api/dedup/suggestions - Merge suggestions from the last duplicate search',
             '/api/scan/face - Face scanning',
-            '/api/scan/fingerprint - Fingerprint scanning'
+            '/api/scan/fingerprint - Fingerprint scanning',
+            '/api/scan/<face|fingerprint>/jobs - Queue a scan (202 + job id)',
+            '/api/scan/jobs/<id>?wait=<seconds> - Poll or long-poll a scan job',
+            '/metrics - Prometheus metrics',
+            '/api/profiler - Sampling profiler (admin)'
         ]
     })
 
@@ -131,13 +492,12 @@ def register():
         if username in users:
             return jsonify({'error': 'Username already exists'}), 400
         
-        password_hash, salt = hash_password(password)
-        users[username] = {
-            'password_hash': password_hash,
-            'salt': salt,
-            'special_code': data.get('special_code'),
-            'role': 'admin' if data.get('special_code') else 'investigator'
-        }
+        users.add(
+            username,
+            password,
+            special_code=data.get('special_code'),
+            role='admin' if data.get('special_code') else 'investigator'
+        )
         
         return jsonify({'message': '✅ User registered successfully'})
     except Exception as e:
@@ -150,13 +510,8 @@ def login():
         username = data.get('username')
         password = data.get('password')
         
-        if username not in users:
-            return jsonify({'error': 'Invalid credentials'}), 401
-        
-        user = users[username]
-        input_hash, _ = hash_password(password, user['salt'])
-        
-        if input_hash != user['password_hash']:
+        user = users.authenticate(username, password)
+        if user is None:
             return jsonify({'error': 'Invalid credentials'}), 401
         
         # Check special code if provided
@@ -164,70 +519,315 @@ def login():
         if special_code and user.get('special_code') != special_code:
             return jsonify({'error': 'Invalid special code'}), 401
         
-        # Create simple token
-        token = hashlib.sha256(f"{username}{secrets.token_hex(8)}".encode()).hexdigest()
+        # Signed session token, verified by authenticate_request()
+        token = sessions.issue(user)
         
         return jsonify({
             'access_token': token,
-            'user_id': 1,
+            'expires_in': sessions.ttl,
+            'user_id': user.get('id', 1),
             'username': username,
             'role': user.get('role', 'investigator')
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/logout', methods=['POST'])
+def logout():
+    try:
+        sessions.revoke(g.user)
+        return jsonify({'message': '✅ Logged out successfully'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # ========== CRIMINAL DATABASE ==========
+LIST_FIELDS = ['id', 'name', 'age', 'crime_type', 'status', 'danger_level', 'thumbnail_url']
+LIST_DEFAULTS = {'name': 'Unknown', 'status': 'Wanted', 'danger_level': 'Medium'}
+# Projected fields computed from the record rather than stored on it
+LIST_COMPUTED = {'thumbnail_url': photo_url}
+LIST_FILTERS = {
+    'status': 'status',
+    'danger_level': 'danger_level',
+    'crime_type': 'crime_type',
+    'crime_severity': 'crime_severity',
+    'location': 'last_known_location'
+}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def list_item(criminal, fields):
+    return {
+        field: LIST_COMPUTED[field](criminal) if field in LIST_COMPUTED
+        else criminal.get(field, LIST_DEFAULTS.get(field))
+        for field in fields
+    }
+
 @app.route('/api/criminals', methods=['GET'])
+@cached_json
 def get_criminals():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    if not token:
-        return jsonify({'error': 'Unauthorized'}), 401
+    # Query parameters:
+    #   status, danger_level, crime_type, crime_severity, location - exact match
+    #   age_min, age_max - inclusive age range
+    #   sort (one of SORTABLE_FIELDS), order=asc|desc
+    #   fields - comma-separated projection, defaults to LIST_FIELDS
+    #   limit, cursor - keyset pagination; the next cursor is in X-Next-Cursor
+    # X-Change-Version is where to start following /api/changes from
+    args = request.args
+    filters = {field: args[param] for param, field in LIST_FILTERS.items() if args.get(param)}
+    age_range = (args.get('age_min', type=int), args.get('age_max', type=int))
+    sort = args.get('sort', 'id')
+    if sort not in SORTABLE_FIELDS:
+        return jsonify({'error': f'Cannot sort by {sort}'}), 400
+    limit = max(1, min(args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    fields = [f for f in args.get('fields', '').split(',') if f] or LIST_FIELDS
+    # Read before the query: replaying changes the page already reflects is harmless
+    version = changes.version
     
-    # Return basic criminal info
-    criminal_list = []
-    for c in criminals:
-        criminal_list.append({
-            'id': c['id'],
-            'name': c.get('name', 'Unknown'),
-            'age': c.get('age'),
-            'crime_type': c.get('crime_type'),
-            'status': c.get('status', 'Wanted'),
-            'danger_level': c.get('danger_level', 'Medium'),
-            'photo_path': c.get('photo_path')
-        })
+    try:
+        after = decode_cursor(args['cursor']) if args.get('cursor') else None
+        page, next_key = criminals.query(
+            filters=filters,
+            age_range=age_range,
+            sort=sort,
+            descending=args.get('order') == 'desc',
+            after=after,
+            limit=limit
+        )
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    # Return basic criminal info for this page only
+    response = jsonify([list_item(c, fields) for c in page])
+    response.headers['X-Change-Version'] = version
+    if next_key is not None:
+        response.headers['X-Next-Cursor'] = encode_cursor(next_key)
+    return response
+
+@app.route('/api/criminals/search', methods=['GET'])
+@requires_warm('indexes')
+@cached_json
+def search_criminals():
+    # Query parameters:
+    #   q - words matched against name, crime_type, last_known_location and
+    #       scars_marks; misspellings match unless fuzzy=0
+    #   limit - best matches returned, highest score first
+    #   fields - comma-separated projection, defaults to LIST_FIELDS
+    args = request.args
+    query = args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Search query (q) required'}), 400
+    limit = max(1, min(args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    fields = [f for f in args.get('fields', '').split(',') if f] or LIST_FIELDS
+    fuzzy = args.get('fuzzy', '1') not in ('0', 'false')
+    
+    ids, scores = search_index.search(query, limit=limit, fuzzy=fuzzy)
+    results = []
+    for criminal_id, score in zip(ids, scores):
+        c = criminals.get(criminal_id)
+        if c is None:
+            continue
+        result = list_item(c, fields)
+        result['score'] = round(score, 3)
+        results.append(result)
+    
+    return jsonify({'query': query, 'results': results, 'total_results': len(results)})
+
+def parse_bbox(value):
+    # "min_lat,min_lon,max_lat,max_lon"
+    try:
+        bbox = tuple(float(part) for part in value.split(','))
+    except ValueError:
+        bbox = ()
+    if len(bbox) != 4 or not (valid_point(*bbox[:2]) and valid_point(*bbox[2:])) or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        raise ValueError('bbox must be min_lat,min_lon,max_lat,max_lon')
+    return bbox
+
+@app.route('/api/criminals/nearby', methods=['GET'])
+@requires_warm('indexes')
+@cached_json
+def nearby_criminals():
+    # Query parameters:
+    #   lat, lon, radius_km - records within the circle, nearest first
+    #   bbox=min_lat,min_lon,max_lat,max_lon - records inside the box
+    #   hotspots=1 - counts per heatmap cell over the area (whole map if
+    #                none) instead of records; cell=size in degrees
+    #   limit, fields - as for GET /api/criminals
+    args = request.args
+    limit = max(1, min(args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    fields = [f for f in args.get('fields', '').split(',') if f] or LIST_FIELDS
+    lat, lon = args.get('lat', type=float), args.get('lon', type=float)
+    radius_km = args.get('radius_km', type=float)
+    
+    try:
+        bbox = parse_bbox(args['bbox']) if args.get('bbox') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if bbox is None and (lat is not None or lon is not None or radius_km is not None):
+        if not valid_point(lat, lon) or radius_km is None or not 0 < radius_km <= Config.MAX_RADIUS_KM:
+            return jsonify({'error': f'lat, lon and radius_km (up to {Config.MAX_RADIUS_KM}) required'}), 400
+    
+    if args.get('hotspots') in ('1', 'true'):
+        if bbox is not None:
+            bboxes = [bbox]
+        elif radius_km is not None:
+            bboxes = radius_bboxes(lat, lon, radius_km)
+        else:
+            bboxes = None
+        cell = args.get('cell', Config.HOTSPOT_CELL_DEGREES, type=float)
+        if not cell or cell <= 0:
+            return jsonify({'error': 'cell must be a positive number of degrees'}), 400
+        spots = geo_index.hotspots(bboxes, cell_degrees=cell, limit=limit)
+        return jsonify({'hotspots': spots, 'cell_degrees': cell, 'total_cells': len(spots)})
+    
+    if bbox is not None:
+        hits = [(criminal_id, None) for criminal_id in geo_index.within_bbox(bbox, limit)]
+    elif radius_km is not None:
+        hits = geo_index.within_radius(lat, lon, radius_km, limit)
+    else:
+        return jsonify({'error': 'Give lat, lon and radius_km, or bbox'}), 400
+    
+    results = []
+    for criminal_id, distance in hits:
+        c = criminals.get(criminal_id)
+        if c is None:
+            continue
+        result = list_item(c, fields)
+        result['latitude'], result['longitude'] = geo_index.point(c) or (None, None)
+        if distance is not None:
+            result['distance_km'] = round(distance, 3)
+        results.append(result)
+    
+    return jsonify({'results': results, 'total_results': len(results)})
+
+# ========== BULK IMPORT / EXPORT ==========
+IMPORT_CHUNK_SIZE = 5000
+MAX_IMPORT_ERRORS = 100  # rejected rows reported back in detail
+
+def import_records(frames, summary):
+    # Validates, predicts and commits one chunk at a time, each chunk with a
+    # single storage write; `summary` is updated as chunks are committed so
+    # a caller still has the counts if a later chunk fails to parse
+    first_row = 1
+    for frame in frames:
+        records, errors = validate_frame(frame, first_row)
+        first_row += len(frame)
+        if records:
+            X = encode_features(records)
+            predictions = {
+                'danger_level': decision_tree_predictor.predict_batch(X),
+                'predicted_crime_type': naive_bayes_predictor.predict_batch(X),
+                'recidivism_score': np.minimum(1.0, X[:, PRIOR_CONVICTIONS] * 0.2)
+            }
+            # Values already present in the archive are kept
+            for i, record in enumerate(records):
+                for field, values in predictions.items():
+                    if record.get(field) is None:
+                        record[field] = values[i].item()
+                record['ai_models_used'] = ['Decision Tree', 'Naive Bayes']
+                geocode(record)
+            with write_lock():
+                criminals.add_many(records)
+                save_data(records=records)
+                changes.publish_many([('put', record['id'], record) for record in records])
+        summary['imported'] += len(records)
+        summary['rejected'] += len(errors)
+        summary['errors'].extend(errors[:MAX_IMPORT_ERRORS - len(summary['errors'])])
+    return summary
+
+def iter_record_chunks(filters=None, age_range=None, chunk_size=IMPORT_CHUNK_SIZE):
+    # Keyset-paged walk over the store in id order
+    after = None
+    while True:
+        page, after = criminals.query(filters=filters, age_range=age_range, after=after, limit=chunk_size)
+        if page:
+            yield page
+        if after is None:
+            return
+
+@app.route('/api/criminals/import', methods=['POST'])
+def import_criminals():
+    # Body is the file itself, or a multipart upload in the 'file' field.
+    # Format comes from ?format=csv|ndjson|parquet or the Content-Type.
+    upload = request.files.get('file')
+    try:
+        fmt = parse_format(request.args.get('format'), upload.mimetype if upload else request.mimetype)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    summary = {'imported': 0, 'rejected': 0, 'errors': []}
+    try:
+        frames = read_frames(upload.stream if upload else request.stream, fmt, IMPORT_CHUNK_SIZE)
+        import_records(frames, summary)
+    except ValueError as e:
+        return jsonify(dict(summary, error=f'Could not read {fmt} input: {e}')), 400
+    except Exception as e:
+        return jsonify(dict(summary, error=str(e))), 500
+    
+    return jsonify(dict(summary, message=f"✅ Imported {summary['imported']} criminals"))
+
+@app.route('/api/criminals/export', methods=['GET'])
+def export_criminals():
+    # Same filters as GET /api/criminals; streamed chunk by chunk
+    try:
+        fmt = parse_format(request.args.get('format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    args = request.args
+    filters = {field: args[param] for param, field in LIST_FILTERS.items() if args.get(param)}
+    age_range = (args.get('age_min', type=int), args.get('age_max', type=int))
     
-    return jsonify(criminal_list)
+    response = Response(
+        stream_with_context(write_chunks(iter_record_chunks(filters, age_range), fmt)),
+        mimetype=FORMATS[fmt]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename=criminals.{fmt}'
+    return response
 
 @app.route('/api/criminals/<int:criminal_id>', methods=['GET'])
+@cached_json
 def get_criminal(criminal_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    if not token:
-        return jsonify({'error': 'Unauthorized'}), 401
-    
-    for criminal in criminals:
-        if criminal['id'] == criminal_id:
-            return jsonify(criminal)
+    criminal = criminals.get(criminal_id)
+    if criminal is None:
+        return jsonify({'error': 'Criminal not found'}), 404
     
-    return jsonify({'error': 'Criminal not found'}), 404
+    return jsonify(dict(criminal, photo_url=photo_url(criminal, 'original'), thumbnail_url=photo_url(criminal)))
 
 @app.route('/api/criminals', methods=['POST'])
 def add_criminal():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    if not token:
-        return jsonify({'error': 'Unauthorized'}), 401
-    
     try:
-        global next_criminal_id
         data = request.form.to_dict()
         files = request.files
         
-        # Handle photo upload
+        # Handle photo upload: streamed into content-addressed storage, with
+        # thumbnails and the face crop rendered in the background
         photo_path = None
+        photo_hash = None
+        face_embedding = None
         if 'photo' in files:
-            photo = files['photo']
-            filename = f"{data.get('name', 'unknown')}_{secrets.token_hex(4)}.jpg"
-            photo_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            photo.save(photo_path)
+            with metrics.timer('photo_save'):
+                photo_hash, photo_path = media.save(files['photo'].stream)
+            media.schedule_derivatives(photo_hash)
+            
+            # Compute the face embedding once, at enrollment
+            try:
+                with open(photo_path, 'rb') as f:
+                    face_embedding = face_embedder.embed(f.read())
+            except Exception as e:
+                print(f"✗ Could not extract face embedding: {e}")
+        
+        # Handle fingerprint upload; the minutiae template is stored on the
+        # record and picked up by fingerprint_index when the record is added
+        fingerprint_path = None
+        fingerprint_template = None
+        if 'fingerprint' in files:
+            _, fingerprint_path = media.save(files['fingerprint'].stream)
+            
+            try:
+                with open(fingerprint_path, 'rb') as f:
+                    fingerprint_template = encode_template(extract_minutiae(f.read()))
+            except Exception as e:
+                print(f"✗ Could not extract fingerprint minutiae: {e}")
         
         # Make predictions using AI models
         features = {
@@ -236,12 +836,12 @@ def add_criminal():
             'crime_severity': data.get('crime_severity', 'Medium')
         }
         
-        danger_level = decision_tree_predictor.predict(features)
-        predicted_crime = naive_bayes_predictor.predict(features)
+        with metrics.timer('predict'):
+            danger_level = decision_tree_predictor.predict(features)
+            predicted_crime = naive_bayes_predictor.predict(features)
         
         # Create criminal record
         criminal = {
-            'id': next_criminal_id,
             'name': data.get('name', 'Unknown'),
             'age': int(data.get('age', 30)) if data.get('age') else None,
             'gender': data.get('gender'),
@@ -249,8 +849,13 @@ def add_criminal():
             'crime_severity': data.get('crime_severity', 'Medium'),
             'prior_convictions': int(data.get('prior_convictions', 0)),
             'last_known_location': data.get('last_known_location'),
+            'latitude': float(data.get('latitude')) if data.get('latitude') else None,
+            'longitude': float(data.get('longitude')) if data.get('longitude') else None,
             'status': data.get('status', 'Wanted'),
             'photo_path': photo_path,
+            'photo_hash': photo_hash,
+            'fingerprint_path': fingerprint_path,
+            'fingerprint_template': fingerprint_template,
             'height': float(data.get('height')) if data.get('height') else None,
             'weight': float(data.get('weight')) if data.get('weight') else None,
             'eye_color': data.get('eye_color'),
@@ -262,12 +867,15 @@ def add_criminal():
             'created_at': datetime.now().isoformat(),
             'ai_models_used': ['Decision Tree', 'Naive Bayes']
         }
+        geocode(criminal)
         
-        criminals.append(criminal)
-        next_criminal_id += 1
-        
-        # Save to file
-        save_data()
+        with write_lock():
+            criminal = criminals.add(criminal)
+            # Append to storage log
+            save_data(criminal)
+            changes.publish('put', criminal['id'], criminal)
+        if face_embedding is not None:
+            face_index.add(criminal['id'], face_embedding)
         
         return jsonify({
             'message': '✅ Criminal added successfully',
@@ -280,108 +888,317 @@ def add_criminal():
 
 @app.route('/api/criminals/<int:criminal_id>', methods=['DELETE'])
 def delete_criminal(criminal_id):
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    if not token:
-        return jsonify({'error': 'Unauthorized'}), 401
+    with write_lock():
+        if criminals.remove(criminal_id) is None:
+            return jsonify({'error': 'Criminal not found'}), 404
+        save_data(deleted_id=criminal_id)
+        changes.publish('delete', criminal_id)
+    face_index.remove(criminal_id)
+    return jsonify({'message': '✅ Criminal deleted successfully'})
+
+# ========== CHANGE FEED ==========
+def change_event(event, fields):
+    # Public form of a bus event; records are projected like GET /api/criminals
+    result = {key: event[key] for key in ('version', 'op', 'id', 'at')}
+    if event['record'] is not None:
+        result['criminal'] = list_item(event['record'], fields)
+    return result
+
+def stream_changes(version, fields):
+    # SSE: one event per change, a keep-alive comment while idle and a
+    # "reset" event if the client falls behind the buffer. Other workers'
+    # changes are synced every CHANGES_POLL_INTERVAL, since an open stream
+    # sends no requests to sync them. The connection is closed after
+    # CHANGES_STREAM_SECONDS; EventSource reconnects with Last-Event-ID and
+    # resumes where it left off.
+    deadline = time.monotonic() + Config.CHANGES_STREAM_SECONDS
+    written = time.monotonic()
+    yield f"retry: {Config.CHANGES_RETRY_MS}\n\n"
+    while time.monotonic() < deadline:
+        try:
+            sync_records()
+        except Exception as e:
+            print(f"✗ Error syncing change stream: {e}")
+        try:
+            events = changes.wait(version, Config.CHANGES_POLL_INTERVAL, Config.CHANGES_PAGE_SIZE)
+        except StaleVersion as e:
+            yield f"event: reset\ndata: {json.dumps({'error': str(e), 'version': changes.version})}\n\n"
+            return
+        if not events:
+            if time.monotonic() - written >= Config.CHANGES_HEARTBEAT:
+                written = time.monotonic()
+                yield ": keep-alive\n\n"
+            continue
+        yield ''.join(
+            f"id: {event['version']}\nevent: {event['op']}\ndata: {json.dumps(change_event(event, fields))}\n\n"
+            for event in events
+        )
+        version = events[-1]['version']
+        written = time.monotonic()
+
+@app.route('/api/changes', methods=['GET'])
+def get_changes():
+    # Incremental feed of criminal additions and deletions, instead of
+    # re-polling and diffing GET /api/criminals. Query parameters:
+    #   since - version of the last change seen (X-Change-Version of the
+    #           list, or the last event); without it the current version
+    #   fields - projection of the records, as for the list
+    #   limit - most changes per response (JSON only)
+    # With Accept: text/event-stream the changes are streamed as SSE from
+    # `since` or Last-Event-ID. A version the buffer no longer covers, or
+    # from another worker or before a restart, gets 410: reload the list.
+    # Versions are per worker process, so clients should stick to one.
+    fields = [f for f in request.args.get('fields', '').split(',') if f] or LIST_FIELDS
+    since = request.args.get('since') or request.headers.get('Last-Event-ID') or changes.version
     
-    global criminals
-    original_length = len(criminals)
-    criminals = [c for c in criminals if c['id'] != criminal_id]
+    if request.accept_mimetypes.best == 'text/event-stream':
+        try:
+            changes.since(since, 1)
+        except StaleVersion as e:
+            return jsonify({'error': str(e), 'version': changes.version}), 410
+        if not changes.subscribe(Config.CHANGES_MAX_STREAMS):
+            response = jsonify({'error': 'Too many change streams'})
+            response.headers['Retry-After'] = str(Config.CHANGES_RETRY_MS // 1000)
+            return response, 503
+        response = Response(stream_changes(since, fields), mimetype='text/event-stream')
+        # Runs when the server closes the response, even if the stream was
+        # never started
+        response.call_on_close(changes.unsubscribe)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
     
-    if len(criminals) < original_length:
-        save_data()
-        return jsonify({'message': '✅ Criminal deleted successfully'})
-    else:
-        return jsonify({'error': 'Criminal not found'}), 404
+    limit = max(1, min(request.args.get('limit', Config.CHANGES_PAGE_SIZE, type=int), Config.CHANGES_PAGE_SIZE))
+    try:
+        events = changes.since(since, limit + 1)
+    except StaleVersion as e:
+        return jsonify({'error': str(e), 'version': changes.version}), 410
+    more = len(events) > limit
+    events = events[:limit]
+    return jsonify({
+        'version': events[-1]['version'] if events else since,
+        'changes': [change_event(event, fields) for event in events],
+        'more': more
+    })
 
-# ========== BIOMETRIC SCANNING ==========
-@app.route('/api/scan/face', methods=['POST'])
-def scan_face():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    if not token:
-        return jsonify({'error': 'Unauthorized'}), 401
+# ========== PHOTOS ==========
+PHOTO_HASH = re.compile(r'[0-9a-f]{64}')
+
+@app.route('/api/photos/<photo_hash>', methods=['GET'])
+def get_photo(photo_hash):
+    # variant=original|thumb|face, size=one of Config.THUMBNAIL_SIZES.
+    # Needs a session token, or the expires/sig of a URL from photo_url()
+    variant = request.args.get('variant', 'original')
+    size = request.args.get('size', Config.THUMBNAIL_SIZES[0], type=int)
+    if variant == 'thumb' and size not in Config.THUMBNAIL_SIZES:
+        return jsonify({'error': f'Thumbnail size must be one of {list(Config.THUMBNAIL_SIZES)}'}), 400
+    if not PHOTO_HASH.fullmatch(photo_hash):
+        return jsonify({'error': 'Photo not found'}), 404
+    
+    try:
+        path = media.derivative(photo_hash, variant, size)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if path is None:
+        return jsonify({'error': 'Photo not found'}), 404
     
-    # Simple face scan simulation
+    # Content never changes under a given hash: strong ETag, Range support
+    # and a long-lived cache entry
+    etag = {'original': photo_hash, 'thumb': f"{photo_hash}-thumb-{size}"}.get(variant, f"{photo_hash}-{variant}")
+    response = send_file(os.path.abspath(path), conditional=True, etag=etag, max_age=31536000)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
+
+# ========== BIOMETRIC SCANNING ==========
+def face_matches(hits):
+    # (criminal_id, similarity) best first -> response entries above the threshold
     matches = []
-    for i, criminal in enumerate(criminals[:5]):  # Return top 5 matches
-        if criminal.get('photo_path'):
-            similarity = 0.7 + (i * 0.05)  # Simulate decreasing similarity
-            matches.append({
-                'criminal_id': criminal['id'],
-                'name': criminal.get('name', 'Unknown'),
-                'similarity': round(similarity, 2),
-                'crime_type': criminal.get('crime_type', 'Unknown'),
-                'status': criminal.get('status', 'Wanted'),
-                'match_quality': 'High' if similarity > 0.8 else 'Medium'
-            })
-    
-    # If no criminals with photos, return dummy matches
-    if not matches:
-        matches = [
-            {
-                'criminal_id': 1,
-                'name': 'John Doe',
-                'similarity': 0.85,
-                'crime_type': 'Theft',
-                'status': 'Wanted',
-                'match_quality': 'High'
-            },
-            {
-                'criminal_id': 2,
-                'name': 'Jane Smith',
-                'similarity': 0.72,
-                'crime_type': 'Fraud',
-                'status': 'Arrested',
-                'match_quality': 'Medium'
-            }
-        ]
+    for criminal_id, similarity in hits:
+        if similarity < Config.FACE_MATCH_THRESHOLD:
+            break
+        criminal = criminals.get(criminal_id)
+        if criminal is None:
+            continue
+        matches.append({
+            'criminal_id': criminal_id,
+            'name': criminal.get('name', 'Unknown'),
+            'similarity': round(similarity, 2),
+            'crime_type': criminal.get('crime_type', 'Unknown'),
+            'status': criminal.get('status', 'Wanted'),
+            'match_quality': 'High' if similarity > 0.8 else 'Medium'
+        })
     
-    return jsonify({
+    return {
         'matches': matches,
         'scan_type': 'Face Recognition',
         'total_matches': len(matches)
-    })
+    }
 
-@app.route('/api/scan/fingerprint', methods=['POST'])
-def scan_fingerprint():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    if not token:
-        return jsonify({'error': 'Unauthorized'}), 401
+def fingerprint_matches(minutiae, hits):
+    if len(minutiae) >= 25:
+        quality = 'Good'
+    elif len(minutiae) >= 12:
+        quality = 'Fair'
+    else:
+        quality = 'Poor'
     
-    # Simple fingerprint scan simulation
     matches = []
-    for i, criminal in enumerate(criminals[:3]):  # Return top 3 matches
-        match_score = 0.8 + (i * 0.05)  # Simulated match scores
+    for criminal_id, match_score in hits:
+        if match_score < Config.FINGERPRINT_MATCH_THRESHOLD:
+            break
+        criminal = criminals.get(criminal_id)
+        if criminal is None:
+            continue
         matches.append({
-            'criminal_id': criminal['id'],
+            'criminal_id': criminal_id,
             'name': criminal.get('name', 'Unknown'),
             'match_score': round(match_score, 2),
             'crime_type': criminal.get('crime_type', 'Unknown'),
-            'fingerprint_quality': 'Good'
+            'fingerprint_quality': quality
         })
     
-    if not matches:
-        matches = [{
-            'criminal_id': 1,
-            'name': 'Test Criminal',
-            'match_score': 0.92,
-            'crime_type': 'Theft',
-            'fingerprint_quality': 'Excellent'
-        }]
-    
-    return jsonify({
+    return {
         'matches': matches,
         'scan_type': 'Fingerprint',
         'total_matches': len(matches)
-    })
+    }
+
+@app.route('/api/scan/face', methods=['POST'])
+@requires_warm('faces')
+def scan_face():
+    probe = request.files.get('photo') or request.files.get('image')
+    if probe is None:
+        return jsonify({'error': 'No image provided'}), 400
+    
+    try:
+        with metrics.timer('face_embedding'):
+            embedding = face_embedder.embed(probe.read())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Cosine top-k against the enrolled gallery
+    top_k = request.args.get('top_k', Config.FACE_TOP_K, type=int)
+    with metrics.timer('face_match'):
+        hits = face_index.search(embedding, top_k)[0]
+    return jsonify(face_matches(hits))
+
+@app.route('/api/scan/fingerprint', methods=['POST'])
+@requires_warm('indexes')
+def scan_fingerprint():
+    probe = request.files.get('fingerprint') or request.files.get('image')
+    if probe is None:
+        return jsonify({'error': 'No fingerprint image provided'}), 400
+    
+    try:
+        with metrics.timer('minutiae_extraction'):
+            minutiae = extract_minutiae(probe.read())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Pair-hash pre-filter, then full alignment on the shortlist only
+    top_k = request.args.get('top_k', Config.FINGERPRINT_TOP_K, type=int)
+    with metrics.timer('fingerprint_match'):
+        hits = fingerprint_index.search(minutiae, top_k)
+    return jsonify(fingerprint_matches(minutiae, hits))
+
+# ========== SCAN JOBS ==========
+def run_face_scans(probes):
+    # One embedding pass and one gallery matrix product for the whole batch;
+    # an unreadable image fails only its own job
+    try:
+        with metrics.timer('face_embedding'):
+            embeddings = list(face_embedder.embed_many([probe['image'] for probe in probes]))
+    except ValueError:
+        embeddings = []
+        for probe in probes:
+            try:
+                embeddings.append(face_embedder.embed(probe['image']))
+            except ValueError as e:
+                embeddings.append(e)
+    
+    readable = [i for i, embedding in enumerate(embeddings) if not isinstance(embedding, Exception)]
+    if readable:
+        k = max(probes[i]['top_k'] for i in readable)
+        with metrics.timer('face_match'):
+            hits = face_index.search(np.stack([embeddings[i] for i in readable]), k)
+        for i, probe_hits in zip(readable, hits):
+            embeddings[i] = face_matches(probe_hits[:probes[i]['top_k']])
+    return embeddings
+
+def run_fingerprint_scans(probes):
+    # Minutiae extraction is per image; the batch shares one pass over the index
+    results = []
+    for probe in probes:
+        try:
+            with metrics.timer('minutiae_extraction'):
+                minutiae = extract_minutiae(probe['image'])
+        except ValueError as e:
+            results.append(e)
+            continue
+        with metrics.timer('fingerprint_match'):
+            hits = fingerprint_index.search(minutiae, probe['top_k'])
+        results.append(fingerprint_matches(minutiae, hits))
+    return results
+
+scan_queue = ScanQueue(
+    {'face': run_face_scans, 'fingerprint': run_fingerprint_scans},
+    max_depth=Config.SCAN_QUEUE_DEPTH,
+    workers=Config.SCAN_WORKERS,
+    max_batch=Config.SCAN_MAX_BATCH,
+    batch_window=Config.SCAN_BATCH_WINDOW,
+    job_ttl=Config.SCAN_JOB_TTL,
+    # Shared by all workers, so a job can be polled on any of them
+    jobs=JobStore(Config.SCAN_JOBS_FILE, max_jobs=Config.SCAN_JOBS_KEPT, fsync=False)
+)
+
+SCAN_UPLOADS = {'face': ('photo', 'image'), 'fingerprint': ('fingerprint', 'image')}
+SCAN_TOP_K = {'face': Config.FACE_TOP_K, 'fingerprint': Config.FINGERPRINT_TOP_K}
+SCAN_WARMUP = {'face': 'faces', 'fingerprint': 'indexes'}
+
+@app.route('/api/scan/<kind>/jobs', methods=['POST'])
+def submit_scan(kind):
+    if kind not in SCAN_UPLOADS:
+        return jsonify({'error': 'Scan type must be face or fingerprint'}), 404
+    warming = warming_response(SCAN_WARMUP[kind])
+    if warming is not None:
+        return warming
+    probe = next((request.files[name] for name in SCAN_UPLOADS[kind] if name in request.files), None)
+    if probe is None:
+        return jsonify({'error': 'No image provided'}), 400
+    
+    top_k = request.args.get('top_k', SCAN_TOP_K[kind], type=int)
+    try:
+        job_id = scan_queue.submit(kind, {'image': probe.read(), 'top_k': max(1, top_k)})
+    except QueueFull as e:
+        # Backpressure: tell the client when the backlog should have drained
+        response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    
+    response = jsonify({'job_id': job_id, 'status': 'queued', 'queue_depth': len(scan_queue)})
+    response.headers['Location'] = f"/api/scan/jobs/{job_id}"
+    return response, 202
+
+@app.route('/api/scan/jobs/<job_id>', methods=['GET'])
+def scan_status(job_id):
+    # ?wait=<seconds> long-polls until the job finishes
+    wait = min(max(request.args.get('wait', 0, type=float), 0), Config.SCAN_MAX_WAIT)
+    job = scan_queue.get(job_id, wait)
+    if job is None:
+        return jsonify({'error': 'Scan job not found'}), 404
+    
+    return jsonify(dict(job, job_id=job_id))
+
+@app.route('/api/scan/jobs', methods=['GET'])
+def scan_queue_stats():
+    return jsonify(scan_queue.stats())
 
 # ========== AI PREDICTION ==========
 @app.route('/api/predict', methods=['POST'])
+@requires_warm('models')
 def predict():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    if not token:
-        return jsonify({'error': 'Unauthorized'}), 401
-    
     try:
         data = request.json
         
@@ -394,8 +1211,9 @@ def predict():
         }
         
         # Get predictions from AI models
-        danger_level = decision_tree_predictor.predict(features)
-        predicted_crime = naive_bayes_predictor.predict(features)
+        with metrics.timer('predict'):
+            danger_level = decision_tree_predictor.predict(features)
+            predicted_crime = naive_bayes_predictor.predict(features)
         
         # Determine recidivism risk
         prior_convictions = features.get('prior_convictions', 0)
@@ -412,73 +1230,442 @@ def predict():
             'recidivism_risk': recidivism_risk,
             'confidence': 'High' if len(criminals) > 10 else 'Medium',
             'ai_models': ['Decision Tree', 'Naive Bayes'],
+            'model_version': getattr(decision_tree_predictor, 'version', 'rule-based'),
             'features_analyzed': list(features.keys())
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+BATCH_CHUNK_SIZE = 5000
+
+def predict_rows(rows):
+    # Encode a chunk once and run both models column-wise over it
+    with metrics.timer('predict_batch'):
+        X = encode_features(rows)
+        danger_levels = decision_tree_predictor.predict_batch(X)
+        predicted_crimes = naive_bayes_predictor.predict_batch(X)
+        recidivism_risks = recidivism_risk_batch(X)
+    
+    lines = []
+    for row, danger_level, predicted_crime, risk in zip(rows, danger_levels, predicted_crimes, recidivism_risks):
+        result = {
+            'danger_level': str(danger_level),
+            'predicted_crime_type': str(predicted_crime),
+            'recidivism_risk': str(risk)
+        }
+        if 'id' in row:
+            result['id'] = row['id']
+        lines.append(json.dumps(result))
+    return '\n'.join(lines) + '\n'
+
+def iter_prediction_chunks(request_stream, is_ndjson):
+    # Yields lists of feature dicts, BATCH_CHUNK_SIZE at a time, without
+    # reading an NDJSON body into memory up front
+    if not is_ndjson:
+        rows = json.load(request_stream)
+        if not isinstance(rows, list):
+            raise ValueError('Expected a JSON array of feature objects')
+        for start in range(0, len(rows), BATCH_CHUNK_SIZE):
+            yield rows[start:start + BATCH_CHUNK_SIZE]
+        return
+    
+    chunk = []
+    for line in request_stream:
+        line = line.strip()
+        if not line:
+            continue
+        chunk.append(json.loads(line))
+        if len(chunk) == BATCH_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+@app.route('/api/predict/batch', methods=['POST'])
+@requires_warm('models')
+def predict_batch():
+    # Body is a JSON array or NDJSON (one feature object per line); the
+    # response is NDJSON with one prediction per input record, in order
+    is_ndjson = request.mimetype in ('application/x-ndjson', 'application/jsonl')
+    chunks = iter_prediction_chunks(request.stream, is_ndjson)
+    
+    try:
+        first = next(chunks, [])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def generate():
+        yield predict_rows(first) if first else ''
+        try:
+            for chunk in chunks:
+                yield predict_rows(chunk)
+        except ValueError as e:
+            # Status is already sent; report the bad input in-band
+            yield json.dumps({'error': str(e)}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 # ========== MODEL TRAINING ==========
+TRAINING_FIELDS = ('age', 'gender', 'prior_convictions', 'crime_severity', 'danger_level', 'crime_type')
+training_pool = None
+# Shared by all workers, so any of them can report a job's status
+training_jobs = JobStore(Config.TRAINING_JOBS_FILE)
+training_lock = threading.Lock()
+
+def get_training_pool():
+    # Created on first use; spawn keeps the worker free of this process's threads
+    global training_pool
+    with training_lock:
+        if training_pool is None:
+            training_pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+        return training_pool
+
+def finish_training(job_id, future):
+    try:
+        result = future.result()
+        load_models(result['decision_tree']['path'], result['naive_bayes']['path'])
+        outcome = {'status': 'completed', 'result': result}
+    except BrokenProcessPool as e:
+        # A crashed worker poisons the pool; start a fresh one next time
+        global training_pool
+        with training_lock:
+            training_pool = None
+        outcome = {'status': 'failed', 'error': str(e)}
+    except Exception as e:
+        outcome = {'status': 'failed', 'error': str(e)}
+    training_jobs.update(job_id, finished_at=datetime.now().isoformat(), **outcome)
+
 @app.route('/api/train-models', methods=['POST'])
 def train_models():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    if not token:
-        return jsonify({'error': 'Unauthorized'}), 401
+    try:
+        # Ship only the training columns to the worker process
+        rows = criminals.project(TRAINING_FIELDS)
+        job_id = training_jobs.create(
+            status='running',
+            training_data_size=len(rows),
+            submitted_at=datetime.now().isoformat()
+        )
+        future = get_training_pool().submit(
+            run_training, rows, Config.DECISION_TREE_MODEL, Config.NAIVE_BAYES_MODEL
+        )
+        future.add_done_callback(lambda f: finish_training(job_id, f))
+        
+        return jsonify({
+            'message': '✅ Model training started',
+            'job_id': job_id,
+            'training_data_size': len(rows),
+            'algorithms': ['Decision Tree', 'Naive Bayes']
+        }), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/train-models/<job_id>', methods=['GET'])
+def training_status(job_id):
+    job = training_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Training job not found'}), 404
+    
+    return jsonify(dict(job, job_id=job_id, serving_version=getattr(decision_tree_predictor, 'version', 'rule-based')))
+
+# ========== DUPLICATE DETECTION ==========
+# Entity resolution runs in the training worker process (see dedup.py) and
+# writes its suggestions to DEDUP_RESULTS_FILE, so every web worker serves
+# the result of the last run, including a nightly one started by cron.
+# Job status is shared by all workers, like the training jobs
+dedup_jobs = JobStore(Config.DEDUP_JOBS_FILE)
+dedup_results = {'stamp': None, 'data': None, 'scores': None}
+
+def finish_dedup(job_id, future):
+    try:
+        outcome = {'status': 'completed', 'result': future.result()}
+    except BrokenProcessPool as e:
+        global training_pool
+        with training_lock:
+            training_pool = None
+        outcome = {'status': 'failed', 'error': str(e)}
+    except Exception as e:
+        outcome = {'status': 'failed', 'error': str(e)}
+    dedup_jobs.update(job_id, finished_at=datetime.now().isoformat(), **outcome)
+
+def load_dedup_results():
+    # Parsed results file, re-read only when it has been replaced
+    try:
+        st = os.stat(Config.DEDUP_RESULTS_FILE)
+    except FileNotFoundError:
+        return None
+    stamp = (st.st_ino, st.st_mtime_ns)
+    if dedup_results['stamp'] != stamp:
+        with open(Config.DEDUP_RESULTS_FILE, 'r') as f:
+            data = json.load(f)
+        # Negated scores, ascending, to bisect for min_score
+        scores = [-suggestion['score'] for suggestion in data['suggestions']]
+        dedup_results.update(stamp=stamp, data=data, scores=scores)
+    return dedup_results['data']
+
+@app.route('/api/dedup', methods=['POST'])
+def start_dedup():
+    # Body (optional): {"threshold": 0.8}
+    try:
+        data = request.get_json(silent=True) or {}
+        threshold = float(data.get('threshold', Config.DEDUP_THRESHOLD))
+        if not 0 < threshold <= 1:
+            return jsonify({'error': 'threshold must be in (0, 1]'}), 400
+        rows = criminals.project(DEDUP_FIELDS)
+        job_id = dedup_jobs.create(
+            status='running',
+            records=len(rows),
+            submitted_at=datetime.now().isoformat()
+        )
+        future = get_training_pool().submit(
+            run_dedup, rows, Config.DEDUP_RESULTS_FILE,
+            face_index_path=Config.FACE_INDEX_PATH,
+            face_dim=face_embedder.dim,
+            max_suggestions=Config.DEDUP_MAX_SUGGESTIONS,
+            threshold=threshold,
+            face_threshold=Config.FACE_MATCH_THRESHOLD,
+            max_block=Config.DEDUP_MAX_BLOCK,
+            window=Config.DEDUP_WINDOW
+        )
+        future.add_done_callback(lambda f: finish_dedup(job_id, f))
+        
+        return jsonify({
+            'message': '✅ Duplicate search started',
+            'job_id': job_id,
+            'records': len(rows)
+        }), 202
+    except ValueError:
+        return jsonify({'error': 'threshold must be a number'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/dedup/<job_id>', methods=['GET'])
+def dedup_status(job_id):
+    job = dedup_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Dedup job not found'}), 404
+    
+    return jsonify(dict(job, job_id=job_id))
+
+@app.route('/api/dedup/suggestions', methods=['GET'])
+def dedup_suggestions():
+    # Query parameters:
+    #   min_score - only pairs scoring at least this
+    #   limit (default 50, 1-500), offset
+    # Pairs whose records have been deleted since the run are left out, so
+    # a page walks the suggestions only until it is full; total counts the
+    # run's pairs at or above min_score, deleted ones included.
+    try:
+        min_score = float(request.args.get('min_score', 0))
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+        offset = max(int(request.args.get('offset', 0)), 0)
+    except ValueError:
+        return jsonify({'error': 'min_score, limit and offset must be numbers'}), 400
+    results = load_dedup_results()
+    if results is None:
+        return jsonify({'error': 'No duplicate search has been run yet; POST /api/dedup'}), 404
+    
+    total = bisect_right(dedup_results['scores'], -min_score)
+    page, skipped, more = [], 0, False
+    for suggestion in islice(results['suggestions'], total):
+        if skipped < offset:
+            skipped += all(record_id in criminals for record_id in suggestion['ids'])
+            continue
+        records = [criminals.get(record_id) for record_id in suggestion['ids']]
+        if not all(records):
+            continue
+        if len(page) == limit:
+            more = True
+            break
+        page.append(dict(suggestion, records=[list_item(c, LIST_FIELDS) for c in records]))
     
     return jsonify({
-        'message': '✅ Models trained successfully',
-        'decision_tree_trained': True,
-        'naive_bayes_trained': True,
-        'training_data_size': len(criminals),
-        'algorithms': ['Rule-based Decision Tree', 'Rule-based Naive Bayes'],
-        'accuracy': '85% (simulated)'
+        'generated_at': results['generated_at'],
+        'records': results['records'],
+        'total': total,
+        'more': more,
+        'suggestions': page
     })
 
 # ========== STATISTICS ==========
 @app.route('/api/stats', methods=['GET'])
+@requires_warm('indexes')
+@cached_json
 def get_stats():
-    token = request.headers.get('Authorization', '').replace('Bearer ', '')
-    if not token:
-        return jsonify({'error': 'Unauthorized'}), 401
-    
-    total = len(criminals)
-    wanted = sum(1 for c in criminals if c.get('status') == 'Wanted')
-    arrested = sum(1 for c in criminals if c.get('status') == 'Arrested')
-    high_risk = sum(1 for c in criminals if c.get('danger_level') == 'High')
+    # Counters are maintained by the store on every mutation
+    total = stats.total
     
     return jsonify({
         'total_criminals': total,
-        'wanted': wanted,
-        'arrested': arrested,
-        'high_risk': high_risk,
+        'wanted': stats.count('status', 'Wanted'),
+        'arrested': stats.count('status', 'Arrested'),
+        'high_risk': stats.count('danger_level', 'High'),
         'recently_added': min(5, total),
+        'breakdowns': stats.breakdowns(),
         'system_status': 'Operational'
     })
 
+# ========== TREND ANALYTICS ==========
+def parse_period(value, end=False):
+    # ISO date/time, or YYYY-MM for a month; with end=True a month gives
+    # the start of the next one, an exclusive upper bound
+    if len(value) != 7:
+        return parse_time(value)
+    moment = parse_time(value + '-01')
+    if moment is not None and end:
+        moment = (moment + timedelta(days=31)).replace(day=1)
+    return moment
+
+@app.route('/api/analytics/trends', methods=['GET'])
+def get_trends():
+    # Query parameters:
+    #   dimension - crime_type (default), severity, location or danger_level
+    #   granularity - hour, day (default) or month
+    #   from, to - ISO dates or times (YYYY-MM for a whole month), inclusive;
+    #              by default the last TRENDS_DEFAULT_SPAN buckets up to now
+    #   values - comma-separated values to return; otherwise the `top`
+    #            (default TRENDS_TOP) largest, with the rest in 'other'
+    # Counts come from the rollups, so a year of buckets costs the same
+    # however many records there are.
+    args = request.args
+    dimension = args.get('dimension', 'crime_type')
+    granularity = args.get('granularity', 'day')
+    if dimension not in DIMENSIONS:
+        return jsonify({'error': f"dimension must be one of {', '.join(DIMENSIONS)}"}), 400
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+    try:
+        top = int(args.get('top', Config.TRENDS_TOP))
+    except ValueError:
+        return jsonify({'error': 'top must be a number'}), 400
+    
+    bounds = {}
+    for name in ('from', 'to'):
+        if args.get(name):
+            month_end = name == 'to' and len(args[name]) == 7
+            moment = parse_period(args[name], end=month_end)
+            if moment is None:
+                return jsonify({'error': f"{name} must be an ISO date or time"}), 400
+            bounds[name] = bucket_of(moment, granularity) - (1 if month_end else 0)
+    span = Config.TRENDS_DEFAULT_SPAN[granularity]
+    end = bounds.get('to', bounds['from'] + span - 1 if 'from' in bounds else bucket_of(datetime.now(), granularity))
+    start = bounds.get('from', end - span + 1)
+    if start > end:
+        return jsonify({'error': 'from must not be after to'}), 400
+    if end - start + 1 > Config.TRENDS_MAX_BUCKETS:
+        return jsonify({'error': f"At most {Config.TRENDS_MAX_BUCKETS} buckets per request"}), 400
+    if storage is not None and not criminals.is_warm(trends):
+        response = warming_response('indexes')
+        if response is not None:
+            return response
+    
+    values, matrix = trends.counts(dimension, granularity, start, end)
+    sums = matrix.sum(axis=1)
+    if args.get('values'):
+        wanted = [index_key(value) or 'unknown' for value in args['values'].split(',')]
+        position = {value: i for i, value in enumerate(values)}
+        series = {
+            value: matrix[position[value]].tolist() if value in position else [0] * matrix.shape[1]
+            for value in wanted
+        }
+    else:
+        ranked = [i for i in np.argsort(-sums, kind='stable').tolist() if sums[i] > 0]
+        shown, hidden = ranked[:max(top, 0)], ranked[max(top, 0):]
+        series = {values[i]: matrix[i].tolist() for i in shown}
+    total = matrix.sum(axis=0)
+    result = {
+        'dimension': dimension,
+        'granularity': granularity,
+        'buckets': bucket_labels(start, end, granularity),
+        'total': total.tolist(),
+        'series': series,
+        'undated': trends.undated
+    }
+    if not args.get('values') and hidden:
+        result['other'] = matrix[hidden].sum(axis=0).tolist()
+    
+    return jsonify(result)
+
+# ========== METRICS ==========
+@metrics.collector
+def collect_app_metrics():
+    served = sum(count for _, _, count in request_latency.snapshot().values())
+    overhead = sum(instrumentation_seconds.snapshot().values())
+    return [
+        ('app_instrumentation_overhead_microseconds', 'gauge', 'Mean instrumentation cost per request',
+         [({}, round(overhead / served * 1e6, 3) if served else 0.0)]),
+        ('criminal_records', 'gauge', 'Criminal records in this worker', [({}, len(criminals))]),
+        ('response_cache_bytes', 'gauge', 'Serialized responses held in the cache', [({}, response_cache.size)]),
+        ('response_cache_requests_total', 'counter', 'Response cache lookups',
+         [({'result': 'hit'}, response_cache.hits), ({'result': 'miss'}, response_cache.misses)]),
+        ('change_events_total', 'counter', 'Record changes published to the change feed',
+         [({}, changes.published)]),
+        ('change_streams', 'gauge', 'Open /api/changes event streams', [({}, changes.subscribers)]),
+        ('scan_queue_depth', 'gauge', 'Scan jobs waiting for a worker', [({}, len(scan_queue))]),
+        ('scan_jobs_total', 'counter', 'Scan jobs by outcome',
+         [({'outcome': outcome}, scan_queue.counters[outcome]) for outcome in ('completed', 'failed', 'rejected')]),
+        ('profiler_running', 'gauge', 'Whether the sampling profiler is on', [({}, int(profiler.running))])
+    ]
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Prometheus text format; scrapers authenticate with METRICS_TOKEN when set
+    if Config.METRICS_TOKEN:
+        token = request.headers.get('Authorization', '').replace('Bearer ', '')
+        if not secrets.compare_digest(token, Config.METRICS_TOKEN):
+            return jsonify({'error': 'Unauthorized'}), 401
+    return Response(metrics.render(), content_type=Metrics.CONTENT_TYPE)
+
+@app.route('/api/profiler', methods=['GET', 'POST'])
+def sampling_profiler():
+    # GET returns collapsed stacks of request threads (text/plain, for
+    # flamegraph.pl or speedscope); POST {"enabled": bool, "interval_ms": n,
+    # "reset": bool} switches the profiler. Admins only.
+    if g.user.get('role') != 'admin':
+        return jsonify({'error': 'Admin role required'}), 403
+    if request.method == 'GET':
+        return Response(profiler.report(request.args.get('limit', type=int)), mimetype='text/plain')
+    
+    data = request.get_json(silent=True) or {}
+    if data.get('reset'):
+        profiler.reset()
+    if 'enabled' in data:
+        if data['enabled']:
+            interval_ms = data.get('interval_ms')
+            profiler.start(max(1, float(interval_ms)) / 1000 if interval_ms else None)
+        else:
+            profiler.stop()
+    return jsonify({'running': profiler.running, 'interval_ms': profiler.interval * 1000, 'samples': profiler.samples})
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    # Readiness probe: 200 once the data is loaded and requests can be
+    # served, with the progress of every warm-up step
+    status = warmup.status()
+    loaded = warmup.ready('data')
+    return jsonify(dict(status, ready=loaded)), 200 if loaded else 503
+
 # ========== SYSTEM INITIALIZATION ==========
+def initialize():
+    # Per-process startup; multi-worker servers call this in each worker,
+    # e.g. gunicorn -w 4 'app:initialize()'. Returns once the data is
+    # loaded; indexes and models keep warming in the background.
+    warmup.run('data')
+    warmup.start()
+    
+    # Create default users
+    if 'admin' not in users:
+        users.add('admin', 'admin2024', special_code='CIS-ADMIN-2024', role='admin')
+    if 'investigator1' not in users:
+        users.add('investigator1', 'secure123', role='investigator')
+    return app
+
 if __name__ == '__main__':
     print("=" * 60)
     print("🚔 CRIMINAL INVESTIGATION SYSTEM v1.0")
     print("=" * 60)
     
-    # Load existing data
-    load_data()
-    
-    # Create default users
-    password_hash, salt = hash_password('admin2024')
-    users['admin'] = {
-        'password_hash': password_hash,
-        'salt': salt,
-        'special_code': 'CIS-ADMIN-2024',
-        'role': 'admin'
-    }
-    
-    password_hash, salt = hash_password('secure123')
-    users['investigator1'] = {
-        'password_hash': password_hash,
-        'salt': salt,
-        'special_code': None,
-        'role': 'investigator'
-    }
+    # Load existing data and any previously trained models
+    initialize()
     
     print("\n✅ SYSTEM INITIALIZED")
     print(f"📊 Criminals in database: {len(criminals)}")
@@ -500,8 +1687,8 @@ if __name__ == '__main__':
     
     print("\n🛠️  SYSTEM FEATURES:")
     print("   • Criminal Database Management")
-    print("   • Face Scanning (Simulated)")
-    print("   • Fingerprint Scanning (Simulated)")
+    print("   • Face Scanning (Vector Index)")
+    print("   • Fingerprint Scanning (Minutiae Index)")
     print("   • AI Prediction (Decision Tree & Naive Bayes)")
     print("   • Biometric Identification")
     print("   • Secure Authentication")
@@ -0,0 +1,583 @@
+import os
+import io
+import csv
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+import cv2
+
+# Synthetic datasets, store/predictor microbenchmarks and a Flask test-client
+# load generator. Every run is seeded, writes machine-readable JSON and can be
+# diffed against an earlier run:
+#   python benchmark.py generate --records 100000 --out bench-100k
+#   python benchmark.py run --records 1000,10000,100000 --output results.json
+#   python benchmark.py run --dataset bench-100k --only routes --concurrency 4
+#   python benchmark.py compare baseline.json results.json
+# A run works in a scratch directory, so the repo's own data is never touched.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+PERCENTILES = (50, 95, 99)
+
+FIRST_NAMES = ('Aarav', 'Vihaan', 'Aditya', 'Arjun', 'Rohan', 'Kabir', 'Ishaan', 'Rahul', 'Amit', 'Suresh',
+               'Priya', 'Ananya', 'Riya', 'Sneha', 'Pooja', 'Kavya', 'Neha', 'Meera', 'Asha', 'Sunita')
+LAST_NAMES = ('Sharma', 'Verma', 'Patil', 'Deshmukh', 'Kulkarni', 'Waghamare', 'Joshi', 'Iyer', 'Reddy', 'Nair',
+              'Gupta', 'Singh', 'Khan', 'Das', 'Mehta', 'Shah', 'Pawar', 'Jadhav', 'Rao', 'Bose')
+CRIME_TYPES = ('Theft', 'Burglary', 'Fraud', 'Assault', 'Robbery', 'Drug Offense', 'Cybercrime', 'Homicide',
+               'Kidnapping', 'Vandalism')
+SEVERITIES = ('Low', 'Medium', 'High')
+STATUSES = ('Wanted', 'Arrested', 'Released')
+COLORS = {'eye_color': ('Brown', 'Black', 'Hazel', 'Blue', 'Green'), 'hair_color': ('Black', 'Brown', 'Grey', 'Red')}
+SCARS = ('', 'scar on left cheek', 'tattoo on right arm', 'burn mark on hand', 'mole above lip', 'missing tooth')
+
+
+# ========== SYNTHETIC DATA ==========
+def gazetteer_places():
+    with open(os.path.join(REPO_DIR, 'gazetteer.csv'), newline='', encoding='utf-8') as f:
+        return [(row['name'], float(row['latitude']), float(row['longitude'])) for row in csv.DictReader(f)]
+
+
+def synthetic_records(n, seed=0):
+    # Column-wise draws, then one dict per record in the criminals.json shape.
+    # Half the records carry coordinates; the rest are geocoded from their
+    # location name like records entered without a map pin.
+    rng = np.random.default_rng(seed)
+    places = gazetteer_places()
+    place = rng.integers(0, len(places), n)
+    jitter = rng.normal(0, 0.05, (n, 2))
+    pinned = rng.random(n) < 0.5
+    first, last = rng.integers(0, len(FIRST_NAMES), n), rng.integers(0, len(LAST_NAMES), n)
+    ages = rng.integers(18, 75, n)
+    missing_age = rng.random(n) < 0.05
+    gender = rng.random(n) < 0.8
+    crime = rng.integers(0, len(CRIME_TYPES), n)
+    severity = rng.choice(3, n, p=(0.4, 0.4, 0.2))
+    priors = rng.poisson(1.5, n)
+    status = rng.choice(3, n, p=(0.5, 0.35, 0.15))
+    heights = np.round(rng.normal(5.5, 0.3, n), 1)
+    weights = np.round(rng.normal(68, 12, n), 1)
+    eyes = rng.integers(0, len(COLORS['eye_color']), n)
+    hair = rng.integers(0, len(COLORS['hair_color']), n)
+    scars = rng.integers(0, len(SCARS), n)
+    start = datetime(2023, 1, 1)
+    offsets = np.sort(rng.integers(0, 3 * 365 * 86400, n))
+
+    records = []
+    for i in range(n):
+        name, lat, lon = places[place[i]]
+        danger = 'High' if priors[i] > 3 or severity[i] == 2 else 'Medium' if priors[i] > 1 else 'Low'
+        records.append({
+            'id': i + 1,
+            'name': f"{FIRST_NAMES[first[i]]} {LAST_NAMES[last[i]]}",
+            'age': None if missing_age[i] else int(ages[i]),
+            'gender': 'Male' if gender[i] else 'Female',
+            'crime_type': CRIME_TYPES[crime[i]],
+            'crime_severity': SEVERITIES[severity[i]],
+            'prior_convictions': int(priors[i]),
+            'last_known_location': name,
+            'latitude': round(lat + jitter[i, 0], 5) if pinned[i] else None,
+            'longitude': round(lon + jitter[i, 1], 5) if pinned[i] else None,
+            'status': STATUSES[status[i]],
+            'photo_path': None,
+            'height': float(heights[i]),
+            'weight': float(weights[i]),
+            'eye_color': COLORS['eye_color'][eyes[i]],
+            'hair_color': COLORS['hair_color'][hair[i]],
+            'scars_marks': SCARS[scars[i]],
+            'danger_level': danger,
+            'predicted_crime_type': CRIME_TYPES[crime[i]],
+            'recidivism_score': min(1.0, int(priors[i]) * 0.2),
+            'created_at': (start + timedelta(seconds=int(offsets[i]))).isoformat(),
+            'ai_models_used': ['Decision Tree', 'Naive Bayes']
+        })
+    return records
+
+
+def synthetic_face(seed, noise=0):
+    # A face-like drawing: skin ellipse, eyes, brows, nose and mouth whose
+    # geometry and tones come from the seed; noise > 0 gives a second
+    # "photo" of the same subject
+    rng = np.random.default_rng(seed)
+    size = 160
+    image = np.full((size, size, 3), rng.integers(150, 230), np.uint8)
+    cx, cy = size // 2 + int(rng.integers(-6, 7)), size // 2 + int(rng.integers(-6, 7))
+    skin = tuple(int(v) for v in rng.integers(80, 220, 3))
+    cv2.ellipse(image, (cx, cy), (int(rng.integers(42, 54)), int(rng.integers(56, 68))), 0, 0, 360, skin, -1)
+    eye_y, eye_dx = cy - int(rng.integers(10, 20)), int(rng.integers(16, 24))
+    for side in (-1, 1):
+        cv2.circle(image, (cx + side * eye_dx, eye_y), int(rng.integers(4, 8)), (30, 30, 30), -1)
+        cv2.line(image, (cx + side * (eye_dx - 8), eye_y - 12), (cx + side * (eye_dx + 8), eye_y - 14), (40, 40, 40), 2)
+    cv2.line(image, (cx, eye_y + 6), (cx + int(rng.integers(-4, 5)), cy + 14), (60, 60, 60), 2)
+    cv2.ellipse(image, (cx, cy + int(rng.integers(26, 34))), (int(rng.integers(10, 18)), 5), 0, 0, 180, (50, 40, 120), 2)
+    if noise:
+        image = np.clip(image + np.random.default_rng(seed + noise).normal(0, 6, image.shape), 0, 255).astype(np.uint8)
+    return cv2.imencode('.png', image)[1].tobytes()
+
+
+def synthetic_fingerprint(seed, noise=0):
+    # Concentric ridges around a random core, warped by low-frequency angular
+    # terms so every seed yields a different set of endings and bifurcations
+    rng = np.random.default_rng(seed)
+    size = 300
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32)
+    cx, cy = size / 2 + rng.uniform(-25, 25), size / 2 + rng.uniform(-25, 25)
+    r, theta = np.hypot(x - cx, y - cy), np.arctan2(y - cy, x - cx)
+    warp = sum(rng.uniform(3, 8) * np.sin(k * theta + rng.uniform(0, 2 * np.pi)) for k in (1, 2, 3))
+    warp += rng.uniform(2, 5) * np.sin(x / rng.uniform(20, 40)) * np.cos(y / rng.uniform(20, 40))
+    ridges = np.sin(2 * np.pi * (r + warp) / rng.uniform(7, 9)) > 0
+    inside = ((x - size / 2) / 120) ** 2 + ((y - size / 2) / 140) ** 2 < 1
+    image = np.where(ridges & inside, 40, 230).astype(np.float32)
+    if noise:
+        image += np.random.default_rng(seed + noise).normal(0, 12, image.shape)
+    image = cv2.GaussianBlur(np.clip(image, 0, 255).astype(np.uint8), (3, 3), 0)
+    return cv2.imencode('.png', image)[1].tobytes()
+
+
+def generate(out, n, seed=0, gallery=50):
+    # criminals.json snapshot plus probes/: gallery subjects enrolled with a
+    # face and a fingerprint (probe images are noisy re-captures of those)
+    # and as many unknown subjects
+    from biometrics import extract_minutiae, encode_template
+    os.makedirs(os.path.join(out, 'probes'), exist_ok=True)
+    started = time.perf_counter()
+    records = synthetic_records(n, seed)
+    gallery = min(gallery, n)
+    enrolled = [int(i) for i in np.random.default_rng(seed).choice(n, gallery, replace=False) + 1]
+    for subject, record_id in enumerate(enrolled):
+        fingerprint = synthetic_fingerprint(seed * 100003 + subject)
+        records[record_id - 1]['fingerprint_template'] = encode_template(extract_minutiae(fingerprint))
+        for kind, image in (('face', synthetic_face(seed * 100003 + subject)), ('fingerprint', fingerprint)):
+            with open(os.path.join(out, 'probes', f"enroll-{kind}-{record_id}.png"), 'wb') as f:
+                f.write(image)
+
+    probes = []
+    for subject, record_id in enumerate(enrolled):
+        probes.append({'record_id': record_id, 'face': f"probe-face-{record_id}.png",
+                       'fingerprint': f"probe-fingerprint-{record_id}.png"})
+        with open(os.path.join(out, 'probes', probes[-1]['face']), 'wb') as f:
+            f.write(synthetic_face(seed * 100003 + subject, noise=1))
+        with open(os.path.join(out, 'probes', probes[-1]['fingerprint']), 'wb') as f:
+            f.write(synthetic_fingerprint(seed * 100003 + subject, noise=1))
+    for subject in range(gallery):
+        probes.append({'record_id': None, 'face': f"probe-face-unknown-{subject}.png",
+                       'fingerprint': f"probe-fingerprint-unknown-{subject}.png"})
+        with open(os.path.join(out, 'probes', probes[-1]['face']), 'wb') as f:
+            f.write(synthetic_face(seed * 100003 + 50000 + subject))
+        with open(os.path.join(out, 'probes', probes[-1]['fingerprint']), 'wb') as f:
+            f.write(synthetic_fingerprint(seed * 100003 + 50000 + subject))
+
+    with open(os.path.join(out, 'criminals.json'), 'w') as f:
+        json.dump({'criminals': records, 'generation': 0, 'last_updated': datetime.now().isoformat()},
+                  f, separators=(',', ':'))
+    manifest = {
+        'records': n,
+        'seed': seed,
+        'gallery': enrolled,
+        'probes': probes,
+        'snapshot_bytes': os.path.getsize(os.path.join(out, 'criminals.json')),
+        'generate_seconds': round(time.perf_counter() - started, 3)
+    }
+    with open(os.path.join(out, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# ========== MEASUREMENT ==========
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def summarize(latencies, wall, **extra):
+    ms = np.asarray(latencies, dtype=np.float64) * 1000
+    result = {'count': len(ms)}
+    if len(ms):
+        result.update({f"p{q}_ms": round(float(np.percentile(ms, q)), 3) for q in PERCENTILES})
+        result.update(mean_ms=round(float(ms.mean()), 3), max_ms=round(float(ms.max()), 3),
+                      throughput_per_s=round(len(ms) / wall, 1) if wall > 0 else None)
+    result.update(extra)
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def measure(fn, calls, warmup=3):
+    # fn(i) timed once per call after a few untimed warmup calls
+    for i in range(min(warmup, calls)):
+        fn(i)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(calls):
+        t = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def guarded(results, name, run):
+    # One failing benchmark (a missing optional dependency, say) is recorded
+    # and the rest of the run carries on
+    try:
+        results[name] = run()
+    except Exception as e:
+        results[name] = {'error': f"{type(e).__name__}: {e}"}
+    status = results[name].get('p50_ms', results[name].get('seconds', results[name].get('error')))
+    print(f"  {name}: {status}")
+
+
+# ========== BENCHMARKS ==========
+def bench_store(A, manifest, calls, rng):
+    n = len(A.criminals)
+    ids = rng.integers(1, manifest['records'] + 1, calls + 3).tolist()
+    names = [rng.choice(FIRST_NAMES) + ' ' + rng.choice(LAST_NAMES) for _ in range(calls + 3)]
+    places = gazetteer_places()
+    results = {}
+
+    guarded(results, 'get', lambda: measure(lambda i: A.criminals.get(ids[i]), calls))
+    guarded(results, 'count_filtered', lambda: measure(
+        lambda i: A.criminals.count('status', STATUSES[i % 3]), calls))
+    guarded(results, 'find_filtered', lambda: measure(
+        lambda i: A.criminals.find(crime_type=CRIME_TYPES[i % len(CRIME_TYPES)], status='Wanted'), calls))
+    guarded(results, 'query_first_page', lambda: measure(lambda i: A.criminals.query(limit=50), calls))
+    guarded(results, 'query_filtered_sorted', lambda: measure(lambda i: A.criminals.query(
+        filters={'status': STATUSES[i % 3]}, age_range=(25, 40), sort='age', descending=True, limit=50), calls))
+    guarded(results, 'project_training_fields', lambda: measure(
+        lambda i: A.criminals.project(A.TRAINING_FIELDS), max(1, calls // 20), warmup=1))
+    guarded(results, 'stats_breakdowns', lambda: measure(lambda i: A.stats.breakdowns(), calls))
+    guarded(results, 'search', lambda: measure(lambda i: A.search_index.search(names[i], limit=50), calls))
+    guarded(results, 'search_misspelled', lambda: measure(
+        lambda i: A.search_index.search(names[i][:-1] + 'x', limit=50), calls))
+    guarded(results, 'geo_within_radius', lambda: measure(
+        lambda i: A.geo_index.within_radius(*places[i % len(places)][1:], 25), calls))
+
+    new_records = synthetic_records(calls + 3, seed=manifest['seed'] + 1)
+    for record in new_records:
+        del record['id']
+
+    def add(i):
+        with A.write_lock():
+            A.save_data(A.criminals.add(dict(new_records[i])))
+    guarded(results, 'add_and_save', lambda: measure(add, calls))
+    results['records'] = n
+    return results
+
+
+def bench_predictors(A, manifest, calls, rng):
+    from predictors import encode_features, train_models
+    rows = [
+        {'age': int(rng.integers(18, 75)), 'gender': 'Male', 'prior_convictions': int(rng.poisson(1.5)),
+         'crime_severity': SEVERITIES[int(rng.integers(0, 3))]}
+        for _ in range(5000)
+    ]
+    results = {}
+    guarded(results, 'decision_tree_predict', lambda: measure(
+        lambda i: A.decision_tree_predictor.predict(rows[i % len(rows)]), calls))
+    guarded(results, 'naive_bayes_predict', lambda: measure(
+        lambda i: A.naive_bayes_predictor.predict(rows[i % len(rows)]), calls))
+    guarded(results, 'encode_features_5000', lambda: measure(lambda i: encode_features(rows), max(1, calls // 10)))
+    guarded(results, 'predict_rows_5000', lambda: measure(lambda i: A.predict_rows(rows), max(1, calls // 10)))
+
+    def train():
+        sample = A.criminals.project(A.TRAINING_FIELDS)[:50000]
+        started = time.perf_counter()
+        scratch = tempfile.mkdtemp(prefix='bench-train-')
+        try:
+            train_models(sample, os.path.join(scratch, 'dt.pkl'), os.path.join(scratch, 'nb.pkl'))
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+        return {'seconds': round(time.perf_counter() - started, 3), 'rows': len(sample), 'peak_rss_mb': peak_rss_mb()}
+    guarded(results, 'train_models', train)
+    return results
+
+
+def route_plan(manifest, probes_dir):
+    # (name, method, request kwargs per call) in run order; writes go last
+    # so they do not invalidate the response cache under the read routes
+    n = manifest['records']
+    places = gazetteer_places()
+    probes = manifest['probes']
+    images = {}
+
+    def probe(kind, i):
+        name = probes[i % len(probes)][kind]
+        if name not in images:
+            with open(os.path.join(probes_dir, name), 'rb') as f:
+                images[name] = f.read()
+        return images[name]
+
+    def upload(field, kind):
+        return lambda i: {'data': {field: (io.BytesIO(probe(kind, i)), 'probe.png')},
+                          'content_type': 'multipart/form-data'}
+
+    def varied(template, count=64):
+        return lambda i: {'path': template(i % count)}
+
+    new_records = [
+        {key: str(value) for key, value in record.items()
+         if value is not None and key in ('name', 'age', 'gender', 'crime_type', 'crime_severity',
+                                          'prior_convictions', 'last_known_location', 'status')}
+        for record in synthetic_records(1000, seed=manifest['seed'] + 2)
+    ]
+    batch = [{'age': 20 + i % 50, 'gender': 'Male', 'prior_convictions': i % 6, 'crime_severity': SEVERITIES[i % 3]}
+             for i in range(1000)]
+    return [
+        ('list_first_page', 'GET', lambda i: {'path': '/api/criminals'}),
+        ('list_filtered_sorted', 'GET', varied(
+            lambda i: f"/api/criminals?status={STATUSES[i % 3]}&age_min={18 + i}&sort=age&order=desc")),
+        ('get_criminal', 'GET', lambda i: {'path': f"/api/criminals/{i * 7919 % n + 1}"}),
+        ('search', 'GET', varied(
+            lambda i: f"/api/criminals/search?q={FIRST_NAMES[i % 20]}+{LAST_NAMES[(i * 7) % 20]}", 400)),
+        ('nearby', 'GET', varied(
+            lambda i: f"/api/criminals/nearby?lat={places[i % len(places)][1]}&lon={places[i % len(places)][2]}"
+                      f"&radius_km={10 + i % 40}", 1000)),
+        ('hotspots', 'GET', lambda i: {'path': '/api/criminals/nearby?hotspots=1'}),
+        ('stats', 'GET', lambda i: {'path': '/api/stats'}),
+        ('trends_year', 'GET', varied(
+            lambda i: f"/api/analytics/trends?dimension={('crime_type', 'severity', 'location', 'danger_level')[i % 4]}"
+                      f"&granularity={('day', 'month', 'hour')[i // 4]}&from=2023-01-01&to=2023-12-31T23:00", 12)),
+        ('predict', 'POST', lambda i: {'json': batch[i % len(batch)]}),
+        ('predict_batch_1000', 'POST', lambda i: {'json': batch}),
+        ('scan_face', 'POST', upload('photo', 'face')),
+        ('scan_fingerprint', 'POST', upload('fingerprint', 'fingerprint')),
+        ('scan_face_job', 'JOB', upload('photo', 'face')),
+        ('add_criminal', 'POST', lambda i: {
+            'path': '/api/criminals',
+            'data': new_records[i % len(new_records)],
+            'content_type': 'multipart/form-data'
+        })
+    ]
+
+
+ROUTE_PATHS = {'predict': '/api/predict', 'predict_batch_1000': '/api/predict/batch', 'scan_face': '/api/scan/face',
+               'scan_fingerprint': '/api/scan/fingerprint', 'scan_face_job': '/api/scan/face/jobs'}
+
+
+def bench_routes(A, manifest, requests, concurrency, probes_dir):
+    token = A.app.test_client().post('/api/login', json={'username': 'admin', 'password': 'admin2024'}).json['access_token']
+    headers = {'Authorization': f"Bearer {token}"}
+    results = {}
+
+    for name, method, make in route_plan(manifest, probes_dir):
+        def call(client, i):
+            kwargs = make(i)
+            path = kwargs.pop('path', ROUTE_PATHS.get(name))
+            if method == 'JOB':
+                # Submit, then long-poll: the latency is the job's end-to-end
+                # time and the outcome is the job status
+                response = client.post(path, headers=headers, **kwargs)
+                if response.status_code != 202:
+                    return response.status_code
+                return client.get(f"/api/scan/jobs/{response.json['job_id']}?wait=30", headers=headers).json['status']
+            response = client.open(path, method=method, headers=headers, **kwargs)
+            response.get_data()
+            return response.status_code
+
+        def run():
+            latencies, statuses, lock = [], {}, threading.Lock()
+            counter = iter(range(requests))
+            warm = A.app.test_client()
+            for i in range(min(3, requests)):
+                call(warm, -1 - i)
+
+            def worker():
+                client = A.app.test_client()
+                local = []
+                for i in counter:
+                    t = time.perf_counter()
+                    status = call(client, i)
+                    local.append(time.perf_counter() - t)
+                    with lock:
+                        statuses[status] = statuses.get(status, 0) + 1
+                with lock:
+                    latencies.extend(local)
+
+            started = time.perf_counter()
+            threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return summarize(latencies, time.perf_counter() - started,
+                             status_codes={str(code): count for code, count in sorted(statuses.items())})
+        guarded(results, name, run)
+    return results
+
+
+# ========== RUNS ==========
+def run_one(args, records, dataset=None):
+    # Benchmarks one dataset size in this process, inside a scratch
+    # directory so app.py's relative paths land there
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    result = {
+        'meta': {
+            'records': records,
+            'seed': args.seed,
+            'started_at': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'commit': git_commit(),
+            'requests_per_route': args.requests,
+            'calls_per_benchmark': args.calls,
+            'concurrency': args.concurrency
+        }
+    }
+    try:
+        if dataset is None:
+            print(f"Generating {records} records...")
+            dataset = os.path.join(workdir, 'dataset')
+            manifest = generate(dataset, records, args.seed, args.gallery)
+        else:
+            with open(os.path.join(dataset, 'manifest.json')) as f:
+                manifest = json.load(f)
+        result['dataset'] = {key: manifest[key] for key in ('records', 'snapshot_bytes', 'generate_seconds')}
+        shutil.copy(os.path.join(dataset, 'criminals.json'), workdir)
+        shutil.copy(os.path.join(REPO_DIR, 'gazetteer.csv'), workdir)
+        os.chdir(workdir)
+        sys.path.insert(0, REPO_DIR)
+
+        started = time.perf_counter()
+        import app as A
+        imported = time.perf_counter()
+        A.initialize()
+        loaded = time.perf_counter()
+        A.warmup.wait()
+        warmed = time.perf_counter()
+        for record_id in manifest['gallery']:
+            with open(os.path.join(dataset, 'probes', f"enroll-face-{record_id}.png"), 'rb') as f:
+                try:
+                    A.face_index.add(record_id, A.face_embedder.embed(f.read()))
+                except Exception as e:
+                    print(f"✗ Could not enroll face {record_id}: {e}")
+                    break
+        result['startup'] = {
+            'import_seconds': round(imported - started, 3),
+            'initialize_seconds': round(loaded - imported, 3),
+            'warmup_seconds': round(warmed - loaded, 3),
+            'faces_enrolled': len(A.face_index),
+            'fingerprints_enrolled': len(A.fingerprint_index),
+            'peak_rss_mb': peak_rss_mb()
+        }
+        print(f"✓ Loaded {len(A.criminals)} criminals in {result['startup']['initialize_seconds']}s")
+
+        rng = np.random.default_rng(args.seed)
+        sections = {
+            'store': lambda: bench_store(A, manifest, args.calls, rng),
+            'predictors': lambda: bench_predictors(A, manifest, args.calls, rng),
+            'routes': lambda: bench_routes(A, manifest, args.requests, args.concurrency,
+                                           os.path.join(dataset, 'probes'))
+        }
+        for section in args.only:
+            print(f"{section}:")
+            result[section] = sections[section]()
+        result['peak_rss_mb'] = peak_rss_mb()
+        result['meta']['finished_at'] = datetime.now().isoformat()
+        return result
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    sizes = [int(size) for size in args.records.split(',')]
+    if args.dataset or len(sizes) == 1:
+        results = [run_one(args, sizes[0], args.dataset)]
+    else:
+        # One child process per size: peak RSS and warm caches must not
+        # carry over from the previous size
+        results = []
+        for size in sizes:
+            with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+                child_output = f.name
+            command = [sys.executable, os.path.abspath(__file__), 'run', '--records', str(size),
+                       '--output', child_output, '--seed', str(args.seed), '--calls', str(args.calls),
+                       '--requests', str(args.requests), '--concurrency', str(args.concurrency),
+                       '--gallery', str(args.gallery), '--only', ','.join(args.only)]
+            subprocess.run(command, check=True)
+            with open(child_output) as f:
+                results.extend(json.load(f)['runs'])
+            os.remove(child_output)
+
+    with open(args.output, 'w') as f:
+        json.dump({'runs': results}, f, indent=2)
+    print(f"✓ Results written to {args.output}")
+
+
+def compare(args):
+    # p95 (or seconds) per benchmark, baseline vs candidate, matched by
+    # dataset size
+    with open(args.baseline) as f:
+        baseline = {run['meta']['records']: run for run in json.load(f)['runs']}
+    with open(args.candidate) as f:
+        candidate = json.load(f)['runs']
+    for new in candidate:
+        old = baseline.get(new['meta']['records'])
+        if old is None:
+            continue
+        print(f"{new['meta']['records']} records ({old['meta'].get('commit')} -> {new['meta'].get('commit')})")
+        for section in ('store', 'predictors', 'routes'):
+            for name, stats in new.get(section, {}).items():
+                before = old.get(section, {}).get(name)
+                if not isinstance(stats, dict) or not isinstance(before, dict):
+                    continue
+                metric = 'p95_ms' if 'p95_ms' in stats else 'seconds'
+                if metric not in stats or metric not in before or not before[metric]:
+                    continue
+                change = (stats[metric] - before[metric]) / before[metric] * 100
+                flag = '  REGRESSION' if change > args.threshold else ''
+                print(f"  {section}.{name:<28} {metric} {before[metric]:>10} -> {stats[metric]:>10} ({change:+.1f}%){flag}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the criminal store, predictors and API routes')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    gen = commands.add_parser('generate', help='Write a synthetic dataset and probe images')
+    gen.add_argument('--records', type=int, default=10000)
+    gen.add_argument('--out', required=True)
+    gen.add_argument('--seed', type=int, default=0)
+    gen.add_argument('--gallery', type=int, default=50, help='subjects enrolled with a face and a fingerprint')
+
+    bench = commands.add_parser('run', help='Run the benchmarks and write JSON results')
+    bench.add_argument('--records', default='10000', help='dataset size, or a comma-separated list of sizes')
+    bench.add_argument('--dataset', help='directory written by generate (default: generate a fresh one)')
+    bench.add_argument('--output', default='benchmark-results.json')
+    bench.add_argument('--seed', type=int, default=0)
+    bench.add_argument('--gallery', type=int, default=50)
+    bench.add_argument('--calls', type=int, default=200, help='timed calls per microbenchmark')
+    bench.add_argument('--requests', type=int, default=200, help='requests per route')
+    bench.add_argument('--concurrency', type=int, default=1, help='client threads per route')
+    bench.add_argument('--only', default='store,predictors,routes', type=lambda value: value.split(','))
+
+    diff = commands.add_parser('compare', help='Compare two result files')
+    diff.add_argument('baseline')
+    diff.add_argument('candidate')
+    diff.add_argument('--threshold', type=float, default=10, help='p95 increase (%%) reported as a regression')
+
+    args = parser.parse_args()
+    if args.command == 'generate':
+        manifest = generate(args.out, args.records, args.seed, args.gallery)
+        print(f"✓ Wrote {manifest['records']} records ({manifest['snapshot_bytes']} bytes) to {args.out}")
+    elif args.command == 'run':
+        unknown = set(args.only) - {'store', 'predictors', 'routes'}
+        if unknown:
+            parser.error(f"unknown section(s): {', '.join(sorted(unknown))}")
+        run(args)
+    else:
+        compare(args)
@@ -0,0 +1,534 @@
+import os
+import json
+import base64
+import threading
+import numpy as np
+from lazy import lazy_import
+from storage import FileLock
+
+cv2 = lazy_import('cv2')
+
+
+def decode_image(image_bytes, flags=None):
+    # flags defaults to cv2.IMREAD_COLOR (not spelled out here so that
+    # importing this module does not load OpenCV)
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR if flags is None else flags)
+    if image is None:
+        raise ValueError('Unreadable image')
+    return image
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def top_k(scores, k):
+    # Indices of the k best scores, best first, without a full sort
+    if len(scores) > k:
+        idx = np.argpartition(-scores, k)[:k]
+    else:
+        idx = np.arange(len(scores))
+    return idx[np.argsort(-scores[idx], kind='stable')]
+
+
+# ========== FACE EMBEDDINGS ==========
+class FaceEmbedder:
+    # With an OpenFace-style Torch model on disk the embedding comes from
+    # cv2.dnn (128-d). Without one it falls back to a normalized, equalized
+    # thumbnail of the detected face, which is enough to re-identify
+    # near-identical photos. The network is read on first use (or by warm()).
+    def __init__(self, model_path=None, size=16):
+        self.model_path = model_path if model_path and os.path.exists(model_path) else None
+        self.size = size
+        self.dim = 128 if self.model_path else size * size
+        self._net = None
+        self._net_lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def net(self):
+        if self._net is None and self.model_path:
+            with self._net_lock:
+                if self._net is None:
+                    self._net = cv2.dnn.readNetFromTorch(self.model_path)
+        return self._net
+
+    def warm(self):
+        # Pays for the OpenCV import, the network and this thread's detector up front
+        return self.net, self.detector
+
+    @property
+    def detector(self):
+        # CascadeClassifier is not safe to share between threads
+        detector = getattr(self._local, 'detector', None)
+        if detector is None:
+            detector = self._local.detector = cv2.CascadeClassifier(
+                os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
+            )
+        return detector
+
+    def crop_face(self, image):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        faces = self.detector.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(40, 40))
+        if len(faces) == 0:
+            # Probe photos are often already cropped to the face
+            return image
+        x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+        return image[y:y + h, x:x + w]
+
+    def embed(self, image_bytes):
+        return self.embed_many([image_bytes])[0]
+
+    def embed_many(self, images):
+        faces = [self.crop_face(decode_image(data)) for data in images]
+
+        if self.net is not None:
+            blob = cv2.dnn.blobFromImages(faces, 1.0 / 255, (96, 96), (0, 0, 0), swapRB=True, crop=False)
+            self.net.setInput(blob)
+            vectors = self.net.forward().astype(np.float32)
+        else:
+            vectors = np.empty((len(faces), self.dim), dtype=np.float32)
+            for i, face in enumerate(faces):
+                gray = cv2.equalizeHist(cv2.cvtColor(face, cv2.COLOR_BGR2GRAY))
+                thumb = cv2.resize(gray, (self.size, self.size), interpolation=cv2.INTER_AREA)
+                vectors[i] = thumb.reshape(-1)
+            vectors -= vectors.mean(axis=1, keepdims=True)
+
+        return normalize_rows(vectors)
+
+
+# ========== FACE VECTOR INDEX ==========
+class FaceIndex:
+    # Unit-length embeddings live in one contiguous float32 matrix memory-mapped
+    # from <path>.f32, with the owning criminal id of each row in <path>.ids.
+    # Deleted rows are tombstoned with id -1. Search is an exact batched
+    # cosine top-k until `ann_threshold` rows, after which an IVF index
+    # (spherical k-means lists, `nprobe` lists per query) is built in the
+    # background; rows added since the last build are scanned exactly.
+    # Writers from several processes serialize on a lock file and the meta
+    # file is the commit point; readers re-map the files when it changes.
+    def __init__(self, path, dim, ann_threshold=100000, nprobe=8):
+        self.path = path
+        self.dim = dim
+        self.ann_threshold = ann_threshold
+        self.nprobe = nprobe
+        self.count = 0
+        self.capacity = 0
+        self.vectors = None
+        self.ids = None
+        self._rows = {}
+        self._ivf = None
+        self._builder = None
+        self._lock = FileLock(path + '.lock')
+        self._stamp = None
+        self._load()
+
+    def __len__(self):
+        self.refresh()
+        return len(self._rows)
+
+    def __contains__(self, record_id):
+        self.refresh()
+        return record_id in self._rows
+
+    def record_ids(self):
+        self.refresh()
+        return list(self._rows)
+
+    def embeddings(self, record_ids):
+        # (ids of the given records that have a face, their vectors)
+        self.refresh()
+        found = [(record_id, self._rows[record_id]) for record_id in record_ids if record_id in self._rows]
+        rows = np.array([row for _, row in found], dtype=np.int64)
+        return [record_id for record_id, _ in found], np.asarray(self.vectors[rows], dtype=np.float32)
+
+    def _load(self):
+        meta_path = self.path + '.json'
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+            if meta.get('dim') == self.dim:
+                self._apply_meta(meta)
+                self._maybe_build_ivf()
+                return
+            print(f"✗ Face index dimension changed ({meta.get('dim')} -> {self.dim}), rebuilding")
+        self.count = 0
+        self._open(1024)
+
+    def _meta_stamp(self):
+        try:
+            st = os.stat(self.path + '.json')
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _apply_meta(self, meta):
+        self._stamp = self._meta_stamp()
+        if meta['capacity'] != self.capacity:
+            self._open(meta['capacity'])
+        self.count = meta['count']
+        ids = np.asarray(self.ids[:self.count])
+        live = np.flatnonzero(ids >= 0)
+        self._rows = dict(zip(ids[live].tolist(), live.tolist()))
+
+    def refresh(self):
+        # Picks up rows written by other processes; one stat() when unchanged
+        stamp = self._meta_stamp()
+        if stamp is None or stamp == self._stamp:
+            return
+        with self._lock:
+            with open(self.path + '.json', 'r') as f:
+                self._apply_meta(json.load(f))
+
+    def _open(self, capacity):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        for suffix, dtype, shape in (('.f32', np.float32, (capacity, self.dim)), ('.ids', np.int64, (capacity,))):
+            file_path = self.path + suffix
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            with open(file_path, 'ab') as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            mapped = np.memmap(file_path, dtype=dtype, mode='r+', shape=shape)
+            if suffix == '.f32':
+                self.vectors = mapped
+            else:
+                self.ids = mapped
+        self.capacity = capacity
+
+    def _save_meta(self):
+        self.vectors.flush()
+        self.ids.flush()
+        tmp_path = self.path + '.json.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'dim': self.dim, 'count': self.count, 'capacity': self.capacity}, f)
+        os.replace(tmp_path, self.path + '.json')
+        self._stamp = self._meta_stamp()
+
+    def add(self, record_id, vector):
+        with self._lock:
+            self.refresh()
+            row = self._rows.get(record_id)
+            if row is None:
+                if self.count == self.capacity:
+                    self._open(self.capacity * 2)
+                row = self.count
+                self.count += 1
+            self.vectors[row] = vector
+            self.ids[row] = record_id
+            self._rows[record_id] = row
+            self._save_meta()
+        self._maybe_build_ivf()
+
+    def remove(self, record_id):
+        with self._lock:
+            self.refresh()
+            row = self._rows.pop(record_id, None)
+            if row is None:
+                return
+            self.ids[row] = -1
+            self.vectors[row] = 0
+            self._save_meta()
+
+    def search(self, queries, k=5):
+        # Returns, per query row, a best-first list of (criminal_id, similarity)
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        self.refresh()
+        n = self.count
+        if n == 0:
+            return [[] for _ in queries]
+
+        vectors, ids, ivf = self.vectors, self.ids, self._ivf
+        if ivf is None:
+            scores = queries @ vectors[:n].T
+            scores[:, ids[:n] < 0] = -np.inf
+            return [self._results(row, np.arange(n), ids, k) for row in scores]
+
+        centroids, order, offsets, built = ivf
+        probes = np.argsort(-(queries @ centroids.T), axis=1)[:, :self.nprobe]
+        results = []
+        for query, lists in zip(queries, probes):
+            rows = np.concatenate(
+                [order[offsets[c]:offsets[c + 1]] for c in lists] + [np.arange(built, n)]
+            )
+            scores = vectors[rows] @ query
+            scores[ids[rows] < 0] = -np.inf
+            results.append(self._results(scores, rows, ids, k))
+        return results
+
+    @staticmethod
+    def _results(scores, rows, ids, k):
+        best = top_k(scores, k)
+        return [
+            (int(ids[rows[i]]), float(scores[i]))
+            for i in best if np.isfinite(scores[i])
+        ]
+
+    def _maybe_build_ivf(self):
+        built = self._ivf[3] if self._ivf is not None else 0
+        if self.count < self.ann_threshold or self.count < 2 * built:
+            return
+        if self._builder is not None and self._builder.is_alive():
+            return
+        self._builder = threading.Thread(target=self._build_ivf, daemon=True)
+        self._builder.start()
+
+    def _build_ivf(self, iterations=10, chunk=65536):
+        n = self.count
+        vectors = self.vectors[:n]
+        nlist = int(np.clip(np.sqrt(n), 16, 4096))
+        rng = np.random.default_rng(0)
+
+        # Spherical k-means on a sample, then assign every row to a list
+        sample = np.asarray(vectors[np.sort(rng.choice(n, min(n, nlist * 64), replace=False))])
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            filled = np.linalg.norm(sums, axis=1) > 0
+            centroids[filled] = normalize_rows(sums[filled])
+
+        assign = np.concatenate([
+            np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+            for start in range(0, n, chunk)
+        ])
+        order = np.argsort(assign, kind='stable')
+        offsets = np.searchsorted(assign[order], np.arange(nlist + 1))
+        self._ivf = (centroids, order, offsets, n)
+        print(f"✓ Built IVF face index over {n} faces ({nlist} lists)")
+
+
+# ========== FINGERPRINT MINUTIAE ==========
+RIDGE_ENDING = 1
+BIFURCATION = 3
+
+
+def thin(binary):
+    # Vectorized Zhang-Suen thinning of a 0/1 ridge image to 1-px skeletons
+    img = np.pad((binary > 0).astype(np.uint8), 1)
+    while True:
+        changed = False
+        for step in (0, 1):
+            p2, p3, p4 = img[:-2, 1:-1], img[:-2, 2:], img[1:-1, 2:]
+            p5, p6, p7 = img[2:, 2:], img[2:, 1:-1], img[2:, :-2]
+            p8, p9 = img[1:-1, :-2], img[:-2, :-2]
+            ring = [p2, p3, p4, p5, p6, p7, p8, p9]
+            neighbours = sum(p.astype(np.int32) for p in ring)
+            transitions = sum(((a == 0) & (b == 1)).astype(np.int32) for a, b in zip(ring, ring[1:] + ring[:1]))
+            if step == 0:
+                clear = (p2 * p4 * p6 == 0) & (p4 * p6 * p8 == 0)
+            else:
+                clear = (p2 * p4 * p8 == 0) & (p2 * p6 * p8 == 0)
+            remove = (img[1:-1, 1:-1] == 1) & (neighbours >= 2) & (neighbours <= 6) & (transitions == 1) & clear
+            if remove.any():
+                img[1:-1, 1:-1][remove] = 0
+                changed = True
+        if not changed:
+            return img[1:-1, 1:-1]
+
+
+def extract_minutiae(image_bytes, max_minutiae=64, size=400):
+    # Returns an (m, 4) int16 array of x, y, ridge angle in degrees [0, 180)
+    # and type (RIDGE_ENDING / BIFURCATION)
+    gray = decode_image(image_bytes, cv2.IMREAD_GRAYSCALE)
+    scale = size / max(gray.shape)
+    gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    gray = cv2.GaussianBlur(cv2.equalizeHist(gray), (3, 3), 0)
+
+    # Foreground = blocks with ridge texture, shrunk so the print's own
+    # border does not produce fake ridge endings
+    image = gray.astype(np.float32)
+    mean = cv2.boxFilter(image, -1, (16, 16))
+    std = np.sqrt(np.maximum(cv2.boxFilter(image * image, -1, (16, 16)) - mean * mean, 0))
+    mask = cv2.erode((std > 20).astype(np.uint8), np.ones((15, 15), np.uint8),
+                     borderType=cv2.BORDER_CONSTANT, borderValue=0)
+
+    ridges = cv2.adaptiveThreshold(gray, 1, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 2)
+    ridges = cv2.morphologyEx(ridges, cv2.MORPH_OPEN, np.ones((2, 2), np.uint8))
+    skeleton = np.pad(thin(ridges), 1)
+
+    # Crossing number over the 8-neighbour ring
+    ring = [skeleton[:-2, 1:-1], skeleton[:-2, 2:], skeleton[1:-1, 2:], skeleton[2:, 2:],
+            skeleton[2:, 1:-1], skeleton[2:, :-2], skeleton[1:-1, :-2], skeleton[:-2, :-2]]
+    crossings = sum(np.abs(a.astype(np.int32) - b) for a, b in zip(ring, ring[1:] + ring[:1])) // 2
+    core = skeleton[1:-1, 1:-1].astype(bool) & mask.astype(bool)
+    ys, xs = np.nonzero(core & ((crossings == 1) | (crossings == 3)))
+    types = crossings[ys, xs]
+
+    # Ridge orientation from the smoothed gradient structure tensor
+    gx = cv2.Sobel(image, cv2.CV_32F, 1, 0)
+    gy = cv2.Sobel(image, cv2.CV_32F, 0, 1)
+    gxy = cv2.boxFilter(2 * gx * gy, -1, (16, 16))
+    gxx_yy = cv2.boxFilter(gx * gx - gy * gy, -1, (16, 16))
+    orientation = (np.degrees(0.5 * np.arctan2(gxy, gxx_yy)) + 90) % 180
+    angles = orientation[ys, xs]
+
+    points = np.stack([xs, ys], axis=1).astype(np.float32)
+    if len(points) > 1:
+        # Broken ridges show up as clusters of minutiae a few pixels apart
+        dist = np.linalg.norm(points[:, None] - points[None, :], axis=2)
+        np.fill_diagonal(dist, np.inf)
+        keep = dist.min(axis=1) >= 6
+        points, angles, types = points[keep], angles[keep], types[keep]
+
+    if len(points) > max_minutiae:
+        centre = points.mean(axis=0)
+        keep = np.argsort(np.linalg.norm(points - centre, axis=1))[:max_minutiae]
+        points, angles, types = points[keep], angles[keep], types[keep]
+
+    return np.column_stack([points, angles, types]).astype(np.int16)
+
+
+def encode_template(minutiae):
+    return base64.b64encode(np.asarray(minutiae, dtype=np.int16).tobytes()).decode()
+
+
+def decode_template(template):
+    return np.frombuffer(base64.b64decode(template), dtype=np.int16).reshape(-1, 4)
+
+
+def match_minutiae(probe, gallery, distance_tolerance=12, angle_tolerance=20):
+    # Hough alignment: every same-type (probe, gallery) pair votes for a
+    # rotation + translation; the winning transform is applied and mutually
+    # close minutiae are counted. Score is matched^2 / (m * n), in [0, 1].
+    if len(probe) == 0 or len(gallery) == 0:
+        return 0.0
+    p = probe.astype(np.float32)
+    g = gallery.astype(np.float32)
+
+    same_type = p[:, None, 3] == g[None, :, 3]
+    # Ridge angles are mod 180, so read the rotation as the nearest one in [-90, 90)
+    rotation = (g[None, :, 2] - p[:, None, 2] + 90) % 180 - 90
+    theta = np.radians(rotation)
+    cos, sin = np.cos(theta), np.sin(theta)
+    px, py = p[:, None, 0], p[:, None, 1]
+    tx = g[None, :, 0] - (cos * px - sin * py)
+    ty = g[None, :, 1] - (sin * px + cos * py)
+
+    bins = np.stack([rotation // 10, np.floor(tx / 16), np.floor(ty / 16)], axis=-1)[same_type]
+    if len(bins) == 0:
+        return 0.0
+    values, counts = np.unique(bins.astype(np.int32), axis=0, return_counts=True)
+    best = values[np.argmax(counts)]
+    selected = same_type & (rotation // 10 == best[0]) & (np.floor(tx / 16) == best[1]) & (np.floor(ty / 16) == best[2])
+    angle = np.radians(rotation[selected].mean())
+    shift = np.array([tx[selected].mean(), ty[selected].mean()])
+
+    rot = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]], dtype=np.float32)
+    aligned = p[:, :2] @ rot.T + shift
+    aligned_angle = (p[:, 2] + np.degrees(angle)) % 180
+
+    dist = np.linalg.norm(aligned[:, None] - g[None, :, :2], axis=2)
+    angle_diff = np.abs(aligned_angle[:, None] - g[None, :, 2])
+    angle_diff = np.minimum(angle_diff, 180 - angle_diff)
+    close = (dist <= distance_tolerance) & (angle_diff <= angle_tolerance) & same_type
+    dist[~close] = np.inf
+
+    # Greedy one-to-one pairing, closest first
+    matched = 0
+    used_p, used_g = set(), set()
+    for flat in np.argsort(dist, axis=None):
+        i, j = divmod(int(flat), dist.shape[1])
+        if not np.isfinite(dist[i, j]):
+            break
+        if i not in used_p and j not in used_g:
+            used_p.add(i)
+            used_g.add(j)
+            matched += 1
+    return matched * matched / (len(p) * len(g))
+
+
+def pair_keys(minutiae, neighbours=4):
+    # Rotation/translation-invariant hash of each minutia and its nearest
+    # neighbours: (distance, both angles relative to the joining line, types)
+    if len(minutiae) < 2:
+        return set()
+    m = minutiae.astype(np.float32)
+    delta = m[None, :, :2] - m[:, None, :2]
+    dist = np.linalg.norm(delta, axis=2)
+    np.fill_diagonal(dist, np.inf)
+    nearest = np.argsort(dist, axis=1)[:, :neighbours]
+
+    keys = set()
+    for i, row in enumerate(nearest):
+        for j in row:
+            d = dist[i, j]
+            if not 10 <= d <= 150:
+                continue
+            line = np.degrees(np.arctan2(delta[i, j, 1], delta[i, j, 0])) % 180
+            a = (int((m[i, 2] - line) % 180 // 15), int(m[i, 3] == BIFURCATION))
+            b = (int((m[j, 2] - line) % 180 // 15), int(m[j, 3] == BIFURCATION))
+            (a_angle, a_type), (b_angle, b_type) = sorted([a, b])
+            keys.add((((int(d // 8) * 12 + a_angle) * 12 + b_angle) * 2 + a_type) * 2 + b_type)
+    return keys
+
+
+class FingerprintIndex:
+    # Store listener over records' fingerprint_template. Each template is
+    # posted under its minutia-pair hashes; a probe votes through those
+    # postings and only the best `candidates` records get full alignment.
+    # Postings are sets, so re-enrolling or removing a record takes its
+    # postings out in time proportional to its own keys, and every record
+    # votes at most once per key.
+    def __init__(self, candidates=20):
+        self.candidates = candidates
+        self._lock = threading.Lock()
+        self.clear()
+
+    def __len__(self):
+        return len(self._templates)
+
+    def clear(self):
+        with self._lock:
+            self._templates = {}
+            self._postings = {}
+
+    def add(self, record):
+        template = record.get('fingerprint_template')
+        if not template:
+            return
+        self.enroll(record['id'], decode_template(template))
+
+    def enroll(self, record_id, minutiae):
+        keys = pair_keys(minutiae)
+        with self._lock:
+            self._unindex(record_id)
+            self._templates[record_id] = minutiae
+            for key in keys:
+                self._postings.setdefault(key, set()).add(record_id)
+
+    def remove(self, record):
+        with self._lock:
+            self._unindex(record['id'])
+
+    def _unindex(self, record_id):
+        # Caller holds the lock. The template's keys are recomputed rather
+        # than stored per record.
+        minutiae = self._templates.pop(record_id, None)
+        if minutiae is None:
+            return
+        for key in pair_keys(minutiae):
+            postings = self._postings[key]
+            postings.discard(record_id)
+            if not postings:
+                del self._postings[key]
+
+    def search(self, minutiae, k=3):
+        keys = pair_keys(minutiae)
+        with self._lock:
+            postings = [np.fromiter(self._postings[key], np.int64) for key in keys if key in self._postings]
+        if not postings:
+            return []
+        ids, votes = np.unique(np.concatenate(postings), return_counts=True)
+        shortlist = ids[top_k(votes.astype(np.float32), self.candidates)]
+
+        with self._lock:
+            galleries = [(int(record_id), self._templates.get(int(record_id))) for record_id in shortlist]
+        scored = []
+        for record_id, gallery in galleries:
+            if gallery is not None:
+                scored.append((record_id, match_minutiae(minutiae, gallery)))
+        scored.sort(key=lambda s: -s[1])
+        return scored[:k]
@@ -0,0 +1,186 @@
+import io
+import json
+import shutil
+import tempfile
+from datetime import datetime
+from lazy import lazy_import
+from storage import CRIMINAL_COLUMNS
+
+pd = lazy_import('pandas')
+
+# ========== BULK IMPORT / EXPORT ==========
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet'
+}
+# Criminal.RECORD_FIELDS + created_at, without importing SQLAlchemy
+EXPORT_FIELDS = tuple(field for field, _ in CRIMINAL_COLUMNS if field != 'ai_models_used')
+# Imported records get fresh ids; prediction fields are filled in where missing
+IMPORT_FIELDS = tuple(field for field in EXPORT_FIELDS if field != 'id')
+INTEGER_FIELDS = ('id', 'age', 'prior_convictions')
+FLOAT_FIELDS = ('height', 'weight', 'recidivism_score', 'latitude', 'longitude')
+SEVERITIES = ('Low', 'Medium', 'High')
+MAX_AGE = 120
+
+
+def parse_format(fmt, mimetype=None):
+    # Explicit ?format= wins, then the request Content-Type
+    if not fmt and mimetype:
+        fmt = {mime: name for name, mime in FORMATS.items()}.get(mimetype)
+        if fmt is None and mimetype in ('application/jsonl', 'application/json'):
+            fmt = 'ndjson'
+    fmt = (fmt or 'csv').lower()
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported format {fmt}; use one of {", ".join(FORMATS)}')
+    if fmt == 'parquet':
+        _pyarrow()
+    return fmt
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError('Parquet support needs the pyarrow package')
+    return pyarrow
+
+
+def read_frames(stream, fmt, chunk_size=5000):
+    # Yields DataFrames of at most chunk_size rows from a binary stream
+    if fmt == 'csv':
+        yield from pd.read_csv(stream, chunksize=chunk_size, dtype=str, skipinitialspace=True)
+    elif fmt == 'ndjson':
+        text = io.TextIOWrapper(stream, encoding='utf-8')
+        yield from pd.read_json(text, lines=True, chunksize=chunk_size, dtype=False, convert_dates=False)
+    else:
+        # Parquet keeps its footer at the end, so spool to a seekable file
+        pa = _pyarrow()
+        with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as spooled:
+            shutil.copyfileobj(stream, spooled, 1024 * 1024)
+            spooled.seek(0)
+            for batch in pa.parquet.ParquetFile(spooled).iter_batches(batch_size=chunk_size):
+                yield batch.to_pandas()
+
+
+def _text(column):
+    column = column.astype(object)
+    present = column.notna()
+    column = column.where(~present, column.astype(str).str.strip())
+    return column.where(column != '', None)
+
+
+def validate_frame(frame, first_row=1):
+    # Column-wise clean-up and validation of one chunk. Returns the valid
+    # rows as record dicts plus a list of {row, error} for rejected ones.
+    frame = frame.reindex(columns=IMPORT_FIELDS)
+    problems = pd.Series('', index=frame.index, dtype=object)
+
+    def reject(mask, message):
+        problems[mask & (problems == '')] = message
+
+    for field in IMPORT_FIELDS:
+        if field in INTEGER_FIELDS or field in FLOAT_FIELDS:
+            raw = _text(frame[field])
+            values = pd.to_numeric(raw, errors='coerce')
+            reject(raw.notna() & values.isna(), f'{field} must be a number')
+            frame[field] = values
+        else:
+            frame[field] = _text(frame[field])
+
+    reject(frame['name'].isna(), 'name is required')
+    age = frame['age']
+    reject(age.notna() & ((age < 0) | (age > MAX_AGE) | (age % 1 != 0)), f'age must be a whole number 0-{MAX_AGE}')
+    priors = frame['prior_convictions']
+    reject(priors.notna() & ((priors < 0) | (priors % 1 != 0)), 'prior_convictions must be a whole number >= 0')
+    reject(frame['latitude'].notna() & frame['latitude'].abs().gt(90), 'latitude must be between -90 and 90')
+    reject(frame['longitude'].notna() & frame['longitude'].abs().gt(180), 'longitude must be between -180 and 180')
+    reject(frame['latitude'].isna() != frame['longitude'].isna(), 'latitude and longitude go together')
+
+    severity = frame['crime_severity'].str.title()
+    reject(severity.notna() & ~severity.isin(SEVERITIES), f'crime_severity must be one of {", ".join(SEVERITIES)}')
+    frame['crime_severity'] = severity.fillna('Medium')
+    frame['prior_convictions'] = priors.fillna(0)
+    frame['status'] = frame['status'].fillna('Wanted')
+    frame['created_at'] = frame['created_at'].fillna(datetime.now().isoformat())
+
+    valid = problems == ''
+    errors = [
+        {'row': first_row + position, 'error': message}
+        for position, message in enumerate(problems)
+        if message
+    ]
+    for field in INTEGER_FIELDS:
+        if field in frame:
+            frame[field] = frame[field].astype('Int64')
+    frame = frame[valid].astype(object)
+    records = frame.where(frame.notna(), None).to_dict('records')
+    return records, errors
+
+
+# ========== EXPORT WRITERS ==========
+def _project(records):
+    return [{field: record.get(field) for field in EXPORT_FIELDS} for record in records]
+
+
+class _Sink:
+    # Write-only file for pyarrow that hands out what was written since the
+    # last drain() while keeping the absolute position parquet offsets need
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _parquet_schema(pa):
+    types = {field: pa.int64() for field in INTEGER_FIELDS}
+    types.update({field: pa.float64() for field in FLOAT_FIELDS})
+    return pa.schema([(field, types.get(field, pa.string())) for field in EXPORT_FIELDS])
+
+
+def write_chunks(chunks, fmt):
+    # Turns an iterable of record lists into encoded bytes, one piece per
+    # chunk, so an export never holds more than one chunk in memory
+    if fmt == 'ndjson':
+        for records in chunks:
+            yield ''.join(json.dumps(record, default=str) + '\n' for record in _project(records)).encode()
+    elif fmt == 'csv':
+        header = True
+        for records in chunks:
+            frame = pd.DataFrame(_project(records), columns=list(EXPORT_FIELDS))
+            yield frame.to_csv(index=False, header=header).encode()
+            header = False
+        if header:
+            yield (','.join(EXPORT_FIELDS) + '\n').encode()
+    else:
+        pa = _pyarrow()
+        schema = _parquet_schema(pa)
+        sink = _Sink()
+        with pa.parquet.ParquetWriter(pa.PythonFile(sink, mode='w'), schema) as writer:
+            for records in chunks:
+                writer.write_table(pa.Table.from_pylist(_project(records), schema=schema))
+                yield sink.drain()
+        yield sink.drain()
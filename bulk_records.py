@@ -0,0 +1,43 @@
+import os
+import sys
+import argparse
+from app import initialize, import_records, iter_record_chunks, IMPORT_CHUNK_SIZE
+from bulk import parse_format, read_frames, write_chunks
+
+parser = argparse.ArgumentParser(description='Bulk import or export criminal records')
+parser.add_argument('command', choices=['import', 'export'])
+parser.add_argument('path', help='CSV, NDJSON or Parquet file')
+parser.add_argument('--format', help='csv, ndjson or parquet (default: from the file extension)')
+parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+args = parser.parse_args()
+
+extension = os.path.splitext(args.path)[1].lstrip('.').lower()
+try:
+    fmt = parse_format(args.format or {'jsonl': 'ndjson', 'json': 'ndjson'}.get(extension, extension))
+except ValueError as e:
+    sys.exit(f"✗ {e}")
+
+initialize()
+
+if args.command == 'import':
+    def progress(frames):
+        for frame in frames:
+            yield frame
+            print(f"✓ Imported {summary['imported']} criminals ({summary['rejected']} rejected)")
+    
+    summary = {'imported': 0, 'rejected': 0, 'errors': []}
+    with open(args.path, 'rb') as f:
+        try:
+            import_records(progress(read_frames(f, fmt, args.chunk_size)), summary)
+        except ValueError as e:
+            sys.exit(f"✗ Stopped after {summary['imported']} criminals: {e}")
+    for error in summary['errors']:
+        print(f"   row {error['row']}: {error['error']}")
+    print(f"Import complete: {summary['imported']} imported, {summary['rejected']} rejected")
+else:
+    written = 0
+    with open(args.path, 'wb') as f:
+        for data in write_chunks(iter_record_chunks(chunk_size=args.chunk_size), fmt):
+            f.write(data)
+            written += len(data)
+    print(f"Export complete: {args.path} ({written} bytes)")
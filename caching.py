@@ -0,0 +1,53 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def make_etag(*parts):
+    # Strong validator for a (view, query, data version) combination, so a
+    # matching If-None-Match can be answered without running the view
+    return hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+
+class ResponseCache:
+    # Serialized response bodies keyed by (endpoint, arguments, data version),
+    # evicted least recently used first once the bodies exceed max_bytes.
+    # Entries for old data versions are never hit again and age out.
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, headers):
+        if len(body) > self.max_bytes // 4:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[0])
+            self._entries[key] = (body, headers)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
@@ -0,0 +1,107 @@
+import secrets
+import threading
+from collections import deque
+from datetime import datetime
+from itertools import islice
+
+
+class StaleVersion(Exception):
+    # The version is older than the ring buffer, or from another stream (a
+    # restart, another worker process, a reset): the client has to reload
+    # the full list and continue from a current version
+    def __init__(self, version):
+        super().__init__(f"Version {version} is no longer available; reload and start from the current version")
+        self.version = version
+
+
+class ChangeBus:
+    # In-process pub/sub of record mutations. Every event gets the next
+    # sequence number and the last `capacity` events stay in a ring buffer,
+    # so a client that remembers the version of the last event it saw can
+    # fetch (since()) or wait for (wait()) only what happened after it.
+    # Versions read "<stream>-<sequence>". The stream id is random per bus
+    # and changes on reset(), so a version from before a restart or from
+    # another worker is reported as stale instead of being misread.
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self.stream = secrets.token_hex(4)
+        self.published = 0
+        self.subscribers = 0
+        self._seq = 0
+        self._events = deque(maxlen=capacity)
+        self._cond = threading.Condition()
+
+    @property
+    def version(self):
+        return f"{self.stream}-{self._seq}"
+
+    def publish(self, op, record_id, record=None):
+        self.publish_many([(op, record_id, record)])
+
+    def publish_many(self, changes):
+        # changes: (op, record id, record or None) in the order they happened
+        if not changes:
+            return
+        now = datetime.now().isoformat()
+        with self._cond:
+            for op, record_id, record in changes:
+                self._seq += 1
+                self._events.append((self._seq, {
+                    'version': f"{self.stream}-{self._seq}",
+                    'op': op,
+                    'id': record_id,
+                    'at': now,
+                    'record': record
+                }))
+            self.published += len(changes)
+            self._cond.notify_all()
+
+    def reset(self):
+        # Changes were missed (e.g. the store was reloaded from a snapshot):
+        # start a new stream so that every client resynchronizes
+        with self._cond:
+            self.stream = secrets.token_hex(4)
+            self._events.clear()
+            self._cond.notify_all()
+
+    def _parse(self, version):
+        # Sequence number of a version still covered by the buffer
+        stream, _, seq = str(version).partition('-')
+        if stream != self.stream or not seq.isdigit() or int(seq) > self._seq:
+            raise StaleVersion(version)
+        oldest = self._events[0][0] if self._events else self._seq + 1
+        if int(seq) < oldest - 1:
+            raise StaleVersion(version)
+        return int(seq)
+
+    def _after(self, seq, limit):
+        if not self._events:
+            return []
+        start = seq - self._events[0][0] + 1
+        return [event for _, event in islice(self._events, start, start + limit if limit else None)]
+
+    def since(self, version, limit=None):
+        # Events after `version`, oldest first, at most `limit`
+        with self._cond:
+            return self._after(self._parse(version), limit)
+
+    def wait(self, version, timeout, limit=None):
+        # Like since(), but blocks up to `timeout` seconds while there is
+        # nothing new; raises StaleVersion if the bus is reset meanwhile
+        with self._cond:
+            seq = self._parse(version)
+            stream = self.stream
+            self._cond.wait_for(lambda: self._seq > seq or self.stream != stream, timeout)
+            return self._after(self._parse(version), limit)
+
+    def subscribe(self, max_subscribers):
+        # Counts a streaming client in; False when there are too many
+        with self._cond:
+            if self.subscribers >= max_subscribers:
+                return False
+            self.subscribers += 1
+            return True
+
+    def unsubscribe(self):
+        with self._cond:
+            self.subscribers -= 1
@@ -0,0 +1,562 @@
+import os
+import sys
+import json
+import threading
+import warnings
+from datetime import datetime, timedelta
+import numpy as np
+
+# ========== COLUMNAR RECORD TABLE ==========
+# Column kinds:
+#   int      - int64, NULL_INT for None
+#   float    - float64, NaN for None
+#   time     - naive ISO timestamps as int64 microseconds since the epoch
+#   category - dictionary-encoded strings, int32 codes, -1 for None
+#   tags     - dictionary-encoded lists of strings (ai_models_used)
+#   text     - interned strings in a plain list
+# A value that does not fit its column (wrong type, a timestamp that would
+# not round-trip) and any field outside the schema is kept verbatim in a
+# per-record overflow dict, so get() always returns what was put().
+NULL_INT = np.iinfo(np.int64).min
+EPOCH = datetime(1970, 1, 1)
+CODED_KINDS = ('category', 'tags')
+MISSING = object()
+NULLS = {'int': NULL_INT, 'time': NULL_INT, 'float': np.nan, 'category': -1, 'tags': -1, 'text': None}
+SNAPSHOT_MAGIC = b'CRIMCOL1'
+SNAPSHOT_ALIGNMENT = 64
+
+
+class ColumnTable:
+    # Records stored column by column in dense slots 0..n-1. Ids are small
+    # non-negative integers that are never reused, so id -> slot is an
+    # array indexed by id (-1 for absent) rather than a dict. Removing a
+    # record moves the last slot into the hole, so the columns stay dense;
+    # `lock` guards slot positions and is held by every read and write, so
+    # callers holding it may use slots across calls.
+    def __init__(self, columns, capacity=1024):
+        self.columns = dict(columns)
+        self._bits = {field: 1 << i for i, field in enumerate(self.columns)}
+        self._all_bits = (1 << len(self.columns)) - 1
+        self.lock = threading.RLock()
+        self.clear(capacity)
+
+    def clear(self, capacity=1024):
+        with self.lock:
+            self._n = 0
+            self._capacity = capacity
+            self._slots = np.full(capacity, -1, dtype=np.int32)
+            self._ids = np.zeros(capacity, dtype=np.int64)
+            self._present = np.zeros(capacity, dtype=np.uint64)
+            self._data = {field: self._empty(kind, capacity) for field, kind in self.columns.items()}
+            self._values = {field: [] for field, kind in self.columns.items() if kind in CODED_KINDS}
+            self._codes = {field: {} for field, kind in self.columns.items() if kind in CODED_KINDS}
+            self._extra = {}
+
+    @staticmethod
+    def _empty(kind, size):
+        if kind == 'text':
+            return [None] * size
+        dtype = np.float64 if kind == 'float' else np.int32 if kind in CODED_KINDS else np.int64
+        return np.full(size, NULLS[kind], dtype=dtype)
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, record_id):
+        return self.slot(record_id) is not None
+
+    def _reserve(self, count, max_id):
+        # Room for `count` more slots and for ids up to max_id
+        while self._n + count > self._capacity:
+            extra = self._capacity
+            self._ids = np.concatenate([self._ids, np.zeros(extra, dtype=np.int64)])
+            self._present = np.concatenate([self._present, np.zeros(extra, dtype=np.uint64)])
+            for field, kind in self.columns.items():
+                column = self._data[field]
+                if isinstance(column, list):
+                    column.extend([None] * extra)
+                else:
+                    self._data[field] = np.concatenate([column, self._empty(kind, extra)])
+            self._capacity += extra
+        if max_id >= len(self._slots):
+            grown = np.full(max(max_id + 1, 2 * len(self._slots)), -1, dtype=np.int32)
+            grown[:len(self._slots)] = self._slots
+            self._slots = grown
+
+    # ----- encoding -----
+    def _encode(self, field, kind, value):
+        # Stored form of `value`, or raises TypeError/ValueError if it does
+        # not fit the column
+        if value is None:
+            return NULLS[kind]
+        if kind == 'int':
+            if type(value) is not int or value == NULL_INT:
+                raise TypeError(field)
+            return value
+        if kind == 'float':
+            if type(value) is not float or value != value:
+                raise TypeError(field)
+            return value
+        if kind == 'time':
+            moment = datetime.fromisoformat(value)
+            if moment.tzinfo is not None or moment.isoformat() != value:
+                raise ValueError(field)
+            return (moment - EPOCH) // timedelta(microseconds=1)
+        if kind == 'tags':
+            if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+                raise TypeError(field)
+            return self._code(field, tuple(value))
+        if not isinstance(value, str):
+            raise TypeError(field)
+        if kind == 'category':
+            return self._code(field, value)
+        return sys.intern(value)
+
+    def _code(self, field, value):
+        codes = self._codes[field]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self._values[field])
+            self._values[field].append(sys.intern(value) if isinstance(value, str) else value)
+        return code
+
+    def _decode(self, field, slots):
+        # Values of one column at the given slots (an int array), a column at a time
+        kind = self.columns[field]
+        data = self._data[field]
+        if kind == 'text':
+            return [data[slot] for slot in slots.tolist()]
+        values = data[slots].tolist()
+        if kind == 'category':
+            lookup = self._values[field] + [None]  # code -1 is the last item
+            return [lookup[code] for code in values]
+        if kind == 'tags':
+            lookup = self._values[field]
+            return [list(lookup[code]) if code >= 0 else None for code in values]
+        if kind == 'float':
+            return [None if v != v else v for v in values]
+        if kind == 'int':
+            return [None if v == NULL_INT else v for v in values]
+        missing = [v == NULL_INT for v in values]
+        moments = np.array([0 if m else v for v, m in zip(values, missing)], dtype='datetime64[us]')
+        # datetime.isoformat() leaves out zero microseconds
+        return [
+            None if m else text[:-7] if text.endswith('.000000') else text
+            for text, m in zip(np.datetime_as_string(moments, unit='us').tolist(), missing)
+        ]
+
+    def _encode_times(self, texts):
+        # Parses a batch of ISO strings (or None) in numpy; None unless every
+        # string round-trips exactly, in which case _encode() sorts them out
+        try:
+            with warnings.catch_warnings():
+                # numpy still parses UTC offsets, with a deprecation warning;
+                # treat them as the error they are about to become
+                warnings.simplefilter('error', DeprecationWarning)
+                moments = np.array([text or 'NaT' for text in texts], dtype='datetime64[us]')
+        except (ValueError, TypeError, DeprecationWarning):
+            return None
+        formatted = np.datetime_as_string(moments, unit='us').tolist()
+        for text, back in zip(texts, formatted):
+            if text is not None and text != back and not (back.endswith('.000000') and text == back[:-7]):
+                return None
+        column = moments.astype(np.int64)
+        column[np.isnat(moments)] = NULL_INT
+        return column.tolist()
+
+    # ----- rows -----
+    def put(self, record):
+        # Inserts or replaces the record with record['id']
+        self.put_many([record])
+
+    def put_many(self, records):
+        # Encodes the batch column by column
+        with self.lock:
+            ids = [record['id'] for record in records]
+            if not ids:
+                return
+            if not all(type(record_id) is int and record_id >= 0 for record_id in ids):
+                raise ValueError('Record ids must be non-negative integers')
+            self._reserve(len(ids), max(ids))
+            id_array = np.array(ids, dtype=np.int64)
+            if (self._slots[id_array] < 0).all() and len(np.unique(id_array)) == len(ids):
+                # All new (a load or an import): slots in one go
+                slots = np.arange(self._n, self._n + len(ids))
+                self._slots[id_array] = slots
+                self._ids[slots] = id_array
+                self._n += len(ids)
+            else:
+                slots = []
+                for record_id in ids:
+                    slot = self.slot(record_id)
+                    if slot is None:
+                        slot = self._n
+                        self._n += 1
+                        self._slots[record_id] = slot
+                        self._ids[slot] = record_id
+                    slots.append(slot)
+                slots = np.array(slots, dtype=np.int64)
+
+            present = np.zeros(len(records), dtype=np.uint64)
+            extras = [{} for _ in records]
+            for field, kind in self.columns.items():
+                values = [record.get(field, MISSING) for record in records]
+                column, rejected = self._encode_column(field, kind, values)
+                has = np.fromiter((value is not MISSING for value in values), dtype=bool, count=len(values))
+                for i in rejected:
+                    has[i] = False
+                    extras[i][field] = values[i]
+                present[has] |= np.uint64(self._bits[field])
+                data = self._data[field]
+                if isinstance(data, list):
+                    for slot, value in zip(slots.tolist(), column):
+                        data[slot] = value
+                else:
+                    data[slots] = column
+            self._present[slots] = present
+            for record_id, record, extra in zip(ids, records, extras):
+                for field in record.keys() - self.columns.keys():
+                    extra[field] = record[field]
+                if extra:
+                    self._extra[record_id] = extra
+                else:
+                    self._extra.pop(record_id, None)
+
+    def _encode_column(self, field, kind, values):
+        # (stored values, positions that did not fit) for one column of a
+        # batch. The common cases are single comprehensions; anything with an
+        # odd value goes through _encode() one value at a time.
+        null = NULLS[kind]
+        absent = (None, MISSING)
+        if kind == 'int' and all(type(v) is int and v != NULL_INT or v in absent for v in values):
+            return [null if v in absent else v for v in values], ()
+        if kind == 'float' and all(type(v) is float and v == v or v in absent for v in values):
+            return [null if v in absent else v for v in values], ()
+        if kind in ('category', 'text') and all(type(v) is str or v in absent for v in values):
+            if kind == 'text':
+                return [None if v in absent else sys.intern(v) for v in values], ()
+            codes = self._codes[field]
+            return [null if v in absent else codes[v] if v in codes else self._code(field, v) for v in values], ()
+        if kind == 'tags' and all(type(v) is list or v in absent for v in values):
+            # Few distinct lists: validate each one only when first coded
+            codes = self._codes[field]
+            column = [null if v in absent else codes.get(tuple(v)) for v in values]
+            for i, code in enumerate(column):
+                if code is None:
+                    tags = tuple(values[i])
+                    if tags not in codes and not all(isinstance(tag, str) for tag in tags):
+                        break
+                    column[i] = self._code(field, tags)
+            else:
+                return column, ()
+        if kind == 'time' and all(type(v) is str or v in absent for v in values):
+            column = self._encode_times([None if v in absent else v for v in values])
+            if column is not None:
+                return column, ()
+        column = []
+        rejected = []
+        for i, value in enumerate(values):
+            if value is MISSING:
+                column.append(null)
+                continue
+            try:
+                column.append(self._encode(field, kind, value))
+            except (TypeError, ValueError):
+                column.append(null)
+                rejected.append(i)
+        return column, rejected
+
+    def get(self, record_id):
+        with self.lock:
+            slot = self.slot(record_id)
+            return self._rows(np.array([slot]))[0] if slot is not None else None
+
+    def get_many(self, record_ids):
+        # Records for the ids, in the order given, None for missing ones
+        with self.lock:
+            slots = [self.slot(record_id) for record_id in record_ids]
+            rows = iter(self._rows(np.array([slot for slot in slots if slot is not None], dtype=np.int64)))
+            return [next(rows) if slot is not None else None for slot in slots]
+
+    def _rows(self, slots):
+        fields = list(self.columns)
+        columns = [self._decode(field, slots) for field in fields]
+        rows = []
+        for i, present in enumerate(self._present[slots].tolist()):
+            if present == self._all_bits:
+                rows.append({field: column[i] for field, column in zip(fields, columns)})
+            else:
+                rows.append({
+                    field: column[i] for field, column in zip(fields, columns) if present & self._bits[field]
+                })
+        if self._extra:
+            for row, record_id in zip(rows, self._ids[slots].tolist()):
+                extra = self._extra.get(record_id)
+                if extra:
+                    row.update(extra)
+        return rows
+
+    def value(self, record_id, field):
+        # One field of one record without materializing the rest
+        with self.lock:
+            slot = self.slot(record_id)
+            if slot is None:
+                return None
+            extra = self._extra.get(record_id)
+            if extra and field in extra:
+                return extra[field]
+            kind = self.columns.get(field)
+            if kind is None or not int(self._present[slot]) & self._bits[field]:
+                return None
+            value = self._data[field][slot]
+            if kind == 'text':
+                return value
+            if kind == 'float':
+                return None if value != value else float(value)
+            value = int(value)
+            if kind == 'category':
+                return self._values[field][value] if value >= 0 else None
+            if kind == 'tags':
+                return list(self._values[field][value]) if value >= 0 else None
+            if value == NULL_INT:
+                return None
+            return (EPOCH + timedelta(microseconds=value)).isoformat() if kind == 'time' else value
+
+    def pop(self, record_id):
+        # Removes a record and returns it, moving the last slot into its place
+        with self.lock:
+            slot = self.slot(record_id)
+            if slot is None:
+                return None
+            record = self._rows(np.array([slot]))[0]
+            self._slots[record_id] = -1
+            last = self._n - 1
+            if slot != last:
+                moved_id = int(self._ids[last])
+                self._ids[slot] = moved_id
+                self._present[slot] = self._present[last]
+                for field in self.columns:
+                    self._data[field][slot] = self._data[field][last]
+                self._slots[moved_id] = slot
+            for field, kind in self.columns.items():
+                self._data[field][last] = NULLS[kind]
+            self._present[last] = 0
+            self._extra.pop(record_id, None)
+            self._n = last
+            return record
+
+    def ids(self):
+        with self.lock:
+            return self._ids[:self._n].copy()
+
+    def rows(self):
+        # Every record, in id order
+        with self.lock:
+            return self._rows(np.argsort(self._ids[:self._n], kind='stable'))
+
+    # ----- vectorized access -----
+    def slot(self, record_id):
+        if 0 <= record_id < len(self._slots):
+            slot = int(self._slots[record_id])
+            if slot >= 0:
+                return slot
+        return None
+
+    def numbers(self, field):
+        # float64 copy of an int/float/time column over slots, NaN for None
+        column = self._data[field][:self._n]
+        if self.columns[field] == 'float':
+            return column.copy()
+        values = column.astype(np.float64)
+        values[column == NULL_INT] = np.nan
+        return values
+
+    def between(self, field, low=None, high=None):
+        # Boolean mask over slots; missing values never match
+        values = self.numbers(field)
+        mask = ~np.isnan(values)
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        return mask
+
+    def equals(self, field, value, normalize=lambda v: v):
+        # Boolean mask over slots of a category column, comparing normalize()d values
+        target = normalize(value)
+        codes = [code for code, v in enumerate(self._values[field]) if normalize(v) == target]
+        if target is None:
+            codes.append(-1)
+        return np.isin(self._data[field][:self._n], codes)
+
+    def value_counts(self, field, normalize=lambda v: v):
+        # {normalized value: count} of a category column, None for missing
+        counts = np.bincount(self._data[field][:self._n] + 1, minlength=len(self._values[field]) + 1)
+        result = {}
+        for code, count in enumerate(counts.tolist()):
+            if count:
+                key = normalize(self._values[field][code - 1]) if code else None
+                result[key] = result.get(key, 0) + count
+        return result
+
+    def project(self, fields):
+        # [{field: value}] for every record in id order, decoded a column at
+        # a time; overflow values take precedence
+        with self.lock:
+            slots = np.argsort(self._ids[:self._n], kind='stable')
+            columns = [
+                self._decode(field, slots) if field in self.columns else [None] * len(slots)
+                for field in fields
+            ]
+            rows = [dict(zip(fields, values)) for values in zip(*columns)]
+            if self._extra:
+                for row, record_id in zip(rows, self._ids[slots].tolist()):
+                    extra = self._extra.get(record_id)
+                    if extra:
+                        row.update((field, extra[field]) for field in fields if field in extra)
+            return rows
+
+    # ----- binary snapshots -----
+    def snapshot(self, meta=None, arrays=None):
+        # (header, arrays) for write_snapshot(): a copy of the table taken
+        # under the lock, plus JSON-able `meta` and extra named arrays that
+        # are stored alongside and handed back by restore()
+        with self.lock:
+            n = self._n
+            columns = {'slots': self._slots.copy(), 'ids': self._ids[:n].copy(), 'present': self._present[:n].copy()}
+            for field, kind in self.columns.items():
+                # Text columns stay lists here; write_snapshot() encodes them
+                columns[f"column:{field}"] = self._data[field][:n] if kind == 'text' else self._data[field][:n].copy()
+            header = {
+                'n': n,
+                'columns': self.columns,
+                'meta': dict(meta or {}),
+                'values': {field: list(values) for field, values in self._values.items()},
+                'extra': [[record_id, dict(extra)] for record_id, extra in self._extra.items()]
+            }
+        columns.update((f"array:{name}", array) for name, array in (arrays or {}).items())
+        return header, columns
+
+    def restore(self, path):
+        # Replaces the contents with a write_snapshot() file and returns
+        # (meta, extra arrays). Numeric columns stay memory-mapped until
+        # written to, so this costs about the same for any table size.
+        header, arrays = read_snapshot(path)
+        if list(header['columns'].items()) != list(self.columns.items()):
+            raise ValueError('Snapshot columns do not match the table')
+        n = header['n']
+        extra_arrays = {name[len('array:'):]: array for name, array in arrays.items() if name.startswith('array:')}
+        with self.lock:
+            if n == 0:
+                self.clear()
+                return header['meta'], extra_arrays
+            data = {}
+            for field, kind in self.columns.items():
+                if kind != 'text':
+                    data[field] = arrays[f"column:{field}"]
+                elif field in header['text']:
+                    data[field] = [None if value is None else sys.intern(value) for value in header['text'][field]]
+                else:
+                    data[field] = decode_text(arrays[f"column:{field}"], arrays[f"nulls:{field}"])
+            self._n = n
+            self._capacity = n
+            self._slots = arrays['slots']
+            self._ids = arrays['ids']
+            self._present = arrays['present']
+            self._data = data
+            self._values = {
+                field: [sys.intern(v) if self.columns[field] == 'category' else tuple(v) for v in values]
+                for field, values in header['values'].items()
+            }
+            self._codes = {field: {v: code for code, v in enumerate(values)} for field, values in self._values.items()}
+            self._extra = {record_id: extra for record_id, extra in header['extra']}
+        return header['meta'], extra_arrays
+
+
+# ========== BINARY SNAPSHOT FILES ==========
+# <magic><header length, 8 bytes little-endian><JSON header><arrays>
+# Each array starts on a 64-byte boundary past the header so it can be
+# memory-mapped in place. Text columns are stored as '\x00'-joined UTF-8
+# plus a null mask, or inside the header when a value contains '\x00'.
+def _aligned(size):
+    return -(-size // SNAPSHOT_ALIGNMENT) * SNAPSHOT_ALIGNMENT
+
+
+def encode_text(values):
+    # (UTF-8 bytes, null mask) as uint8/bool arrays, or None if the values
+    # cannot be joined on '\x00'
+    if any('\x00' in value for value in values if value is not None):
+        return None
+    joined = '\x00'.join('' if value is None else value for value in values).encode()
+    return np.frombuffer(joined, dtype=np.uint8), np.array([value is None for value in values], dtype=bool)
+
+
+def decode_text(data, nulls):
+    values = [sys.intern(value) for value in data.tobytes().decode().split('\x00')]
+    for i in np.flatnonzero(nulls).tolist():
+        values[i] = None
+    return values
+
+
+def write_snapshot(path, header, arrays):
+    # Writes a ColumnTable.snapshot() to `path` and fsyncs it
+    header = dict(header, text={})
+    encoded = {}
+    for name, array in arrays.items():
+        if isinstance(array, list):
+            field = name[len('column:'):]
+            text = encode_text(array)
+            if text is None:
+                header['text'][field] = array
+                continue
+            encoded[name], encoded[f"nulls:{field}"] = text
+        else:
+            encoded[name] = np.ascontiguousarray(array)
+
+    layout = {}
+    offset = 0
+    for name, array in encoded.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += _aligned(array.nbytes)
+    data = json.dumps(dict(header, arrays=layout), separators=(',', ':')).encode()
+    start = _aligned(len(SNAPSHOT_MAGIC) + 8 + len(data))
+    with open(path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC + len(data).to_bytes(8, 'little') + data)
+        for name, array in encoded.items():
+            f.seek(start + layout[name]['offset'])
+            f.write(array.data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_snapshot_header(f):
+    if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+        raise ValueError('Not a table snapshot')
+    length = int.from_bytes(f.read(8), 'little')
+    return json.loads(f.read(length)), _aligned(len(SNAPSHOT_MAGIC) + 8 + length)
+
+
+def snapshot_meta(path):
+    # The `meta` of a snapshot file without mapping its arrays
+    with open(path, 'rb') as f:
+        return read_snapshot_header(f)[0]['meta']
+
+
+def read_snapshot(path):
+    # (header, {name: array}). The arrays are views of one copy-on-write
+    # memory map, so pages are read on first touch and changes stay private
+    # to this process. Windows cannot replace a mapped file, so there the
+    # file is read into memory instead.
+    with open(path, 'rb') as f:
+        header, start = read_snapshot_header(f)
+    if os.name == 'nt':
+        buffer = np.fromfile(path, dtype=np.uint8)
+    else:
+        buffer = np.memmap(path, dtype=np.uint8, mode='c').view(np.ndarray)
+    arrays = {}
+    for name, spec in header.pop('arrays').items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        begin = start + spec['offset']
+        arrays[name] = buffer[begin:begin + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+    return header, arrays
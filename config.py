@@ -7,14 +7,98 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'criminal-investigation-secret-key-2024')
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///../database/criminals.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20))
+    }
+    # 'json' keeps criminals in memory backed by criminals.json; 'sql' uses
+    # the models.py tables and lets several worker processes share state
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json')
+    SQL_CHANGE_LOG_SIZE = 10000  # recent criminal_changes rows kept for workers to catch up from
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-2024')
+    SESSION_TTL = int(os.getenv('SESSION_TTL', 8 * 3600))  # seconds
+    SESSION_CACHE_SIZE = 10000  # verified tokens kept per worker
     UPLOAD_FOLDER = '../uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     
     # ML Model paths
     DECISION_TREE_MODEL = 'ml_models/decision_tree.pkl'
     NAIVE_BAYES_MODEL = 'ml_models/naive_bayes.pkl'
+    TRAINING_JOBS_FILE = 'ml_models/training_jobs.json'  # job status shared by all workers
     
     # Biometric thresholds
     FACE_MATCH_THRESHOLD = 0.6
-    FINGERPRINT_MATCH_THRESHOLD = 0.7
\ No newline at end of file
+    FINGERPRINT_MATCH_THRESHOLD = 0.2  # matched^2 / (probe * gallery minutiae)
+    
+    # Face vector index
+    FACE_EMBEDDING_MODEL = os.getenv('FACE_EMBEDDING_MODEL', 'ml_models/openface.nn4.small2.v1.t7')
+    FACE_INDEX_PATH = 'ml_models/face_index'
+    FACE_ANN_THRESHOLD = int(os.getenv('FACE_ANN_THRESHOLD', 100000))  # switch to IVF past this many faces
+    FACE_ANN_NPROBE = 8
+    FACE_TOP_K = 5
+    
+    # Fingerprint minutiae index
+    FINGERPRINT_CANDIDATES = 20  # records that get full alignment per probe
+    FINGERPRINT_TOP_K = 3
+    
+    # Photo storage (content-addressed originals, thumbnails, face crops)
+    THUMBNAIL_SIZES = (128, 512)
+    PHOTO_URL_TTL = 3600  # seconds a signed photo URL stays valid, at least
+    MEDIA_WORKERS = int(os.getenv('MEDIA_WORKERS', 2))
+    UPLOAD_CHUNK_SIZE = 64 * 1024
+    
+    # Name/location search index
+    SEARCH_FUZZY_CANDIDATES = 64  # vocabulary terms edit-distance checked per query token
+    SEARCH_MAX_EXPANSIONS = 16  # misspellings matched per query token
+    
+    # Geocoding and spatial index (last_known_location -> lat/lon)
+    GAZETTEER_FILE = os.getenv('GAZETTEER_FILE', 'gazetteer.csv')
+    GEO_CELL_DEGREES = 0.1  # spatial grid cell, about 11 km
+    HOTSPOT_CELL_DEGREES = 0.5  # default heatmap cell
+    MAX_RADIUS_KM = 2000
+    
+    # Asynchronous scan jobs (micro-batched by a worker thread pool)
+    SCAN_QUEUE_DEPTH = int(os.getenv('SCAN_QUEUE_DEPTH', 256))  # waiting jobs before 429
+    SCAN_WORKERS = int(os.getenv('SCAN_WORKERS', 2))
+    SCAN_MAX_BATCH = 32
+    SCAN_BATCH_WINDOW = 0.01  # seconds a short batch waits for more probes
+    SCAN_JOB_TTL = 600  # seconds finished jobs stay pollable
+    SCAN_JOBS_FILE = 'scan_jobs.json'  # job status shared by all workers
+    SCAN_JOBS_KEPT = 1000  # newest jobs kept in it
+    SCAN_MAX_WAIT = 30  # longest long-poll, seconds
+    
+    # Change feed (/api/changes)
+    CHANGES_BUFFER = int(os.getenv('CHANGES_BUFFER', 10000))  # recent changes kept for since= and SSE resumption
+    CHANGES_PAGE_SIZE = 1000  # most changes per JSON response or SSE write
+    CHANGES_MAX_STREAMS = int(os.getenv('CHANGES_MAX_STREAMS', 64))  # open SSE streams per worker
+    CHANGES_HEARTBEAT = 15  # seconds between SSE keep-alive comments
+    CHANGES_POLL_INTERVAL = 1  # seconds between SSE checks for other workers' changes
+    CHANGES_STREAM_SECONDS = 300  # SSE streams end after this and the client resumes
+    CHANGES_RETRY_MS = 3000  # reconnect delay suggested to SSE clients
+    
+    # Trend analytics (/api/analytics/trends)
+    TRENDS_TOP = 10  # values returned per dimension unless listed explicitly
+    TRENDS_MAX_BUCKETS = 10000  # a year of hours fits
+    TRENDS_DEFAULT_SPAN = {'hour': 48, 'day': 90, 'month': 24}  # buckets shown when no range is given
+    
+    # Duplicate detection (/api/dedup)
+    DEDUP_RESULTS_FILE = os.getenv('DEDUP_RESULTS_FILE', 'dedup_suggestions.json')
+    DEDUP_JOBS_FILE = DEDUP_RESULTS_FILE + '.jobs'  # job status shared by all workers
+    DEDUP_THRESHOLD = 0.8  # pair score from which two records are suggested for merging
+    DEDUP_MAX_BLOCK = 64  # larger candidate blocks are compared by sorted neighbourhood
+    DEDUP_WINDOW = 16  # neighbours compared per record in such blocks
+    DEDUP_MAX_SUGGESTIONS = 10000
+    
+    # Startup warm-up of indexes, faces and models (see /api/ready)
+    WARMUP_CHUNK_SIZE = 2000  # records fed to the indexes per table-lock hold
+    WARMUP_RETRY_AFTER = 1  # seconds, on 503s from routes still warming up
+    
+    # Instrumentation: /metrics and the sampling profiler
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # bearer token required on /metrics when set
+    PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', '0') == '1'
+    PROFILER_INTERVAL = 0.005  # seconds between stack samples
+    
+    # Serialized GET responses kept per worker, keyed by data version
+    RESPONSE_CACHE_BYTES = int(os.getenv('RESPONSE_CACHE_BYTES', 64 * 1024 * 1024))
\ No newline at end of file
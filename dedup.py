@@ -0,0 +1,337 @@
+import os
+import json
+import time
+from datetime import datetime
+from functools import lru_cache
+import numpy as np
+from biometrics import FaceIndex
+from search import tokenize, edit_distance
+
+# ========== ENTITY RESOLUTION ==========
+# Finds records that probably describe the same person. Comparing every
+# pair is O(N^2), so records are first grouped into blocks that share a
+# cheap key and only pairs inside a block are scored:
+#   name  - phonetic key of the name, plus gender
+#   body  - age, height and weight buckets, plus gender
+#   exact - every compared attribute identical (repeated submissions),
+#           for records with enough attributes to be told apart
+#   photo - the same photo file
+#   face  - random-hyperplane hashes of the face embedding (LSH tables)
+#   repeat - every field identical as submitted, for records too sparse
+#            for the exact pass ("Unknown", Assault, ...). Too little to
+#            score, so these pairs are reported whatever the threshold as
+#            low-confidence 'exact_repeat' suggestions scoring REPEAT_SCORE.
+# Blocks larger than max_block are sorted and each record is only compared
+# with its `window` successors (sorted neighbourhood), so the number of
+# pairs stays linear in the number of records.
+DEDUP_FIELDS = ('id', 'name', 'age', 'gender', 'height', 'weight', 'eye_color', 'hair_color', 'scars_marks',
+                'crime_type', 'crime_severity', 'prior_convictions', 'last_known_location', 'photo_hash')
+UNKNOWN_NAMES = {'', 'unknown', 'unknown person', 'na', 'n a', 'none'}
+# Attribute weights in the pair score; face covers the photo as well
+WEIGHTS = {
+    'face': 4.0, 'name': 3.0, 'age': 1.0, 'height': 1.0, 'scars_marks': 1.0, 'weight': 0.5,
+    'eye_color': 0.5, 'hair_color': 0.5, 'crime_type': 0.5, 'last_known_location': 0.5
+}
+MIN_EVIDENCE = 3.0  # total weight of attributes both records have, below which a pair is not suggested
+REPEAT_MIN_FIELDS = 3  # filled-in fields a record needs for the repeat pass
+REPEAT_SCORE = 0.5
+FACE_TABLES = 4
+FACE_BITS = 8
+SOUNDEX = {**dict.fromkeys('bfpv', '1'), **dict.fromkeys('cgjkqsxz', '2'), **dict.fromkeys('dt', '3'), 'l': '4',
+           **dict.fromkeys('mn', '5'), 'r': '6'}
+
+
+def soundex(word):
+    # American Soundex: first letter and three digits for the consonants
+    word = ''.join(ch for ch in word if ch.isalpha())
+    if not word:
+        return ''
+    code = word[0].upper()
+    last = SOUNDEX.get(word[0], '')
+    for ch in word[1:]:
+        digit = SOUNDEX.get(ch, '')
+        if digit and digit != last:
+            code += digit
+        if ch not in 'hw':
+            last = digit
+    return (code + '000')[:4]
+
+
+def normalize_name(name):
+    # Lowercased, accent-folded words, or None for placeholder names
+    name = ' '.join(tokenize(name))
+    return None if name in UNKNOWN_NAMES else name
+
+
+def name_key(name):
+    # Word order does not matter: "Smith John" and "Jon Smyth" share a key
+    return ' '.join(sorted(soundex(word) for word in name.split()))
+
+
+def number(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+        return None
+    return float(value)
+
+
+def height_cm(value):
+    # Heights are entered in centimetres, metres or feet
+    value = number(value)
+    if value is None or value <= 0:
+        return None
+    if value < 3:
+        return value * 100
+    if value < 8:
+        return value * 30.48
+    return value
+
+
+def label(value):
+    return (value.strip().casefold() or None) if isinstance(value, str) else None
+
+
+def bucket(value, width):
+    return None if value is None else int(value // width)
+
+
+def prepare(record):
+    return {
+        'id': record['id'],
+        'name': normalize_name(record.get('name')),
+        'age': number(record.get('age')),
+        'gender': label(record.get('gender')),
+        'height': height_cm(record.get('height')),
+        'weight': number(record.get('weight')),
+        'eye_color': label(record.get('eye_color')),
+        'hair_color': label(record.get('hair_color')),
+        'scars_marks': frozenset(tokenize(record.get('scars_marks'))) or None,
+        'crime_type': label(record.get('crime_type')),
+        'last_known_location': label(record.get('last_known_location')),
+        'photo_hash': record.get('photo_hash') or None
+    }
+
+
+def blocking_keys(person):
+    # {pass: key} for the passes this record takes part in
+    keys = {}
+    if person['name']:
+        keys['name'] = (name_key(person['name']), person['gender'])
+    if person['age'] is not None and (person['height'] is not None or person['weight'] is not None):
+        keys['body'] = (bucket(person['age'], 5), person['gender'], bucket(person['height'], 10),
+                        bucket(person['weight'], 10))
+    if sum(WEIGHTS.get(field, 0) for field, value in person.items() if value is not None) >= MIN_EVIDENCE:
+        keys['exact'] = tuple(value for field, value in person.items() if field != 'id')
+    if person['photo_hash']:
+        keys['photo'] = person['photo_hash']
+    return keys
+
+
+def repeat_key(record):
+    # The record's fields but the id as submitted (names not normalized
+    # away), or None when too few are filled in to call two records repeats
+    values = tuple(label(value) if isinstance(value, str) else value
+                   for value in (record.get(field) for field in DEDUP_FIELDS if field != 'id'))
+    return values if sum(value is not None for value in values) >= REPEAT_MIN_FIELDS else None
+
+
+def block_pairs(blocks, order, max_block, window):
+    # (i, j) index arrays of the pairs to compare, block by block: all
+    # pairs of a small block, or each record and its `window` successors
+    # in `order` for a large one
+    for members in blocks:
+        if len(members) < 2:
+            continue
+        members = np.asarray(members)
+        if len(members) <= max_block:
+            i, j = np.triu_indices(len(members), 1)
+        else:
+            members = members[np.argsort(order[members], kind='stable')]
+            offsets = range(1, min(window, len(members) - 1) + 1)
+            i = np.concatenate([np.arange(len(members) - k) for k in offsets])
+            j = i + np.concatenate([np.full(len(members) - k, k) for k in offsets])
+        yield members[i], members[j]
+
+
+def group(keys):
+    blocks = {}
+    for i, key in enumerate(keys):
+        if key is not None:
+            blocks.setdefault(key, []).append(i)
+    return list(blocks.values())
+
+
+@lru_cache(maxsize=100000)
+def name_similarity(a, b):
+    # 1 - normalized edit distance, also trying the words in sorted order;
+    # names more than a quarter apart count as different. Cached, as common
+    # names meet each other in many blocks.
+    if a == b:
+        return 1.0
+    pairs = [(a, b)]
+    swapped = ' '.join(sorted(a.split())), ' '.join(sorted(b.split()))
+    if swapped != (a, b):
+        pairs.append(swapped)
+    best = 0.0
+    for x, y in pairs:
+        longest = max(len(x), len(y))
+        limit = longest // 4
+        distance = edit_distance(x, y, limit)
+        if distance <= limit:
+            best = max(best, 1 - distance / longest)
+    return best
+
+
+def closeness(a, b, scale):
+    return max(0.0, 1 - abs(a - b) / scale)
+
+
+def score_pair(a, b, face=None):
+    # (score in [0, 1], {attribute: similarity}) over the attributes both
+    # records have; a gender mismatch rules the pair out
+    if a['gender'] and b['gender'] and a['gender'] != b['gender']:
+        return 0.0, {}
+    evidence = {}
+    if a['photo_hash'] and a['photo_hash'] == b['photo_hash']:
+        evidence['face'] = 1.0
+    elif face is not None:
+        evidence['face'] = face
+    if a['name'] and b['name']:
+        evidence['name'] = name_similarity(a['name'], b['name'])
+    if a['age'] is not None and b['age'] is not None:
+        evidence['age'] = closeness(a['age'], b['age'], 10)
+    if a['height'] is not None and b['height'] is not None:
+        evidence['height'] = closeness(a['height'], b['height'], 15)
+    if a['weight'] is not None and b['weight'] is not None:
+        evidence['weight'] = closeness(a['weight'], b['weight'], 20)
+    if a['scars_marks'] and b['scars_marks']:
+        evidence['scars_marks'] = len(a['scars_marks'] & b['scars_marks']) / len(a['scars_marks'] | b['scars_marks'])
+    for field in ('eye_color', 'hair_color', 'crime_type', 'last_known_location'):
+        if a[field] and b[field]:
+            evidence[field] = float(a[field] == b[field])
+    total = sum(WEIGHTS[field] for field in evidence)
+    if total < MIN_EVIDENCE:
+        # Too little to go on, even if what there is agrees
+        return 0.0, evidence
+    return sum(WEIGHTS[field] * value for field, value in evidence.items()) / total, evidence
+
+
+def face_blocks(vectors, seed=0):
+    # LSH: FACE_TABLES tables of FACE_BITS random hyperplanes; faces on the
+    # same side of every plane of a table share a block. Returns the blocks
+    # and a projection used to order oversized ones.
+    rng = np.random.default_rng(seed)
+    planes = rng.standard_normal((vectors.shape[1], FACE_TABLES * FACE_BITS + 1)).astype(np.float32)
+    projections = vectors @ planes
+    weights = 1 << np.arange(FACE_BITS)
+    blocks = []
+    for table in range(FACE_TABLES):
+        bits = projections[:, table * FACE_BITS:(table + 1) * FACE_BITS] > 0
+        blocks.extend(group((bits @ weights).tolist()))
+    return blocks, projections[:, -1]
+
+
+def find_duplicates(records, embeddings=None, threshold=0.8, face_threshold=0.6, max_block=64, window=16):
+    # Merge suggestions for `records` (dicts with DEDUP_FIELDS), best first,
+    # plus statistics. `embeddings` is (record ids, unit vectors) of the
+    # records that have an enrolled face.
+    started = time.monotonic()
+    people = [prepare(record) for record in records]
+    position = {person['id']: i for i, person in enumerate(people)}
+    # Oversized attribute blocks are ordered by name, then age and height
+    order = np.empty(len(people), dtype=np.int64)
+    ranked = sorted(range(len(people)), key=lambda i: (
+        people[i]['name'] or '', people[i]['age'] or -1, people[i]['height'] or -1, people[i]['id']
+    ))
+    order[ranked] = np.arange(len(people))
+
+    keys = [blocking_keys(person) for person in people]
+    passes = {name: group([k.get(name) for k in keys]) for name in ('name', 'body', 'exact', 'photo')}
+    stats = {'records': len(people), 'compared': 0, 'blocks': {name: len(blocks) for name, blocks in passes.items()}}
+    suggestions = {}
+
+    def consider(i, j, face=None):
+        a, b = people[i], people[j]
+        pair = (a['id'], b['id']) if a['id'] < b['id'] else (b['id'], a['id'])
+        if pair in suggestions:
+            return
+        stats['compared'] += 1
+        score, evidence = score_pair(a, b, face)
+        if score >= threshold:
+            suggestions[pair] = (score, evidence, 'match')
+
+    for name, blocks in passes.items():
+        for i, j in block_pairs(blocks, order, max_block, window):
+            for a, b in zip(i.tolist(), j.tolist()):
+                consider(a, b)
+
+    # Records the exact pass leaves out, submitted more than once
+    repeats = group([None if 'exact' in k else repeat_key(record) for record, k in zip(records, keys)])
+    stats['blocks']['repeat'] = len(repeats)
+    for i, j in block_pairs(repeats, order, max_block, window):
+        for a, b in zip(i.tolist(), j.tolist()):
+            a, b = sorted((people[a]['id'], people[b]['id']))
+            suggestions.setdefault((a, b), (REPEAT_SCORE, {}, 'exact_repeat'))
+
+    if embeddings is not None and len(embeddings[0]) > 1:
+        face_ids, vectors = embeddings
+        rows = np.array([position.get(record_id, -1) for record_id in face_ids])
+        known = rows >= 0
+        rows, vectors = rows[known], np.asarray(vectors, dtype=np.float32)[known]
+        blocks, face_order = face_blocks(vectors)
+        stats['blocks']['face'] = len(blocks)
+        for i, j in block_pairs(blocks, face_order, max_block, window):
+            # Only pairs whose faces match are worth scoring in Python
+            similarity = np.einsum('ij,ij->i', vectors[i], vectors[j])
+            close = similarity >= face_threshold
+            scaled = (similarity[close] - face_threshold) / (1 - face_threshold)
+            for a, b, face in zip(rows[i[close]].tolist(), rows[j[close]].tolist(), scaled.tolist()):
+                consider(a, b, min(1.0, face))
+
+    # Linked identities: connected components of the suggested pairs
+    parent = {}
+
+    def find(x):
+        while parent.get(x, x) != x:
+            parent[x] = parent.get(parent[x], parent[x])
+            x = parent[x]
+        return x
+
+    for a, b in suggestions:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    ranked = sorted(suggestions.items(), key=lambda item: (-item[1][0], item[0]))
+    stats.update(
+        suggestions=len(ranked),
+        clusters=len({find(record_id) for pair in suggestions for record_id in pair}),
+        seconds=round(time.monotonic() - started, 3)
+    )
+    return [
+        {
+            'ids': list(pair),
+            'score': round(score, 4),
+            'kind': kind,
+            'cluster': find(pair[0]),
+            'evidence': {field: round(value, 3) for field, value in evidence.items()}
+        }
+        for pair, (score, evidence, kind) in ranked
+    ], stats
+
+
+def run_dedup(records, results_path, face_index_path=None, face_dim=None, max_suggestions=10000, **options):
+    # Entry point for the background worker process: reads the face
+    # embeddings from the shared index files, finds duplicates and writes
+    # the suggestions to results_path (replaced atomically). Returns the
+    # statistics.
+    embeddings = None
+    if face_index_path and face_dim and os.path.exists(face_index_path + '.json'):
+        # No IVF build here: only the stored vectors are read
+        face_index = FaceIndex(face_index_path, face_dim, ann_threshold=float('inf'))
+        embeddings = face_index.embeddings([record['id'] for record in records])
+    suggestions, stats = find_duplicates(records, embeddings, **options)
+    stats['generated_at'] = datetime.now().isoformat()
+    tmp_path = results_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(dict(stats, suggestions=suggestions[:max_suggestions]), f)
+    os.replace(tmp_path, results_path)
+    return stats
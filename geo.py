@@ -0,0 +1,218 @@
+import csv
+import math
+import threading
+from storage import index_key
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def valid_point(lat, lon):
+    return lat is not None and lon is not None and -90 <= lat <= 90 and -180 <= lon <= 180
+
+
+def radius_bboxes(lat, lon, radius_km):
+    # [(min_lat, min_lon, max_lat, max_lon)] enclosing the circle: one box,
+    # or two when it crosses the antimeridian and wraps to the other side
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    dlon = 180.0 if abs(lat) + dlat >= 90 else dlat / math.cos(math.radians(abs(lat) + dlat))
+    if dlon >= 180:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    west, east = lon - dlon, lon + dlon
+    if west < -180:
+        return [(min_lat, west + 360, max_lat, 180.0), (min_lat, -180.0, max_lat, east)]
+    if east > 180:
+        return [(min_lat, west, max_lat, 180.0), (min_lat, -180.0, max_lat, east - 360)]
+    return [(min_lat, west, max_lat, east)]
+
+
+# ========== GAZETTEER ==========
+class Gazetteer:
+    # Place name -> (lat, lon) from a local CSV with name, latitude, longitude
+    # columns; lookups use index_key() so "Pune" and " pune" agree
+    def __init__(self, path=None):
+        self.places = {}
+        if path is not None:
+            self.load(path)
+
+    def __len__(self):
+        return len(self.places)
+
+    def load(self, path):
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    self.places[index_key(row['name'])] = (float(row['latitude']), float(row['longitude']))
+        except FileNotFoundError:
+            print(f"✗ Gazetteer {path} not found; locations will not be geocoded")
+
+    def lookup(self, location):
+        # Whole string first, then its comma-separated parts, most specific
+        # first ("Shivaji Nagar, Pune" falls back to "pune")
+        if not isinstance(location, str):
+            return None
+        point = self.places.get(index_key(location))
+        if point is None:
+            for part in location.split(','):
+                point = self.places.get(index_key(part))
+                if point is not None:
+                    break
+        return point
+
+
+# ========== SPATIAL INDEX ==========
+class GeoIndex:
+    # Store listener that buckets records into a uniform lat/lon grid of
+    # cell_degrees cells, {cell: {id: (lat, lon)}}. Area queries visit only
+    # the cells overlapping the area (or only the occupied cells, when there
+    # are fewer), and just the border cells need a per-point check.
+    # Each cell also keeps (count, lat sum, lon sum) for hotspot maps.
+    # Records without coordinates are placed by their last_known_location.
+    def __init__(self, gazetteer=None, cell_degrees=0.1):
+        self.gazetteer = gazetteer
+        self.cell_degrees = cell_degrees
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._cells = {}
+            self._sums = {}
+            self._points = {}
+
+    def __len__(self):
+        return len(self._points)
+
+    def point(self, record):
+        lat, lon = record.get('latitude'), record.get('longitude')
+        if valid_point(lat, lon):
+            return lat, lon
+        if self.gazetteer is not None:
+            return self.gazetteer.lookup(record.get('last_known_location'))
+        return None
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees))
+
+    def add(self, record):
+        point = self.point(record)
+        with self._lock:
+            self._remove(record['id'])
+            if point is None:
+                return
+            cell = self._cell(*point)
+            self._cells.setdefault(cell, {})[record['id']] = point
+            self._points[record['id']] = cell
+            sums = self._sums.setdefault(cell, [0, 0.0, 0.0])
+            sums[0] += 1
+            sums[1] += point[0]
+            sums[2] += point[1]
+
+    def remove(self, record):
+        with self._lock:
+            self._remove(record['id'])
+
+    def _remove(self, record_id):
+        cell = self._points.pop(record_id, None)
+        if cell is not None:
+            bucket = self._cells[cell]
+            lat, lon = bucket.pop(record_id)
+            if not bucket:
+                del self._cells[cell]
+                del self._sums[cell]
+            else:
+                sums = self._sums[cell]
+                sums[0] -= 1
+                sums[1] -= lat
+                sums[2] -= lon
+
+    def _cells_in(self, bbox):
+        # (cell, bucket, whole cell inside bbox) for every occupied cell overlapping it
+        min_lat, min_lon, max_lat, max_lon = bbox
+        low_i, low_j = self._cell(min_lat, min_lon)
+        high_i, high_j = self._cell(max_lat, max_lon)
+        size = self.cell_degrees
+
+        def inside(i, j):
+            return (min_lat <= i * size and (i + 1) * size <= max_lat
+                    and min_lon <= j * size and (j + 1) * size <= max_lon)
+
+        if (high_i - low_i + 1) * (high_j - low_j + 1) <= len(self._cells):
+            for i in range(low_i, high_i + 1):
+                for j in range(low_j, high_j + 1):
+                    bucket = self._cells.get((i, j))
+                    if bucket:
+                        yield (i, j), bucket, inside(i, j)
+        else:
+            for (i, j), bucket in self._cells.items():
+                if low_i <= i <= high_i and low_j <= j <= high_j:
+                    yield (i, j), bucket, inside(i, j)
+
+    def _points_in(self, bbox):
+        min_lat, min_lon, max_lat, max_lon = bbox
+        for _, bucket, whole in self._cells_in(bbox):
+            for record_id, (lat, lon) in bucket.items():
+                if whole or (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+                    yield record_id, lat, lon
+
+    def within_bbox(self, bbox, limit=None):
+        # Ids of the points inside (min_lat, min_lon, max_lat, max_lon), by id
+        with self._lock:
+            ids = sorted(record_id for record_id, _, _ in self._points_in(bbox))
+        return ids[:limit] if limit is not None else ids
+
+    def within_radius(self, lat, lon, radius_km, limit=None):
+        # [(id, distance_km)] within radius_km of the point, nearest first
+        with self._lock:
+            hits = []
+            # The boxes never overlap, so no point is visited twice
+            for bbox in radius_bboxes(lat, lon, radius_km):
+                for record_id, point_lat, point_lon in self._points_in(bbox):
+                    distance = haversine_km(lat, lon, point_lat, point_lon)
+                    if distance <= radius_km:
+                        hits.append((record_id, distance))
+        hits.sort(key=lambda hit: (hit[1], hit[0]))
+        return hits[:limit] if limit is not None else hits
+
+    def hotspots(self, bboxes=None, cell_degrees=None, limit=None):
+        # Point counts per heatmap cell (a whole number of grid cells wide)
+        # with each cell's centroid, busiest first, over a list of
+        # non-overlapping boxes (the whole map if None). Grid cells wholly
+        # inside a box contribute their running sums; only border cells
+        # visit points.
+        bboxes = bboxes or [(-90.0, -180.0, 90.0, 180.0)]
+        factor = max(1, round((cell_degrees or self.cell_degrees) / self.cell_degrees))
+        totals = {}
+        with self._lock:
+            for bbox in bboxes:
+                min_lat, min_lon, max_lat, max_lon = bbox
+                for (i, j), bucket, whole in self._cells_in(bbox):
+                    if whole:
+                        count, lat_sum, lon_sum = self._sums[(i, j)]
+                    else:
+                        points = [
+                            (lat, lon) for lat, lon in bucket.values()
+                            if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon
+                        ]
+                        if not points:
+                            continue
+                        count = len(points)
+                        lat_sum = sum(lat for lat, _ in points)
+                        lon_sum = sum(lon for _, lon in points)
+                    total = totals.setdefault((i // factor, j // factor), [0, 0.0, 0.0])
+                    total[0] += count
+                    total[1] += lat_sum
+                    total[2] += lon_sum
+        spots = [
+            {'latitude': round(lat_sum / count, 5), 'longitude': round(lon_sum / count, 5), 'count': count}
+            for count, lat_sum, lon_sum in totals.values()
+        ]
+        spots.sort(key=lambda spot: (-spot['count'], spot['latitude'], spot['longitude']))
+        return spots[:limit] if limit is not None else spots
@@ -0,0 +1,95 @@
+import sys
+import time
+import threading
+import importlib.util
+
+DONE = ('ready', 'failed')
+
+
+def lazy_import(name):
+    # Module object that only runs the module's code on first attribute
+    # access, so heavy dependencies (OpenCV, pandas, Pillow) cost nothing at
+    # startup and are paid for by the first request or warm-up that uses them
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+class Warmup:
+    # Named startup steps, each a callable taking progress(done, total),
+    # with their status for a readiness endpoint. run() performs one step
+    # in the calling thread; start() runs the remaining ones in order on a
+    # daemon thread. A failed step counts as done, like a failed load at
+    # startup always has. Until the warm-up begins every step reports
+    # ready, so code that never starts it (scripts, tests) is not held up.
+    def __init__(self):
+        self._steps = {}
+        self._state = {}
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._began = None
+
+    def add(self, name, warm):
+        self._steps[name] = warm
+        self._state[name] = {'status': 'pending', 'progress': 0.0}
+
+    def run(self, name):
+        if self._began is None:
+            self._began = time.monotonic()
+        started = time.monotonic()
+        self._update(name, status='warming')
+
+        def progress(done, total):
+            self._update(name, progress=round(done / total, 3) if total else 1.0)
+
+        try:
+            self._steps[name](progress)
+        except Exception as e:
+            print(f"✗ Warm-up of {name} failed: {e}")
+            self._update(name, status='failed', error=str(e))
+        else:
+            self._update(name, status='ready', progress=1.0)
+        self._update(name, seconds=round(time.monotonic() - started, 3))
+
+    def start(self):
+        if self._began is None:
+            self._began = time.monotonic()
+        threading.Thread(target=self._run_pending, name='warmup', daemon=True).start()
+
+    def _run_pending(self):
+        for name in self._steps:
+            if self._state[name]['status'] == 'pending':
+                self.run(name)
+        self._finished.set()
+
+    def _update(self, name, **changes):
+        with self._lock:
+            self._state[name] = dict(self._state[name], **changes)
+
+    def ready(self, *names):
+        # Whether the named steps (all steps when none are named) are done
+        if self._began is None:
+            return True
+        return all(self._state[name]['status'] in DONE for name in names or self._state)
+
+    def wait(self, timeout=None):
+        # Blocks until the steps started by start() are done
+        return self._finished.wait(timeout)
+
+    def status(self):
+        with self._lock:
+            steps = {name: dict(state) for name, state in self._state.items()}
+        return {
+            'warm': self.ready(),
+            'seconds': round(time.monotonic() - self._began, 3) if self._began is not None else 0.0,
+            'steps': steps
+        }
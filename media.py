@@ -0,0 +1,152 @@
+import os
+import hashlib
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from lazy import lazy_import
+
+cv2 = lazy_import('cv2')
+Image = lazy_import('PIL.Image')
+ImageOps = lazy_import('PIL.ImageOps')
+
+# Leading bytes -> (mimetype, extension) for the image formats we accept
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'image/jpeg', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png', '.png'),
+    (b'GIF87a', 'image/gif', '.gif'),
+    (b'GIF89a', 'image/gif', '.gif'),
+    (b'BM', 'image/bmp', '.bmp'),
+)
+
+
+def sniff_image(head):
+    for signature, mimetype, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mimetype, ext
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp', '.webp'
+    return 'application/octet-stream', ''
+
+
+class MediaStore:
+    # Content-addressed files under `root`:
+    #   originals/ab/<sha256><ext>        uploaded bytes, stored once per content
+    #   thumbs/<size>/ab/<sha256>.jpg     downscaled JPEGs
+    #   faces/ab/<sha256>.jpg             detected face crop
+    # Uploads are hashed while they are copied to disk in chunks, so a
+    # re-upload of the same image only costs the copy and is then discarded.
+    # Derivatives are rendered on a thread pool (Pillow and OpenCV release the
+    # GIL while resizing and encoding) and on demand if not ready yet.
+    def __init__(self, root, thumbnail_sizes=(128, 512), crop_face=None, workers=2, chunk_size=64 * 1024):
+        self.root = root
+        self.thumbnail_sizes = tuple(thumbnail_sizes)
+        self.crop_face = crop_face
+        self.chunk_size = chunk_size
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='media')
+        self._pending = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, 'tmp'), exist_ok=True)
+
+    def _shard(self, *parts):
+        *dirs, name = parts
+        return os.path.join(self.root, *dirs, name[:2], name)
+
+    def original_path(self, digest):
+        directory = os.path.dirname(self._shard('originals', digest))
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.startswith(digest):
+                    return os.path.join(directory, name)
+        return None
+
+    def variant_path(self, digest, variant, size=None):
+        if variant == 'original':
+            return self.original_path(digest)
+        if variant == 'thumb':
+            return self._shard('thumbs', str(size), digest + '.jpg')
+        if variant == 'face':
+            return self._shard('faces', digest + '.jpg')
+        raise ValueError(f'Unknown variant {variant}')
+
+    def save(self, stream):
+        # Returns (digest, path); the path is shared by every identical upload
+        sha256 = hashlib.sha256()
+        tmp_path = os.path.join(self.root, 'tmp', secrets.token_hex(8))
+        head = b''
+        try:
+            with open(tmp_path, 'wb') as f:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    if len(head) < 16:
+                        head += chunk[:16]
+                    sha256.update(chunk)
+                    f.write(chunk)
+            digest = sha256.hexdigest()
+            _, ext = sniff_image(head)
+            path = self._shard('originals', digest + ext)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest, path
+
+    def schedule_derivatives(self, digest):
+        # One in-flight job per digest; duplicate uploads share it
+        with self._lock:
+            future = self._pending.get(digest)
+            if future is None:
+                future = self._pool.submit(self._render, digest)
+                self._pending[digest] = future
+                future.add_done_callback(lambda _: self._forget(digest))
+            return future
+
+    def _forget(self, digest):
+        with self._lock:
+            self._pending.pop(digest, None)
+
+    def derivative(self, digest, variant, size=None):
+        # Path of a rendered derivative, rendering it now if the worker has
+        # not got to it yet
+        path = self.variant_path(digest, variant, size)
+        if path is None or os.path.exists(path):
+            return path
+        if self.original_path(digest) is None:
+            return None
+        self.schedule_derivatives(digest).result()
+        return path if os.path.exists(path) else None
+
+    def _render(self, digest):
+        source = self.original_path(digest)
+        if source is None:
+            return
+        try:
+            with Image.open(source) as image:
+                image = ImageOps.exif_transpose(image).convert('RGB')
+                for size in self.thumbnail_sizes:
+                    path = self.variant_path(digest, 'thumb', size)
+                    if not os.path.exists(path):
+                        thumb = image.copy()
+                        thumb.thumbnail((size, size), Image.LANCZOS)
+                        self._write_jpeg(thumb, path)
+
+                path = self.variant_path(digest, 'face')
+                if self.crop_face is not None and not os.path.exists(path):
+                    face = self.crop_face(cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR))
+                    self._write_jpeg(Image.fromarray(cv2.cvtColor(face, cv2.COLOR_BGR2RGB)), path)
+        except Exception as e:
+            print(f"✗ Could not render derivatives for {digest}: {e}")
+
+    @staticmethod
+    def _write_jpeg(image, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{secrets.token_hex(4)}.tmp"
+        image.save(tmp_path, 'JPEG', quality=85, optimize=True)
+        os.replace(tmp_path, path)
@@ -0,0 +1,246 @@
+import os
+import sys
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds in seconds; one more (+Inf) bucket catches the rest
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ========== METRIC TYPES ==========
+class Metric:
+    # One metric family; samples are keyed by the tuple of label values in
+    # `labels` order. Updates take a per-metric lock, which is uncontended
+    # in the common case and costs well under a microsecond.
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        # {label values: value} copied under the lock; histogram values are
+        # (counts per bucket, sum, count)
+        with self._lock:
+            return {values: self._copy(value) for values, value in self._values.items()}
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self._lines(items))
+        return lines
+
+    def _lines(self, items):
+        return [f"{self.name}{format_labels(self.labels, values)} {format_value(value)}" for values, value in items]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(Metric):
+    # Per label set: [count per bucket (not cumulative), sum, count]
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bucket] += 1
+            state[1] += value
+            state[2] += 1
+
+    @staticmethod
+    def _copy(value):
+        counts, total, count = value
+        return list(counts), total, count
+
+    def _lines(self, items):
+        lines = []
+        for values, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = format_labels(self.labels, values, f'le="{format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+# ========== REGISTRY ==========
+class Metrics:
+    # Registry rendered in the Prometheus text exposition format. Besides the
+    # metrics it owns, collectors (callables returning
+    # [(name, kind, help, [(labels dict, value)])]) report values that live
+    # elsewhere, such as queue depths, at scrape time.
+    # Every worker process has its own registry; scrape each worker.
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self.sections = self.histogram('app_section_duration_seconds', 'Time spent in named internal sections',
+                                       ('section',))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self._register(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def collector(self, collect):
+        self._collectors.append(collect)
+        return collect
+
+    @contextmanager
+    def timer(self, section):
+        # with metrics.timer('save_data'): ...
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections.observe(time.perf_counter() - start, section)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                print(f"✗ Metrics collector failed: {e}")
+                continue
+            for name, kind, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{format_labels(labels.keys(), labels.values())} {format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+# ========== SAMPLING PROFILER ==========
+class SamplingProfiler:
+    # While running, a daemon thread wakes every `interval` seconds and walks
+    # the stacks of the threads returned by `threads()` (all threads but its
+    # own when None), counting identical stacks. Nothing is added to the
+    # profiled code paths, so it can be switched on in production.
+    # report() is the collapsed-stack format ("root;caller;leaf count") read
+    # by flamegraph.pl and speedscope.
+    def __init__(self, interval=0.005, threads=None, max_depth=64):
+        self.interval = interval
+        self.threads = threads
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None):
+        if interval:
+            self.interval = interval
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self._stacks = {}
+            self.samples = 0
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            wanted = self.threads() if self.threads is not None else None
+            frames = sys._current_frames()
+            with self._lock:
+                self.samples += 1
+                for thread_id, frame in frames.items():
+                    if thread_id == own or (wanted is not None and thread_id not in wanted):
+                        continue
+                    stack = []
+                    while frame is not None and len(stack) < self.max_depth:
+                        code = frame.f_code
+                        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                        frame = frame.f_back
+                    key = ';'.join(reversed(stack))
+                    self._stacks[key] = self._stacks.get(key, 0) + 1
+
+    def report(self, limit=None):
+        with self._lock:
+            stacks = sorted(self._stacks.items(), key=lambda item: -item[1])
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks[:limit])
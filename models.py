@@ -31,8 +31,11 @@ class Criminal(db.Model):
     crime_severity = db.Column(db.String(20))  # Low, Medium, High
     prior_convictions = db.Column(db.Integer, default=0)
     last_known_location = db.Column(db.String(200))
+    latitude = db.Column(db.Float)  # last_known_location geocoded at write time
+    longitude = db.Column(db.Float)
     status = db.Column(db.String(20), default='Wanted')  # Wanted, Arrested, Released
     photo_path = db.Column(db.String(300))
+    photo_hash = db.Column(db.String(64))
     fingerprint_path = db.Column(db.String(300))
     facial_features = db.Column(db.Text)  # JSON string of facial features
     fingerprint_template = db.Column(db.Text)  # Fingerprint template data
@@ -50,4 +53,57 @@ class Criminal(db.Model):
     # Prediction features
     recidivism_score = db.Column(db.Float)
     danger_level = db.Column(db.String(20))
-    predicted_crime_type = db.Column(db.String(100))
\ No newline at end of file
+    predicted_crime_type = db.Column(db.String(100))
+    
+    # Filters compare lower(column) so they match the JSON store's
+    # case-insensitive indexes
+    __table_args__ = (
+        db.Index('ix_criminals_status', db.func.lower(status)),
+        db.Index('ix_criminals_danger_level', db.func.lower(danger_level)),
+        db.Index('ix_criminals_crime_type', db.func.lower(crime_type)),
+        db.Index('ix_criminals_crime_severity', db.func.lower(crime_severity)),
+        db.Index('ix_criminals_last_known_location', db.func.lower(last_known_location)),
+        # Never reuse the id of a deleted row (SQLite otherwise does)
+        {'sqlite_autoincrement': True}
+    )
+    
+    RECORD_FIELDS = (
+        'id', 'name', 'age', 'gender', 'crime_type', 'crime_severity', 'prior_convictions',
+        'last_known_location', 'latitude', 'longitude', 'status', 'photo_path', 'photo_hash', 'fingerprint_path', 'fingerprint_template',
+        'height', 'weight', 'eye_color', 'hair_color', 'scars_marks', 'danger_level',
+        'predicted_crime_type', 'recidivism_score'
+    )
+    
+    def to_dict(self):
+        # Same shape as the records kept in criminals.json
+        record = {field: getattr(self, field) for field in self.RECORD_FIELDS}
+        record['created_at'] = self.created_at.isoformat() if self.created_at else None
+        record['ai_models_used'] = ['Decision Tree', 'Naive Bayes']
+        return record
+    
+    @classmethod
+    def mapping(cls, record):
+        # Column values for a record dict, for both ORM and bulk inserts
+        values = {field: record.get(field) for field in cls.RECORD_FIELDS if record.get(field) is not None}
+        if record.get('created_at'):
+            values['created_at'] = datetime.fromisoformat(record['created_at'])
+        return values
+
+class CriminalChange(db.Model):
+    # Every insert into or delete from criminals, appended in the same
+    # transaction; worker processes follow it by seq to keep their in-memory
+    # indexes current (see sql_storage.SQLCriminalStore.sync)
+    __tablename__ = 'criminal_changes'
+    
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    op = db.Column(db.String(10), nullable=False)  # put, delete
+    record_id = db.Column(db.Integer, nullable=False)
+    record = db.Column(db.Text, nullable=False)  # JSON of the row written or removed
+
+class CriminalVersion(db.Model):
+    # Single row holding the last seq handed out. Writers bump it in their
+    # transaction, so its row lock makes seqs commit in order.
+    __tablename__ = 'criminal_version'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    seq = db.Column(db.Integer, nullable=False, default=0)
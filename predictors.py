@@ -0,0 +1,168 @@
+import os
+import pickle
+from datetime import datetime
+import numpy as np
+
+# ========== FEATURE ENCODING ==========
+# Column order of the matrix produced by encode_features()
+AGE, GENDER, PRIOR_CONVICTIONS, CRIME_SEVERITY = range(4)
+FEATURE_NAMES = ['age', 'gender', 'prior_convictions', 'crime_severity']
+
+GENDER_CODES = {'Male': 0, 'Female': 1}
+SEVERITY_CODES = {'Low': 0, 'Medium': 1, 'High': 2}
+UNKNOWN_CODE = -1
+
+
+def _number(value, default):
+    if value is None or value == '':
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def encode_features(rows):
+    # One pass over the feature dicts into an (n, 4) float matrix, using the
+    # same defaults as the single-record predict() methods
+    return np.array([
+        (
+            _number(row.get('age'), 30),
+            GENDER_CODES.get(row.get('gender', 'Male'), UNKNOWN_CODE),
+            _number(row.get('prior_convictions'), 0),
+            SEVERITY_CODES.get(row.get('crime_severity', 'Medium'), UNKNOWN_CODE)
+        )
+        for row in rows
+    ], dtype=np.float64).reshape(-1, len(FEATURE_NAMES))
+
+
+# ========== SIMPLE AI MODELS ==========
+class SimpleCriminalPredictor:
+    def predict(self, features):
+        prior_convictions = features.get('prior_convictions', 0)
+        crime_severity = features.get('crime_severity', 'Medium')
+
+        if prior_convictions >= 3 or crime_severity == 'High':
+            return 'High'
+        elif prior_convictions >= 1 or crime_severity == 'Medium':
+            return 'Medium'
+        else:
+            return 'Low'
+
+    def predict_batch(self, X):
+        prior_convictions = X[:, PRIOR_CONVICTIONS]
+        crime_severity = X[:, CRIME_SEVERITY]
+        return np.select(
+            [
+                (prior_convictions >= 3) | (crime_severity == SEVERITY_CODES['High']),
+                (prior_convictions >= 1) | (crime_severity == SEVERITY_CODES['Medium'])
+            ],
+            ['High', 'Medium'],
+            'Low'
+        )
+
+class SimpleCrimeTypePredictor:
+    def predict(self, features):
+        age = features.get('age', 30)
+        prior_convictions = features.get('prior_convictions', 0)
+
+        # Simple age-based prediction
+        if age < 25:
+            return 'Theft'
+        elif age < 35:
+            return 'Assault'
+        elif age < 50:
+            return 'Fraud'
+        else:
+            return 'Drug Offense'
+
+    def predict_batch(self, X):
+        age = X[:, AGE]
+        return np.select([age < 25, age < 35, age < 50], ['Theft', 'Assault', 'Fraud'], 'Drug Offense')
+
+
+def recidivism_risk_batch(X):
+    prior_convictions = X[:, PRIOR_CONVICTIONS]
+    return np.select([prior_convictions > 3, prior_convictions > 1], ['High', 'Medium'], 'Low')
+
+
+# ========== TRAINED MODELS ==========
+class SklearnPredictor:
+    # Wraps a fitted scikit-learn classifier behind the same predict /
+    # predict_batch interface as the rule-based predictors
+    def __init__(self, estimator, version, algorithm):
+        self.estimator = estimator
+        self.version = version
+        self.algorithm = algorithm
+
+    def predict(self, features):
+        return str(self.predict_batch(encode_features([features]))[0])
+
+    def predict_batch(self, X):
+        return self.estimator.predict(X)
+
+
+def load_model(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def _save_model(model, path):
+    # Write-then-rename so readers never see a half-written pickle; the tmp
+    # name is per process because several workers may train at once
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(model, f)
+    os.replace(tmp_path, path)
+
+
+def _label(value):
+    return value.strip().title() if isinstance(value, str) and value.strip() else None
+
+
+def train_models(rows, decision_tree_path, naive_bayes_path):
+    # Runs in a worker process. Fits both models on `rows` (feature dicts
+    # carrying danger_level / crime_type labels), writes versioned artifacts
+    # next to the configured paths and then replaces the configured paths.
+    from sklearn.model_selection import train_test_split
+    from sklearn.naive_bayes import GaussianNB
+    from sklearn.tree import DecisionTreeClassifier
+
+    version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+    X = encode_features(rows)
+    specs = [
+        ('decision_tree', 'danger_level', DecisionTreeClassifier(max_depth=6, random_state=0),
+         'Decision Tree', decision_tree_path),
+        ('naive_bayes', 'crime_type', GaussianNB(), 'Naive Bayes', naive_bayes_path)
+    ]
+
+    # Fit and validate both models before writing any artifact
+    result = {'version': version, 'training_data_size': len(rows)}
+    fitted = []
+    for name, target, estimator, algorithm, path in specs:
+        labels = [_label(row.get(target)) for row in rows]
+        labelled = np.array([label is not None for label in labels], dtype=bool)
+        X_train = X[labelled]
+        y_train = np.array([label for label in labels if label is not None])
+        if len(set(y_train)) < 2:
+            raise ValueError(f'Need at least two {target} classes to train {algorithm}')
+
+        # Hold out 20% for an accuracy estimate once there is enough data
+        if len(y_train) >= 20:
+            X_fit, X_test, y_fit, y_test = train_test_split(X_train, y_train, test_size=0.2, random_state=0)
+        else:
+            X_fit, X_test, y_fit, y_test = X_train, X_train, y_train, y_train
+        estimator.fit(X_fit, y_fit)
+        accuracy = float((estimator.predict(X_test) == y_test).mean())
+        estimator.fit(X_train, y_train)
+
+        fitted.append((name, path, SklearnPredictor(estimator, version, algorithm)))
+        result[name] = {'accuracy': round(accuracy, 3), 'samples': int(len(y_train))}
+
+    for name, path, model in fitted:
+        root, ext = os.path.splitext(path)
+        versioned_path = f"{root}-{version}{ext}"
+        _save_model(model, versioned_path)
+        _save_model(model, path)
+        result[name]['path'] = versioned_path
+    return result
@@ -0,0 +1,220 @@
+import math
+import time
+import secrets
+import threading
+from collections import deque
+from datetime import datetime
+
+DONE = ('completed', 'failed')
+
+
+class QueueFull(Exception):
+    # Raised by submit() when max_depth jobs are already waiting; retry_after
+    # is the estimated number of seconds until there is room again
+    def __init__(self, retry_after):
+        super().__init__('Scan queue is full')
+        self.retry_after = retry_after
+
+
+def latency_summary(values):
+    # p50/p95/p99 of a list of milliseconds, None while there are no samples
+    ordered = sorted(values)
+    return {
+        f"p{q}": round(ordered[min(len(ordered) - 1, q * len(ordered) // 100)], 2) if ordered else None
+        for q in (50, 95, 99)
+    }
+
+
+class ScanQueue:
+    # Bounded in-process queue of biometric scan jobs drained by a small
+    # worker thread pool. A worker takes up to max_batch waiting jobs at once
+    # (lingering batch_window seconds for more to arrive when the queue is
+    # short) and hands all jobs of one kind to handlers[kind] in a single
+    # call, so embedding and matching run as one vectorized pass.
+    # A handler gets the list of payloads and returns one result per payload;
+    # an Exception in place of a result fails only that job.
+    # Finished jobs are kept for job_ttl seconds for polling. With a shared
+    # `jobs` store (storage.JobStore) every status change is also written
+    # there, so the other worker processes can answer polls for the job.
+    def __init__(self, handlers, max_depth=256, workers=2, max_batch=32, batch_window=0.01,
+                 job_ttl=600, latency_window=1024, jobs=None, poll_interval=0.05):
+        self.handlers = handlers
+        self.jobs = jobs
+        self.poll_interval = poll_interval
+        self.max_depth = max_depth
+        self.workers = workers
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.job_ttl = job_ttl
+        self._lock = threading.Lock()
+        self._work = threading.Condition(self._lock)
+        self._done = threading.Condition(self._lock)
+        self._pending = deque()
+        self._finished = deque()
+        self._jobs = {}
+        self._threads = []
+        self._running = 0
+        self._batch_seconds = None
+        self._latencies = deque(maxlen=latency_window)
+        self.counters = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'batches': 0}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _start_workers(self):
+        # Started on first submit, like the training pool
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, name=f"scan-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def retry_after(self):
+        # Seconds for the workers to drain the current backlog, at least 1
+        batches = math.ceil(len(self._pending) / self.max_batch) / max(1, self.workers)
+        return max(1, math.ceil(batches * (self._batch_seconds or 1.0)))
+
+    def submit(self, kind, payload):
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown scan type: {kind}")
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if len(self._pending) >= self.max_depth:
+                self.counters['rejected'] += 1
+                raise QueueFull(self.retry_after())
+            job_id = secrets.token_hex(8)
+            self._jobs[job_id] = {
+                'kind': kind,
+                'status': 'queued',
+                'submitted_at': datetime.now().isoformat(),
+                '_submitted': now
+            }
+            # Shared before a worker can pick the job up, so this write never
+            # lands after the job's later ones
+            self._share([job_id])
+            self._pending.append((job_id, payload))
+            self.counters['submitted'] += 1
+            self._start_workers()
+            self._work.notify()
+        return job_id
+
+    def _share(self, job_ids):
+        # Caller holds the lock, which keeps a job's writes in order
+        if self.jobs is None:
+            return
+        try:
+            self.jobs.update_many({job_id: self._view(self._jobs[job_id]) for job_id in job_ids})
+        except Exception as e:
+            print(f"✗ Error sharing scan job status: {e}")
+
+    @staticmethod
+    def _view(job):
+        return {key: value for key, value in job.items() if not key.startswith('_')}
+
+    def get(self, job_id, wait=0):
+        # Public view of a job, or None; with wait > 0 blocks until the job
+        # finishes or wait seconds pass (long polling). Jobs of other
+        # workers are read from the shared store, polling it while waiting.
+        deadline = time.monotonic() + wait
+        with self._lock:
+            local = job_id in self._jobs
+        if not local and self.jobs is not None:
+            while True:
+                job = self.jobs.get(job_id)
+                remaining = deadline - time.monotonic()
+                if job is None or job['status'] in DONE or remaining <= 0:
+                    return job
+                time.sleep(min(self.poll_interval, remaining))
+        with self._lock:
+            job = self._jobs.get(job_id)
+            while job is not None and job['status'] not in DONE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._done.wait(remaining)
+                job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            view = self._view(job)
+            if job['status'] == 'queued':
+                view['queue_position'] = next(
+                    (i for i, (pending_id, _) in enumerate(self._pending) if pending_id == job_id), 0
+                )
+            return view
+
+    def _expire(self, now):
+        while self._finished and now - self._finished[0][1] > self.job_ttl:
+            self._jobs.pop(self._finished.popleft()[0], None)
+
+    def _worker(self):
+        while True:
+            with self._lock:
+                while not self._pending:
+                    self._work.wait()
+                if len(self._pending) < self.max_batch and self.batch_window:
+                    self._work.wait_for(lambda: len(self._pending) >= self.max_batch, self.batch_window)
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+                if not batch:
+                    continue
+                started = time.monotonic()
+                for job_id, _ in batch:
+                    job = self._jobs[job_id]
+                    job.update(status='running', batch_size=len(batch), _started=started)
+                self._running += len(batch)
+                self._share([job_id for job_id, _ in batch])
+            self._run(batch, started)
+
+    def _run(self, batch, started):
+        groups = {}
+        for job_id, payload in batch:
+            groups.setdefault(self._jobs[job_id]['kind'], []).append((job_id, payload))
+
+        outcomes = []
+        for kind, jobs in groups.items():
+            try:
+                results = self.handlers[kind]([payload for _, payload in jobs])
+            except Exception as e:
+                results = [e] * len(jobs)
+            outcomes.extend(zip((job_id for job_id, _ in jobs), results))
+
+        finished = time.monotonic()
+        with self._lock:
+            elapsed = finished - started
+            self._batch_seconds = elapsed if self._batch_seconds is None else 0.8 * self._batch_seconds + 0.2 * elapsed
+            self.counters['batches'] += 1
+            self._running -= len(batch)
+            for job_id, result in outcomes:
+                job = self._jobs[job_id]
+                if isinstance(result, Exception):
+                    job.update(status='failed', error=str(result))
+                    self.counters['failed'] += 1
+                else:
+                    job.update(status='completed', result=result)
+                    self.counters['completed'] += 1
+                queue_ms = (job['_started'] - job['_submitted']) * 1000
+                total_ms = (finished - job['_submitted']) * 1000
+                job.update(
+                    finished_at=datetime.now().isoformat(),
+                    queue_ms=round(queue_ms, 2),
+                    processing_ms=round(elapsed * 1000, 2),
+                    total_ms=round(total_ms, 2)
+                )
+                self._latencies.append((queue_ms, total_ms))
+                self._finished.append((job_id, finished))
+            self._share([job_id for job_id, _ in outcomes])
+            self._done.notify_all()
+
+    def stats(self):
+        with self._lock:
+            queue_ms = [latency[0] for latency in self._latencies]
+            total_ms = [latency[1] for latency in self._latencies]
+            return {
+                'queue_depth': len(self._pending),
+                'max_depth': self.max_depth,
+                'running': self._running,
+                'workers': self.workers,
+                'max_batch': self.max_batch,
+                'batch_ms': round(self._batch_seconds * 1000, 2) if self._batch_seconds is not None else None,
+                **self.counters,
+                'latency_ms': {'queue': latency_summary(queue_ms), 'total': latency_summary(total_ms)}
+            }
@@ -0,0 +1,257 @@
+import re
+import math
+import threading
+import unicodedata
+from array import array
+import numpy as np
+
+# ========== TEXT SEARCH ==========
+# Searchable fields and their weight in the ranking; the bit of each field
+# is stored in the low bits of every posting
+SEARCH_FIELDS = (('name', 3.0), ('crime_type', 1.0), ('last_known_location', 1.5), ('scars_marks', 1.0))
+FIELD_BITS = len(SEARCH_FIELDS)
+GEN_BITS = 16
+MAX_GENERATION = (1 << GEN_BITS) - 1
+# Weight of a posting by its field mask: the best field the term occurs in
+MASK_WEIGHTS = np.array([
+    max([weight for bit, (_, weight) in enumerate(SEARCH_FIELDS) if mask & (1 << bit)], default=0.0)
+    for mask in range(1 << FIELD_BITS)
+], dtype=np.float32)
+
+TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    if not isinstance(text, str):
+        return []
+    text = text.casefold()
+    if not text.isascii():
+        # Fold accents so "José" and "Jose" index the same
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return TOKEN.findall(text)
+
+
+def trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    # Optimal string alignment distance (Levenshtein plus adjacent
+    # transpositions), giving up once it must exceed `limit`
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def max_edits(term):
+    return 0 if len(term) <= 2 else 1 if len(term) <= 5 else 2
+
+
+def _count_distinct(values, size):
+    # (distinct values, occurrences) of non-negative ints below `size`:
+    # sorting when there are few of them, a dense count otherwise
+    if len(values) * 8 < size:
+        return np.unique(values, return_counts=True)
+    counts = np.bincount(values, minlength=size)
+    distinct = np.flatnonzero(counts)
+    return distinct, counts[distinct]
+
+
+def _combine(ids, values, ufunc):
+    # (distinct ids, values folded per id with ufunc), sized by the matches
+    # rather than by the highest record id
+    distinct, inverse = np.unique(ids, return_inverse=True)
+    combined = np.zeros(len(distinct), dtype=np.float32)
+    ufunc.at(combined, inverse, values)
+    return distinct, combined
+
+
+class SearchIndex:
+    # Inverted index over SEARCH_FIELDS, kept in step with the store as a
+    # listener (add/remove/clear). Each term's postings are an array of
+    # id << 20 | generation << 4 | field mask, so scoring a term is a few
+    # numpy operations however long its list. Removing or re-adding a record
+    # bumps its generation instead of editing postings; stale postings are
+    # skipped at query time and purged once they outnumber live ones.
+    #
+    # Misspellings are handled on the vocabulary: a trigram index over the
+    # distinct terms proposes the terms sharing most trigrams with a query
+    # token, and those within a small edit distance count as matches,
+    # weighted by how close they are.
+    def __init__(self, fuzzy_candidates=64, max_expansions=16):
+        self.fuzzy_candidates = fuzzy_candidates
+        self.max_expansions = max_expansions
+        self._lock = threading.Lock()
+        self._reset()
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self._terms = {}
+        self._vocabulary = []
+        self._postings = []
+        self._df = array('q')
+        self._term_lengths = array('i')
+        self._trigrams = {}
+        self._docs = {}
+        self._generation = np.zeros(1024, dtype=np.uint16)
+        self._alive = np.zeros(1024, dtype=bool)
+        self._stale = 0
+        self._live = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _term_id(self, term):
+        term_id = self._terms.get(term)
+        if term_id is None:
+            term_id = self._terms[term] = len(self._vocabulary)
+            self._vocabulary.append(term)
+            self._postings.append(array('q'))
+            self._df.append(0)
+            self._term_lengths.append(len(trigrams(term)))
+            for gram in trigrams(term):
+                self._trigrams.setdefault(gram, array('i')).append(term_id)
+        return term_id
+
+    def _grow(self, record_id):
+        if record_id >= len(self._alive):
+            extra = max(record_id + 1, len(self._alive) * 2) - len(self._alive)
+            self._generation = np.concatenate([self._generation, np.zeros(extra, dtype=np.uint16)])
+            self._alive = np.concatenate([self._alive, np.zeros(extra, dtype=bool)])
+
+    def add(self, record):
+        masks = {}
+        for bit, (field, _) in enumerate(SEARCH_FIELDS):
+            for term in tokenize(record.get(field)):
+                masks[term] = masks.get(term, 0) | (1 << bit)
+        with self._lock:
+            record_id = record['id']
+            self._unindex(record_id)
+            self._grow(record_id)
+            generation = self._generation[record_id] % MAX_GENERATION + 1
+            self._generation[record_id] = generation
+            self._alive[record_id] = True
+            term_ids = []
+            for term, mask in masks.items():
+                term_id = self._term_id(term)
+                self._postings[term_id].append((record_id << (GEN_BITS + FIELD_BITS)) | (int(generation) << FIELD_BITS) | mask)
+                self._df[term_id] += 1
+                term_ids.append(term_id)
+            self._docs[record_id] = term_ids
+            self._live += len(term_ids)
+
+    def remove(self, record):
+        with self._lock:
+            self._unindex(record['id'])
+            if self._stale > max(self._live, 100000):
+                self._purge()
+
+    def _unindex(self, record_id):
+        term_ids = self._docs.pop(record_id, None)
+        if term_ids is None:
+            return
+        self._alive[record_id] = False
+        for term_id in term_ids:
+            self._df[term_id] -= 1
+        self._live -= len(term_ids)
+        self._stale += len(term_ids)
+
+    def _purge(self):
+        for term_id, postings in enumerate(self._postings):
+            if len(postings):
+                live = array('q')
+                live.frombytes(self._live_postings(postings)[0].tobytes())
+                self._postings[term_id] = live
+        self._stale = 0
+
+    def _live_postings(self, postings):
+        # (postings, ids, field masks) of the postings that are still current
+        values = np.frombuffer(postings, dtype=np.int64)
+        ids = values >> (GEN_BITS + FIELD_BITS)
+        generations = (values >> FIELD_BITS) & MAX_GENERATION
+        current = self._alive[ids] & (self._generation[ids] == generations)
+        return values[current], ids[current], values[current] & ((1 << FIELD_BITS) - 1)
+
+    def expand(self, token, fuzzy=True):
+        # [(term_id, similarity)] for the token itself and its near spellings
+        expansions = []
+        term_id = self._terms.get(token)
+        if term_id is not None and self._df[term_id] > 0:
+            expansions.append((term_id, 1.0))
+        limit = max_edits(token)
+        if not fuzzy or limit == 0:
+            return expansions
+
+        grams = [self._trigrams[gram] for gram in trigrams(token) if gram in self._trigrams]
+        if not grams:
+            return expansions
+        candidates, shared = _count_distinct(
+            np.concatenate([np.frombuffer(g, dtype=np.int32) for g in grams]), len(self._vocabulary)
+        )
+        if len(candidates) > self.fuzzy_candidates:
+            # Most shared trigrams relative to both lengths (Dice coefficient)
+            lengths = np.frombuffer(self._term_lengths, dtype=np.int32)[candidates]
+            dice = 2 * shared / (lengths + len(trigrams(token)))
+            candidates = candidates[np.argpartition(-dice, self.fuzzy_candidates)[:self.fuzzy_candidates]]
+
+        matches = []
+        for candidate in candidates.tolist():
+            if candidate == term_id or self._df[candidate] == 0:
+                continue
+            term = self._vocabulary[candidate]
+            distance = edit_distance(token, term, limit)
+            if distance <= limit:
+                matches.append((candidate, 1.0 - distance / max(len(token), len(term))))
+        matches.sort(key=lambda m: -m[1])
+        return expansions + matches[:self.max_expansions]
+
+    def search(self, query, limit=None, fuzzy=True):
+        # Returns (ids, scores) of the best `limit` matches (all if None),
+        # best first. A record's score adds up, per query token, the best
+        # idf * field weight * similarity over the token's expansions.
+        tokens = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            total_docs = max(len(self._docs), 1)
+            token_ids, token_scores = [], []
+            for token in tokens:
+                ids_parts, weight_parts = [], []
+                for term_id, similarity in self.expand(token, fuzzy):
+                    _, ids, masks = self._live_postings(self._postings[term_id])
+                    if not len(ids):
+                        continue
+                    idf = math.log(1 + total_docs / self._df[term_id])
+                    ids_parts.append(ids)
+                    weight_parts.append(MASK_WEIGHTS[masks] * np.float32(idf * similarity))
+                if len(ids_parts) == 1:
+                    # A term posts each record once
+                    token_ids.append(ids_parts[0])
+                    token_scores.append(weight_parts[0])
+                elif ids_parts:
+                    ids, best = _combine(np.concatenate(ids_parts), np.concatenate(weight_parts), np.maximum)
+                    token_ids.append(ids)
+                    token_scores.append(best)
+        if not token_ids:
+            return [], []
+        ids, scores = _combine(np.concatenate(token_ids), np.concatenate(token_scores), np.add)
+        if limit is not None and len(ids) > limit:
+            top = np.argpartition(-scores, limit)[:limit]
+            ids, scores = ids[top], scores[top]
+        order = np.lexsort((ids, -scores))
+        return ids[order].tolist(), scores[order].tolist()
@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from flask_jwt_extended import create_access_token, decode_token
+from storage import FileLock
+
+
+class SessionCache:
+    # token -> claims for tokens whose signature has already been checked.
+    # Entries expire with the token and the least recently used one is
+    # evicted past `maxsize`, so a hit is one dict lookup and no crypto.
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, token, now):
+        entry = self._entries.get(token)
+        if entry is None or entry[1] <= now:
+            return None
+        try:
+            self._entries.move_to_end(token)
+        except KeyError:
+            pass  # evicted by another thread meanwhile
+        return entry[0]
+
+    def put(self, token, claims):
+        with self._lock:
+            self._entries[token] = (claims, claims['exp'])
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, jtis):
+        with self._lock:
+            for token in [t for t, (claims, _) in self._entries.items() if claims['jti'] in jtis]:
+                del self._entries[token]
+
+
+class SessionManager:
+    # Signed JWT access tokens (Flask-JWT-Extended) with a verified-token
+    # cache in front of decode_token(). Logout revokes a token's jti by
+    # appending it to a shared file that every worker process tails in
+    # sync(), so revocation reaches all workers without a per-request lookup.
+    # Once expired entries outnumber the live ones (and compact_threshold),
+    # the file is rewritten with the live ones only; readers notice the new
+    # inode and read it from the start.
+    def __init__(self, revocation_path, ttl=8 * 3600, cache_size=10000, compact_threshold=1000):
+        self.revocation_path = revocation_path
+        self.ttl = ttl
+        self.compact_threshold = compact_threshold
+        self.cache = SessionCache(cache_size)
+        self.lock = FileLock(revocation_path + '.lock')
+        self._revoked = {}
+        self._inode = None
+        self._offset = 0
+        self._lines = 0
+
+    def issue(self, user):
+        return create_access_token(
+            identity=user['username'],
+            additional_claims={'role': user.get('role', 'investigator'), 'user_id': user.get('id', 1)},
+            expires_delta=timedelta(seconds=self.ttl)
+        )
+
+    def verify(self, token):
+        # Returns the token's claims, or None if it is invalid, expired or revoked
+        claims = self.cache.get(token, time.time())
+        if claims is not None:
+            return claims
+        try:
+            claims = decode_token(token)
+        except Exception:
+            return None
+        if claims['jti'] in self._revoked:
+            return None
+        self.cache.put(token, claims)
+        return claims
+
+    def revoke(self, claims):
+        entry = {'jti': claims['jti'], 'exp': claims['exp']}
+        with self.lock:
+            with open(self.revocation_path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        self.sync()
+
+    def sync(self):
+        # One stat() unless a worker revoked a token since the last call
+        try:
+            st = os.stat(self.revocation_path)
+        except FileNotFoundError:
+            return
+        if (st.st_ino, st.st_size) == (self._inode, self._offset):
+            return
+        with self.lock:
+            now = time.time()
+            revoked = set()
+            with open(self.revocation_path, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                if inode != self._inode:
+                    # First read, or the file was compacted meanwhile
+                    self._inode, self._offset, self._lines = inode, 0, 0
+                f.seek(self._offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    entry = json.loads(line)
+                    if entry['exp'] > now:
+                        self._revoked[entry['jti']] = entry['exp']
+                        revoked.add(entry['jti'])
+                    self._offset += len(line)
+                    self._lines += 1
+            # Expired tokens are rejected by decode_token() anyway
+            self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+            if self._lines - len(self._revoked) > max(self.compact_threshold, len(self._revoked)):
+                self._compact()
+        if revoked:
+            self.cache.discard(revoked)
+
+    def _compact(self):
+        # Caller holds the lock and has read the whole file
+        tmp_path = self.revocation_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            for jti, exp in self._revoked.items():
+                f.write(json.dumps({'jti': jti, 'exp': exp}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.revocation_path)
+        st = os.stat(self.revocation_path)
+        self._inode, self._offset, self._lines = st.st_ino, st.st_size, len(self._revoked)
@@ -0,0 +1,322 @@
+import os
+import json
+import threading
+from contextlib import nullcontext
+from datetime import datetime
+from flask import has_app_context
+from sqlalchemy import and_, case, delete, event, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from models import db, User, Criminal, CriminalChange, CriminalVersion
+from storage import index_key, sort_key
+
+
+def configure_database(app, config):
+    app.config['SQLALCHEMY_DATABASE_URI'] = config.SQLALCHEMY_DATABASE_URI
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = config.SQLALCHEMY_TRACK_MODIFICATIONS
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = config.SQLALCHEMY_ENGINE_OPTIONS
+    db.init_app(app)
+
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name == 'sqlite':
+            if engine.url.database:
+                os.makedirs(os.path.dirname(os.path.abspath(engine.url.database)), exist_ok=True)
+
+            # WAL lets readers proceed while a writer commits
+            @event.listens_for(engine, 'connect')
+            def set_sqlite_pragmas(dbapi_connection, _):
+                cursor = dbapi_connection.cursor()
+                cursor.execute('PRAGMA journal_mode=WAL')
+                cursor.execute('PRAGMA synchronous=NORMAL')
+                cursor.close()
+
+        db.create_all()
+        # The version row; another worker may have created it first
+        if db.session.get(CriminalVersion, 1) is None:
+            try:
+                db.session.add(CriminalVersion(id=1, seq=0))
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+
+
+class _AppBound:
+    # Store methods are called from request handlers and from background
+    # threads; the latter need their own app context for db.session
+    def __init__(self, app):
+        self.app = app
+
+    def _context(self):
+        return nullcontext() if has_app_context() else self.app.app_context()
+
+
+# ========== USERS ==========
+class SQLUserStore(_AppBound):
+    def __len__(self):
+        with self._context():
+            return db.session.scalar(select(func.count(User.id)))
+
+    def __contains__(self, username):
+        with self._context():
+            return db.session.scalar(select(User.id).where(User.username == username)) is not None
+
+    def add(self, username, password, special_code=None, role='investigator'):
+        with self._context():
+            user = User(username=username, special_code=special_code, role=role)
+            user.set_password(password)
+            db.session.add(user)
+            db.session.commit()
+
+    def authenticate(self, username, password):
+        with self._context():
+            user = db.session.scalar(select(User).where(User.username == username))
+            if user is None or not user.check_password(password):
+                return None
+            return {
+                'id': user.id,
+                'username': user.username,
+                'special_code': user.special_code,
+                'role': user.role
+            }
+
+
+# ========== CRIMINALS ==========
+def _filter_column(field):
+    return func.lower(getattr(Criminal, field))
+
+
+# Lifecycle of an id in SQLCriminalStore._state
+_ABSENT, _PRESENT, _DELETED = 0, 1, 2
+
+
+class SQLCriminalStore(_AppBound):
+    # Same interface as storage.CriminalStore over the criminals table.
+    # Listeners (stats, fingerprint index, ...) are filled by a full scan in
+    # load() and then follow the criminal_changes log: this process's writes
+    # are applied as they commit and sync() applies other workers' writes.
+    #
+    # Rows are only inserted and deleted and ids are never reused, so each id
+    # goes absent -> present -> deleted at most once. Applying changes along
+    # that lifecycle makes replays harmless, e.g. a change committed while
+    # load() was scanning, which shows up again in the log.
+    #
+    # on_remote_change, when set, is called with every change applied from
+    # another process, and with {'op': 'reload'} when the log was pruned past
+    # this process's position and the listeners were reloaded instead.
+    def __init__(self, app, listeners=(), change_log_size=10000):
+        super().__init__(app)
+        self.listeners = list(listeners)
+        self.change_log_size = change_log_size
+        self.on_remote_change = None
+        self._lock = threading.RLock()
+        self._seen = 0
+        self._state = bytearray()
+
+    def __len__(self):
+        with self._context():
+            return db.session.scalar(select(func.count(Criminal.id)))
+
+    def __contains__(self, record_id):
+        with self._context():
+            return db.session.scalar(select(Criminal.id).where(Criminal.id == record_id)) is not None
+
+    def __iter__(self):
+        # Streams rows instead of materializing the table
+        with self._context():
+            rows = db.session.execute(select(Criminal).execution_options(yield_per=1000)).scalars()
+            for row in rows:
+                yield row.to_dict()
+
+    def records(self):
+        return list(self)
+
+    def project(self, fields):
+        return [{field: record.get(field) for field in fields} for record in self]
+
+    @property
+    def version(self):
+        # Last change seq applied; current after sync()
+        return str(self._seen)
+
+    def _apply(self, op, record):
+        # Returns whether the change was new to this process
+        record_id = record['id']
+        if record_id >= len(self._state):
+            self._state.extend(bytes(max(record_id + 1 - len(self._state), len(self._state))))
+        state = self._state[record_id]
+        if op == 'put' and state == _ABSENT:
+            self._state[record_id] = _PRESENT
+            for listener in self.listeners:
+                listener.add(record)
+        elif op == 'delete' and state == _PRESENT:
+            self._state[record_id] = _DELETED
+            for listener in self.listeners:
+                listener.remove(record)
+        else:
+            return False
+        return True
+
+    def load(self, records=None):
+        if records:
+            self.add_many(records)
+        with self._lock, self._context():
+            self._seen = db.session.scalar(select(CriminalVersion.seq))
+            self._state = bytearray()
+            for listener in self.listeners:
+                listener.clear()
+            for record in self:
+                self._apply('put', record)
+
+    def sync(self):
+        # One indexed range read when nothing changed
+        with self._lock, self._context():
+            changes = db.session.scalars(
+                select(CriminalChange).where(CriminalChange.seq > self._seen).order_by(CriminalChange.seq)
+            ).all()
+            if not changes:
+                return
+            if changes[0].seq != self._seen + 1:
+                self.load()
+                if self.on_remote_change is not None:
+                    self.on_remote_change({'op': 'reload'})
+                return
+            for change in changes:
+                record = json.loads(change.record)
+                if self._apply(change.op, record) and self.on_remote_change is not None:
+                    if change.op == 'put':
+                        self.on_remote_change({'op': 'put', 'record': record})
+                    else:
+                        self.on_remote_change({'op': 'delete', 'id': change.record_id})
+            self._seen = changes[-1].seq
+
+    def _log_changes(self, changes):
+        # Within the writer's transaction: takes the next seqs from the
+        # version row, appends (op, record) changes and prunes old ones
+        last = db.session.scalar(
+            update(CriminalVersion).where(CriminalVersion.id == 1)
+            .values(seq=CriminalVersion.seq + len(changes)).returning(CriminalVersion.seq)
+        )
+        first = last - len(changes) + 1
+        db.session.execute(insert(CriminalChange), [
+            {'seq': seq, 'op': op, 'record_id': record['id'], 'record': json.dumps(record)}
+            for seq, (op, record) in enumerate(changes, first)
+        ])
+        db.session.execute(delete(CriminalChange).where(CriminalChange.seq <= last - self.change_log_size))
+
+    def _committed(self, changes):
+        # Held under the lock from commit to here, so a concurrent sync()
+        # never reports this process's own writes as remote ones
+        for op, record in changes:
+            self._apply(op, record)
+
+    def get(self, record_id):
+        with self._context():
+            row = db.session.get(Criminal, record_id)
+            return row.to_dict() if row is not None else None
+
+    def add(self, record):
+        return self._insert([record])[0]
+
+    def add_many(self, records):
+        if not records:
+            return []
+        for record, row in zip(records, self._insert(records)):
+            record['id'] = row['id']
+        return records
+
+    def _insert(self, records):
+        # One multi-row INSERT ... RETURNING per call; returns the new rows
+        with self._lock, self._context():
+            rows = db.session.scalars(
+                insert(Criminal).returning(Criminal, sort_by_parameter_order=True),
+                [Criminal.mapping(record) for record in records]
+            ).all()
+            changes = [('put', row.to_dict()) for row in rows]
+            self._log_changes(changes)
+            db.session.commit()
+            self._committed(changes)
+        return [record for _, record in changes]
+
+    def remove(self, record_id):
+        removed = self.remove_many([record_id])
+        return removed[0] if removed else None
+
+    def remove_many(self, record_ids):
+        # Set-based delete; the rows are read first for the change log
+        with self._lock, self._context():
+            removed = [
+                row.to_dict() for row in
+                db.session.scalars(select(Criminal).where(Criminal.id.in_(record_ids)))
+            ]
+            if removed:
+                changes = [('delete', record) for record in removed]
+                db.session.execute(delete(Criminal).where(Criminal.id.in_([r['id'] for r in removed])))
+                self._log_changes(changes)
+                db.session.commit()
+                self._committed(changes)
+        return removed
+
+    def count(self, field, value):
+        with self._context():
+            return db.session.scalar(
+                select(func.count(Criminal.id)).where(_filter_column(field) == index_key(value))
+            )
+
+    def find(self, **filters):
+        page, _ = self.query(filters=filters, limit=None)
+        return page
+
+    def query(self, filters=None, age_range=None, sort='id', descending=False, after=None, limit=50):
+        # Keyset pagination with the same (missing, value, id) keys as
+        # storage.sort_key, so cursors look identical across backends
+        column = getattr(Criminal, sort)
+        if isinstance(column.type, db.String):
+            column = func.lower(column)
+        missing = case((column.is_(None), 1), else_=0)
+
+        statement = select(Criminal)
+        for field, value in (filters or {}).items():
+            statement = statement.where(_filter_column(field) == index_key(value))
+        age_min, age_max = age_range or (None, None)
+        if age_min is not None:
+            statement = statement.where(Criminal.age >= age_min)
+        if age_max is not None:
+            statement = statement.where(Criminal.age <= age_max)
+
+        if after is not None:
+            after_missing, after_value, after_id = after
+            if sort == 'created_at' and not after_missing:
+                after_value = datetime.fromisoformat(after_value)
+            if descending:
+                before_id = Criminal.id < after_id
+                if after_missing:
+                    statement = statement.where(or_(missing == 0, before_id))
+                else:
+                    statement = statement.where(and_(missing == 0, or_(
+                        column < after_value, and_(column == after_value, before_id)
+                    )))
+            else:
+                after_id_clause = Criminal.id > after_id
+                if after_missing:
+                    statement = statement.where(and_(missing == 1, after_id_clause))
+                else:
+                    statement = statement.where(or_(missing == 1, column > after_value, and_(
+                        column == after_value, after_id_clause
+                    )))
+
+        if descending:
+            statement = statement.order_by(missing.desc(), column.desc(), Criminal.id.desc())
+        else:
+            statement = statement.order_by(missing, column, Criminal.id)
+
+        with self._context():
+            if limit is None:
+                return [row.to_dict() for row in db.session.scalars(statement)], None
+            page = [row.to_dict() for row in db.session.scalars(statement.limit(limit + 1))]
+
+        next_key = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_key = sort_key(page[-1], sort)
+        return page, next_key
+
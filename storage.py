@@ -0,0 +1,992 @@
+import os
+import json
+import base64
+import hashlib
+import secrets
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+import numpy as np
+from columnar import ColumnTable, snapshot_meta, write_snapshot
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# ========== CROSS-PROCESS LOCKING ==========
+class FileLock:
+    # Exclusive lock shared by this process's threads (re-entrant) and by
+    # other processes through an OS lock on a side file. The descriptor is
+    # reopened after fork so forked workers do not share one lock.
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._fd = None
+        self._pid = None
+        self._depth = 0
+
+    def acquire(self, blocking=True):
+        if not self._thread_lock.acquire(blocking):
+            return False
+        if self._depth == 0:
+            if self._pid != os.getpid():
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                self._pid = os.getpid()
+            if not _lock_file(self._fd, blocking):
+                self._thread_lock.release()
+                return False
+        self._depth += 1
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            _unlock_file(self._fd)
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+if fcntl is not None:
+    def _lock_file(fd, blocking):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            return True
+        except BlockingIOError:
+            return False
+
+    def _unlock_file(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+else:
+    def _lock_file(fd, blocking):
+        while True:
+            try:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.01)
+
+    def _unlock_file(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+# ========== LOG-STRUCTURED STORAGE ==========
+class LogStorage:
+    # Snapshot file plus an append-only JSON-lines log of mutations.
+    # Each put/delete appends one line to <path>.log, so a write costs the same
+    # however many records exist. Past compact_threshold entries the log is
+    # rotated to <path>.log.compacting and folded into a new snapshot on a
+    # background thread. Puts and deletes are idempotent, so load() can safely
+    # replay snapshot, rotated log and live log in that order.
+    #
+    # Several processes may share the files. Writers hold `lock` (see
+    # transaction()), and every process tails the live log from its own read
+    # offset, applying other processes' entries to `store`. Each log starts
+    # with a generation header so a process that slept through more than one
+    # rotation notices the gap and reloads from the snapshot instead.
+    #
+    # <path>.bin is a binary copy of the snapshot (see columnar.py) that
+    # loads in a fraction of the time. It records the generation it covers
+    # and is only used while the oldest log on disk is the one right after
+    # it; otherwise load() falls back to the JSON and rewrites it.
+    #
+    # on_remote_change, when set, is called (under the lock) with every
+    # entry applied from another process, and with {'op': 'reload'} when
+    # the store was reloaded from the snapshot and individual changes were
+    # skipped.
+
+    def __init__(self, path, store, compact_threshold=1000, fsync=True):
+        self.path = path
+        self.log_path = path + '.log'
+        self.compacting_path = path + '.log.compacting'
+        self.binary_path = path + '.bin'
+        self.store = store
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        self.lock = FileLock(path + '.lock')
+        self._compact_lock = FileLock(path + '.compact.lock')
+        self._log = None
+        self._reader = None
+        self._pid = None
+        self._generation = 0
+        self._pending = 0
+        self._compactor = None
+        self.on_remote_change = None
+
+    def load(self, defer_listeners=False):
+        # Fills the store; with defer_listeners its listeners are left for
+        # store.warm_listeners() to fill
+        with self.lock:
+            self._load(defer_listeners)
+
+    def _load(self, defer_listeners=False):
+        binary_generation = self._load_binary()
+        if binary_generation is not None:
+            generation = binary_generation
+            apply = self._apply
+        else:
+            records = {}
+            generation = 0
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                for record in data.get('criminals', []):
+                    records[record['id']] = record
+                generation = data.get('generation', 0)
+
+            def apply(entry):
+                if entry['op'] == 'put':
+                    records[entry['record']['id']] = entry['record']
+                elif entry['op'] == 'delete':
+                    records.pop(entry['id'], None)
+
+        self._pending = 0
+        if os.path.exists(self.compacting_path):
+            with open(self.compacting_path, 'rb') as f:
+                self._pending += self._read_entries(f, apply)
+
+        self._open_log(generation + 1)
+        self._pending += self._read_entries(self._reader, apply, truncate=True)
+        if binary_generation is not None:
+            if not defer_listeners:
+                self.store.warm_listeners()
+        else:
+            self.store.load(list(records.values()), defer_listeners)
+            threading.Thread(target=self._write_binary, args=(generation,), daemon=True).start()
+
+    def _oldest_log_generation(self):
+        # Header generation of the first log not folded into the snapshot
+        for path in (self.compacting_path, self.log_path):
+            try:
+                with open(path, 'rb') as f:
+                    return json.loads(f.readline() or b'{}').get('generation')
+            except FileNotFoundError:
+                continue
+            except ValueError:
+                return None
+        return None
+
+    def _load_binary(self):
+        # Loads the binary snapshot into the store if it lines up with the
+        # logs and returns its generation, else None
+        if not os.path.exists(self.binary_path):
+            return None
+        try:
+            generation = snapshot_meta(self.binary_path).get('generation')
+            if generation is None or self._oldest_log_generation() != generation + 1:
+                return None
+            self.store.load_snapshot(self.binary_path)
+            return generation
+        except Exception as e:
+            print(f"✗ Ignoring binary snapshot: {e}")
+            return None
+
+    def _write_binary(self, generation):
+        # Binary snapshot for the next start after a load from JSON. The
+        # store may already hold later log entries; replaying those again
+        # is harmless since puts and deletes are idempotent.
+        if not self._compact_lock.acquire(blocking=False):
+            return
+        tmp_path = self.binary_path + '.tmp'
+        try:
+            self.store.dump(tmp_path, {'generation': generation})
+            with self.lock:
+                if self._oldest_log_generation() == generation + 1:
+                    os.replace(tmp_path, self.binary_path)
+                else:
+                    os.remove(tmp_path)
+        except Exception as e:
+            print(f"✗ Error writing binary snapshot: {e}")
+        finally:
+            self._compact_lock.release()
+
+    def save_binary(self):
+        # Rewrites the binary snapshot from the store as it is now, e.g.
+        # once the listeners it saves have warmed up
+        with self.lock:
+            oldest = self._oldest_log_generation()
+        if oldest is not None:
+            self._write_binary(oldest - 1)
+
+    def _open_log(self, generation):
+        # New log files start with a generation header
+        if not os.path.exists(self.log_path) or os.path.getsize(self.log_path) == 0:
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps({'op': 'generation', 'generation': generation}) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        for handle in (self._log, self._reader):
+            if handle is not None:
+                handle.close()
+        self._log = open(self.log_path, 'a')
+        self._reader = open(self.log_path, 'rb')
+        self._pid = os.getpid()
+
+    def _check_fork(self):
+        # A forked worker must not share the parent's read offset
+        if self._pid != os.getpid():
+            offset = self._reader.tell()
+            self._reader = open(self._reader.name, 'rb')
+            self._reader.seek(offset)
+            self._log = open(self._log.name, 'a')
+            self._pid = os.getpid()
+
+    def _read_entries(self, f, apply, truncate=False):
+        applied = 0
+        while True:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                return applied
+            try:
+                if not line.endswith(b'\n'):
+                    raise ValueError('Incomplete line')
+                entry = json.loads(line)
+            except ValueError:
+                # Torn write from a crash (writers hold the lock, so nobody
+                # is mid-write): drop it so new appends start on a clean line
+                f.seek(offset)
+                if truncate:
+                    with open(self.log_path, 'r+b') as log:
+                        log.truncate(offset)
+                return applied
+            if entry['op'] == 'generation':
+                self._generation = entry['generation']
+            else:
+                apply(entry)
+                applied += 1
+
+    def _apply(self, entry):
+        if entry['op'] == 'put':
+            self.store.add(entry['record'])
+        elif entry['op'] == 'delete':
+            self.store.remove(entry['id'])
+
+    def _apply_remote(self, entry):
+        self._apply(entry)
+        if self.on_remote_change is not None:
+            self.on_remote_change(entry)
+
+    def _is_current(self, handle):
+        try:
+            return os.stat(self.log_path).st_ino == os.fstat(handle.fileno()).st_ino
+        except FileNotFoundError:
+            return False
+
+    def _catch_up(self):
+        # Caller holds the lock. Applies entries other processes appended,
+        # following the log across rotations.
+        self._check_fork()
+        while True:
+            self._read_entries(self._reader, self._apply_remote)
+            if self._is_current(self._reader):
+                break
+            expected = self._generation + 1
+            self._reader.close()
+            self._reader = open(self.log_path, 'rb')
+            header = json.loads(self._reader.readline() or b'{}')
+            self._reader.seek(0)
+            if header.get('generation') != expected:
+                self._load()
+                if self.on_remote_change is not None:
+                    self.on_remote_change({'op': 'reload'})
+                return
+        if not self._is_current(self._log):
+            self._log.close()
+            self._log = open(self.log_path, 'a')
+
+    @property
+    def version(self):
+        # Log generation and the offset applied so far: identical in every
+        # process that has caught up with the same writes
+        return f"{self._generation}.{self._reader.tell() if self._reader is not None else 0}"
+
+    def sync(self):
+        # Cheap per-request check: one stat() unless another process wrote
+        if self._reader is None:
+            return
+        if self._pid != os.getpid():
+            with self.lock:
+                self._check_fork()
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            return
+        reader = self._reader
+        if st.st_ino == os.fstat(reader.fileno()).st_ino and st.st_size == reader.tell():
+            return
+        with self.lock:
+            self._catch_up()
+
+    @contextmanager
+    def transaction(self):
+        # Serializes writers across threads and processes and brings the
+        # store up to date first, so id allocation sees every earlier write
+        with self.lock:
+            self._catch_up()
+            yield
+
+    def put(self, record):
+        self._append([{'op': 'put', 'record': record}])
+
+    def put_many(self, records):
+        # One write and one fsync for the whole batch
+        self._append([{'op': 'put', 'record': record} for record in records])
+
+    def delete(self, record_id):
+        self._append([{'op': 'delete', 'id': record_id}])
+
+    def _append(self, entries):
+        data = ''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries)
+        with self.lock:
+            self._catch_up()
+            self._log.write(data)
+            self._log.flush()
+            if self.fsync:
+                os.fsync(self._log.fileno())
+            # Our own entries are already applied; skip past them
+            self._reader.seek(0, os.SEEK_END)
+            self._pending += len(entries)
+            if self._pending >= self.compact_threshold:
+                self._start_compaction()
+
+    def _start_compaction(self):
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact, daemon=True)
+        self._compactor.start()
+
+    def compact(self):
+        # Only one process compacts at a time; the others keep appending
+        if not self._compact_lock.acquire(blocking=False):
+            return
+        try:
+            with self.lock:
+                self._catch_up()
+                self._log.close()
+                if os.path.exists(self.compacting_path):
+                    # An earlier compaction never finished; keep its entries too
+                    with open(self.compacting_path, 'ab') as dst, open(self.log_path, 'rb') as src:
+                        dst.write(src.read())
+                    os.remove(self.log_path)
+                else:
+                    os.replace(self.log_path, self.compacting_path)
+                generation = self._generation
+                self._open_log(generation + 1)
+                self._read_entries(self._reader, self._apply)
+                self._pending = 0
+                # The store is caught up, so this covers every rotated entry
+                records = self.store.records()
+
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({
+                    'criminals': records,
+                    'generation': generation,
+                    'last_updated': datetime.now().isoformat()
+                }, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            binary_path = self.binary_path + '.tmp'
+            try:
+                self.store.dump(binary_path, {'generation': generation})
+            except Exception as e:
+                print(f"✗ Error writing binary snapshot: {e}")
+                binary_path = None
+            # Swap under the lock so a loading process never sees the new
+            # snapshot together with a stale rotated log or vice versa
+            with self.lock:
+                if binary_path is not None:
+                    os.replace(binary_path, self.binary_path)
+                os.replace(tmp_path, self.path)
+                os.remove(self.compacting_path)
+        except Exception as e:
+            print(f"✗ Error compacting data: {e}")
+        finally:
+            self._compact_lock.release()
+
+
+# ========== USERS ==========
+def hash_password(password, salt=None):
+    if salt is None:
+        salt = secrets.token_hex(16)
+    return hashlib.sha256((password + salt).encode()).hexdigest(), salt
+
+
+class UserStore:
+    # Users for the JSON backend; sql_storage.SQLUserStore has the same
+    # interface over the users table. With a path the users are kept in a
+    # JSON file shared by every worker process and re-read when it changes.
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = FileLock(path + '.lock') if path else None
+        self._users = {}
+        self._stamp = None
+
+    def _refresh(self):
+        if self.path is None:
+            return
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp != self._stamp:
+            with open(self.path, 'r') as f:
+                self._users = {user['username']: user for user in json.load(f).get('users', [])}
+            self._stamp = stamp
+
+    def __len__(self):
+        self._refresh()
+        return len(self._users)
+
+    def __contains__(self, username):
+        self._refresh()
+        return username in self._users
+
+    def add(self, username, password, special_code=None, role='investigator'):
+        password_hash, salt = hash_password(password)
+        user = {
+            'username': username,
+            'password_hash': password_hash,
+            'salt': salt,
+            'special_code': special_code,
+            'role': role
+        }
+        if self.path is None:
+            self._users[username] = user
+            return
+        with self.lock:
+            self._refresh()
+            self._users[username] = user
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'users': list(self._users.values())}, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+    def authenticate(self, username, password):
+        self._refresh()
+        user = self._users.get(username)
+        if user is None:
+            return None
+        input_hash, _ = hash_password(password, user['salt'])
+        if input_hash != user['password_hash']:
+            return None
+        return user
+
+
+# ========== BACKGROUND JOBS ==========
+class JobStore:
+    # Status of background jobs (model training, duplicate search, scans) in
+    # a JSON file shared by every worker process, so a job can be polled on
+    # any worker and not only the one that started it. Re-read when the file
+    # is replaced, like UserStore; only the newest max_jobs jobs are kept.
+    def __init__(self, path, max_jobs=100, fsync=True):
+        self.path = path
+        self.max_jobs = max_jobs
+        self.fsync = fsync
+        self.lock = FileLock(path + '.lock')
+        self._jobs = {}
+        self._stamp = None
+
+    def _refresh(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp != self._stamp:
+            with open(self.path, 'r') as f:
+                self._jobs = json.load(f).get('jobs', {})
+            self._stamp = stamp
+
+    def get(self, job_id):
+        self._refresh()
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    def create(self, **fields):
+        job_id = secrets.token_hex(8)
+        self.update(job_id, **fields)
+        return job_id
+
+    def update(self, job_id, **fields):
+        self.update_many({job_id: fields})
+
+    def update_many(self, updates):
+        # {job_id: fields} merged into their jobs with one rewrite of the file
+        with self.lock:
+            self._refresh()
+            for job_id, fields in updates.items():
+                self._jobs[job_id] = dict(self._jobs.get(job_id, {}), **fields)
+            while len(self._jobs) > self.max_jobs:
+                del self._jobs[next(iter(self._jobs))]
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'jobs': self._jobs}, f)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+
+# ========== INDEXED RECORD STORE ==========
+INDEXED_FIELDS = ('status', 'danger_level', 'crime_type', 'crime_severity', 'last_known_location')
+SORTABLE_FIELDS = ('id', 'name', 'age', 'created_at', 'prior_convictions', 'recidivism_score')
+# How each field is held in the ColumnTable; anything else goes to overflow
+CRIMINAL_COLUMNS = (
+    ('id', 'int'), ('name', 'text'), ('age', 'int'), ('gender', 'category'), ('crime_type', 'category'),
+    ('crime_severity', 'category'), ('prior_convictions', 'int'), ('last_known_location', 'category'),
+    ('latitude', 'float'), ('longitude', 'float'), ('status', 'category'), ('photo_path', 'text'),
+    ('photo_hash', 'text'), ('fingerprint_path', 'text'), ('fingerprint_template', 'text'),
+    ('height', 'float'), ('weight', 'float'), ('eye_color', 'category'), ('hair_color', 'category'),
+    ('scars_marks', 'text'), ('danger_level', 'category'), ('predicted_crime_type', 'category'),
+    ('recidivism_score', 'float'), ('created_at', 'time'), ('ai_models_used', 'tags')
+)
+
+
+def index_key(value):
+    # Free-text fields are typed inconsistently ("fraud" vs "Fraud")
+    if isinstance(value, str):
+        return value.strip().casefold()
+    return value
+
+
+def make_sort_key(value, record_id):
+    # (missing, value, id): missing values sort last and id breaks ties, so
+    # every key is unique and usable as a keyset cursor
+    value = index_key(value)
+    return (value is None, 0 if value is None else value, record_id)
+
+
+def sort_key(record, field):
+    return make_sort_key(record.get(field), record['id'])
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        missing, value, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    return (missing, value, record_id)
+
+
+class SortedIndex:
+    # Ids of one ColumnTable field in (missing, value, id) order. The bulk
+    # of them sit in a numpy array whose keys are read back from the table
+    # when bisecting, so the index costs 8 bytes per record; recent inserts
+    # go to a small sorted list of keys and removals of array entries are
+    # remembered with their key, until fold() merges both into the array.
+    def __init__(self, table, field, fold_threshold=4096):
+        self.table = table
+        self.field = field
+        self.fold_threshold = fold_threshold
+        self.clear()
+
+    def clear(self):
+        self.base = np.empty(0, dtype=np.int64)
+        self.delta = []
+        self.removed = {}
+
+    def __len__(self):
+        return len(self.base) - len(self.removed) + len(self.delta)
+
+    def key(self, record_id):
+        removed = self.removed.get(record_id)
+        if removed is not None:
+            return removed
+        return make_sort_key(self.table.value(record_id, self.field), record_id)
+
+    def _base_keys(self, base):
+        # Lazy key sequence over `base` for bisect
+        index = self
+
+        class Keys:
+            def __len__(self):
+                return len(base)
+
+            def __getitem__(self, i):
+                return index.key(int(base[i]))
+        return Keys()
+
+    def build(self, keys):
+        self.clear()
+        self.base = np.fromiter((key[-1] for key in sorted(keys)), dtype=np.int64)
+
+    def add(self, key):
+        insort(self.delta, key)
+        if len(self.delta) + len(self.removed) > self.fold_threshold:
+            self.fold()
+
+    def remove(self, key):
+        i = bisect_left(self.delta, key)
+        if i < len(self.delta) and self.delta[i] == key:
+            del self.delta[i]
+        else:
+            self.removed[key[-1]] = key
+            if len(self.delta) + len(self.removed) > self.fold_threshold:
+                self.fold()
+
+    def fold(self):
+        base = self.base
+        if self.removed:
+            base = base[~np.isin(base, np.fromiter(self.removed, dtype=np.int64, count=len(self.removed)))]
+            self.removed = {}
+        keys = self._base_keys(base)
+        positions = [bisect_left(keys, key) for key in self.delta]
+        self.base = np.insert(base, positions, [key[-1] for key in self.delta])
+        self.delta = []
+
+    def walk(self, after=None, descending=False):
+        # Ids strictly after the `after` key in the given direction, merging
+        # the array and the delta list
+        keys = self._base_keys(self.base)
+        if descending:
+            i = (bisect_left(keys, after) if after is not None else len(keys)) - 1
+            j = (bisect_left(self.delta, after) if after is not None else len(self.delta)) - 1
+            step = -1
+        else:
+            i = bisect_right(keys, after) if after is not None else 0
+            j = bisect_right(self.delta, after) if after is not None else 0
+            step = 1
+        while True:
+            while 0 <= i < len(self.base) and int(self.base[i]) in self.removed:
+                i += step
+            delta_key = self.delta[j] if 0 <= j < len(self.delta) else None
+            if not 0 <= i < len(self.base):
+                if delta_key is None:
+                    return
+                yield delta_key[-1]
+                j += step
+            elif delta_key is None or (self.key(int(self.base[i])) < delta_key) != descending:
+                yield int(self.base[i])
+                i += step
+            else:
+                yield delta_key[-1]
+                j += step
+
+
+class CriminalStore:
+    # Records live in a ColumnTable (see columnar.py) and are materialized
+    # as dicts only when handed out by get()/query()/records(). Filters on
+    # INDEXED_FIELDS, which are dictionary-encoded, and the age range are
+    # vectorized passes over the code/age columns. Fields in SORTABLE_FIELDS
+    # keep a SortedIndex of ids for keyset paging.
+    # Listeners are objects with add(record)/remove(record)/clear() that are
+    # kept in step with every mutation (aggregates, search indexes, ...).
+    # They are notified under the table lock. After load_snapshot() or a
+    # deferred load() they start empty and warm_listeners() fills them.
+    # Listeners that also have a `name` and snapshot()/restore() are saved
+    # by dump() and restored by load_snapshot() instead of being refilled.
+
+    def __init__(self, indexed_fields=INDEXED_FIELDS, sortable_fields=SORTABLE_FIELDS, listeners=()):
+        self._table = ColumnTable(CRIMINAL_COLUMNS)
+        self.next_id = 1
+        self.indexed_fields = tuple(indexed_fields)
+        self._sorted = {field: SortedIndex(self._table, field) for field in sortable_fields}
+        self.listeners = list(listeners)
+        self._cold = None  # ids the listeners have not seen yet
+        self._restored = []  # listeners complete despite _cold
+
+    def __len__(self):
+        return len(self._table)
+
+    def __contains__(self, record_id):
+        return record_id in self._table
+
+    def __iter__(self):
+        # One record at a time, so a full pass never holds every dict at once
+        for record_id in self._table.ids().tolist():
+            record = self._table.get(record_id)
+            if record is not None:
+                yield record
+
+    def records(self):
+        return self._table.rows()
+
+    def project(self, fields):
+        # Selected fields of every record, built column-wise
+        return self._table.project(fields)
+
+    def load(self, records, defer_listeners=False):
+        with self._table.lock:
+            self._table.clear(max(1024, len(records)))
+            self._table.put_many(records)
+            self.next_id = max((record['id'] for record in records), default=0) + 1
+            # Bulk-build the sorted indexes instead of insort-ing one by one
+            for field, sorted_index in self._sorted.items():
+                sorted_index.build(sort_key(r, field) for r in records)
+            if defer_listeners:
+                self._defer_listeners()
+                return
+            self._cold = None
+            self._restored = []
+        for listener in self.listeners:
+            listener.clear()
+            for record in records:
+                listener.add(record)
+
+    def load_snapshot(self, path):
+        # Table and sorted indexes from a dump(); returns the dump's meta.
+        # Listeners without saved state are left for warm_listeners().
+        with self._table.lock:
+            meta, arrays = self._table.restore(path)
+            self.next_id = meta.pop('next_id', 1)
+            saved = meta.pop('listeners', {})
+            for field, sorted_index in self._sorted.items():
+                sorted_index.clear()
+                if field in arrays:
+                    sorted_index.base = arrays[field]
+                else:
+                    ids = self._table.ids().tolist()
+                    sorted_index.build(make_sort_key(self._table.value(i, field), i) for i in ids)
+            self._defer_listeners()
+            for listener in self.listeners:
+                name = getattr(listener, 'name', None)
+                if name in saved and hasattr(listener, 'restore'):
+                    prefix = f"{name}:"
+                    listener.restore(saved[name], {
+                        key[len(prefix):]: array for key, array in arrays.items() if key.startswith(prefix)
+                    })
+                    self._restored.append(listener)
+        return meta
+
+    def dump(self, path, meta=None):
+        # Binary snapshot of the table and the sorted indexes for load_snapshot()
+        with self._table.lock:
+            for sorted_index in self._sorted.values():
+                sorted_index.fold()
+            arrays = {field: sorted_index.base for field, sorted_index in self._sorted.items()}
+            saved = {}
+            for listener in self.listeners:
+                if hasattr(listener, 'snapshot') and self.is_warm(listener):
+                    saved[listener.name], listener_arrays = listener.snapshot()
+                    arrays.update((f"{listener.name}:{key}", array) for key, array in listener_arrays.items())
+            header, arrays = self._table.snapshot(dict(meta or {}, next_id=self.next_id, listeners=saved), arrays)
+        write_snapshot(path, header, arrays)
+
+    def _defer_listeners(self):
+        # Caller holds the table lock
+        self._cold = set(self._table.ids().tolist())
+        self._restored = []
+        for listener in self.listeners:
+            listener.clear()
+
+    def is_warm(self, listener):
+        # Whether the listener has seen every record
+        return self._cold is None or listener in self._restored
+
+    def _listeners_for(self, record_id):
+        # Caller holds the table lock
+        if self._cold is None or record_id not in self._cold:
+            return self.listeners
+        return self._restored
+
+    def warm_listeners(self, chunk_size=2000, progress=None):
+        # Feeds the listeners the records they have not seen, chunk_size
+        # records per hold of the table lock so writers can interleave.
+        # Meanwhile add()/remove() only notify listeners about records they
+        # have seen; the rest are picked up as they are when their chunk
+        # comes. A load() in between abandons the pass.
+        with self._table.lock:
+            cold = self._cold
+            if cold is None:
+                return
+            pending = sorted(cold)
+            listeners = [listener for listener in self.listeners if listener not in self._restored]
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            with self._table.lock:
+                if self._cold is not cold:
+                    return
+                for record in self._table.get_many(chunk):
+                    if record is not None:
+                        for listener in listeners:
+                            listener.add(record)
+                cold.difference_update(chunk)
+            if progress is not None:
+                progress(start + len(chunk), len(pending))
+        with self._table.lock:
+            if self._cold is cold:
+                self._cold = None
+
+    def get(self, record_id):
+        return self._table.get(record_id)
+
+    def add(self, record):
+        # Records without an id get the next one
+        with self._table.lock:
+            if record.get('id') is None:
+                record['id'] = self.next_id
+            self.next_id = max(self.next_id, record['id'] + 1)
+            previous = self._table.get(record['id'])
+            if previous is not None:
+                self._unindex(previous)
+            self._table.put(record)
+            for field, sorted_index in self._sorted.items():
+                sorted_index.add(sort_key(record, field))
+            for listener in self._listeners_for(record['id']):
+                listener.add(record)
+        return record
+
+    def add_many(self, records):
+        return [self.add(record) for record in records]
+
+    def remove(self, record_id):
+        with self._table.lock:
+            record = self._table.pop(record_id)
+            if record is not None:
+                self._unindex(record)
+        return record
+
+    def _unindex(self, record):
+        for field, sorted_index in self._sorted.items():
+            sorted_index.remove(sort_key(record, field))
+        for listener in self._listeners_for(record['id']):
+            listener.remove(record)
+
+    def count(self, field, value):
+        return int(np.count_nonzero(self._table.equals(field, value, index_key)))
+
+    def find(self, **filters):
+        if not filters:
+            return self.records()
+        with self._table.lock:
+            return self._table.get_many(sorted(self._table.ids()[self._matching(filters)].tolist()))
+
+    def _matching(self, filters, age_range=None):
+        # Boolean mask over table slots, or None when nothing is filtered
+        mask = None
+        for field, value in filters.items():
+            if field not in self.indexed_fields:
+                raise KeyError(field)
+            matches = self._table.equals(field, value, index_key)
+            mask = matches if mask is None else mask & matches
+        age_min, age_max = age_range or (None, None)
+        if age_min is not None or age_max is not None:
+            matches = self._table.between('age', age_min, age_max)
+            mask = matches if mask is None else mask & matches
+        return mask
+
+    def query(self, filters=None, age_range=None, sort='id', descending=False, after=None, limit=50):
+        # Keyset pagination: `after` is the sort key of the last record of the
+        # previous page, so fetching any page is a bisect plus `limit` steps
+        # rather than an offset scan. Returns (records, next_page_key).
+        # The table lock keeps the mask's slot positions valid meanwhile.
+        table = self._table
+        with table.lock:
+            mask = self._matching(filters or {}, age_range)
+            if mask is not None and np.count_nonzero(mask) * 8 < len(table):
+                # Selective filter: sorting the few matches beats walking the index
+                keys = sorted(make_sort_key(table.value(i, sort), i) for i in table.ids()[mask].tolist())
+                if descending:
+                    end = bisect_left(keys, after) if after is not None else len(keys)
+                    ids = (key[-1] for key in reversed(keys[:end]))
+                else:
+                    ids = (key[-1] for key in keys[bisect_right(keys, after) if after is not None else 0:])
+                mask = None
+            else:
+                ids = self._sorted[sort].walk(after, descending)
+
+            page = []
+            for record_id in ids:
+                if mask is None or mask[table.slot(record_id)]:
+                    page.append(record_id)
+                    if len(page) > limit:
+                        break
+
+            next_key = None
+            if len(page) > limit:
+                page = page[:limit]
+                next_key = make_sort_key(table.value(page[-1], sort), page[-1])
+            return table.get_many(page), next_key
+
+
+# ========== AGGREGATES ==========
+BREAKDOWN_FIELDS = ('status', 'danger_level', 'crime_type', 'crime_severity', 'gender', 'last_known_location')
+AGE_BUCKETS = ((0, 17, '<18'), (18, 24, '18-24'), (25, 34, '25-34'), (35, 49, '35-49'), (50, None, '50+'))
+RECIDIVISM_BINS = 10
+
+
+def age_bucket(age):
+    if age is None:
+        return 'unknown'
+    for low, high, label in AGE_BUCKETS:
+        if age >= low and (high is None or age <= high):
+            return label
+    return 'unknown'
+
+
+class CriminalStats:
+    # Store listener that keeps running counters, so /api/stats costs the same
+    # however many records there are. Keys use index_key() like the indexes.
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.total = 0
+        self.counts = {field: Counter() for field in BREAKDOWN_FIELDS}
+        self.age_buckets = Counter()
+        self.recidivism = [0] * RECIDIVISM_BINS
+
+    def add(self, record):
+        self._apply(record, 1)
+
+    def remove(self, record):
+        self._apply(record, -1)
+
+    def _apply(self, record, delta):
+        self.total += delta
+        for field, counter in self.counts.items():
+            self._bump(counter, index_key(record.get(field)) or 'unknown', delta)
+        self._bump(self.age_buckets, age_bucket(record.get('age')), delta)
+
+        score = record.get('recidivism_score')
+        if score is not None:
+            self.recidivism[min(int(score * RECIDIVISM_BINS), RECIDIVISM_BINS - 1)] += delta
+
+    @staticmethod
+    def _bump(counter, key, delta):
+        counter[key] += delta
+        if counter[key] <= 0:
+            del counter[key]
+
+    def count(self, field, value):
+        return self.counts[field].get(index_key(value), 0)
+
+    def breakdowns(self):
+        width = 1 / RECIDIVISM_BINS
+        return {
+            'by_status': dict(self.counts['status']),
+            'by_danger_level': dict(self.counts['danger_level']),
+            'by_crime_type': dict(self.counts['crime_type']),
+            'by_crime_severity': dict(self.counts['crime_severity']),
+            'by_gender': dict(self.counts['gender']),
+            'by_location': dict(self.counts['last_known_location']),
+            'by_age_bucket': dict(self.age_buckets),
+            'recidivism_histogram': {
+                f"{i * width:.1f}-{(i + 1) * width:.1f}": n for i, n in enumerate(self.recidivism)
+            }
+        }
@@ -0,0 +1,48 @@
+import os
+import sys
+import shutil
+import importlib
+import pytest
+
+# The modules live at the repository root rather than in a package
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+
+@pytest.fixture(scope='session')
+def api(tmp_path_factory):
+    # The app module, imported once in a scratch directory (like benchmark.py
+    # does) so its relative data files never touch the repo's own
+    workdir = tmp_path_factory.mktemp('app')
+    shutil.copy(os.path.join(REPO_DIR, 'gazetteer.csv'), workdir)
+    previous = os.getcwd()
+    os.chdir(workdir)
+    try:
+        app_module = importlib.import_module('app')
+        app_module.app.testing = True
+        app_module.load_data()
+        yield app_module
+    finally:
+        os.chdir(previous)
+
+
+@pytest.fixture
+def client(api):
+    return api.app.test_client()
+
+
+@pytest.fixture(scope='session')
+def auth(api):
+    with api.app.app_context():
+        token = api.sessions.issue({'username': 'tester', 'role': 'admin'})
+    return {'Authorization': f"Bearer {token}"}
+
+
+@pytest.fixture
+def add_criminal(client, auth):
+    # Adds a record through POST /api/criminals and returns its id
+    def add(**fields):
+        response = client.post('/api/criminals', data=fields, headers=auth)
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()['id']
+    return add
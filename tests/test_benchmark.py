@@ -0,0 +1,65 @@
+import json
+import argparse
+import cv2
+import numpy as np
+from benchmark import compare, measure, summarize, synthetic_face, synthetic_fingerprint, synthetic_records
+
+
+# ========== SYNTHETIC DATA ==========
+def test_records_are_seeded_and_shaped_like_the_snapshot():
+    records = synthetic_records(50, seed=7)
+    assert records == synthetic_records(50, seed=7)
+    assert records != synthetic_records(50, seed=8)
+    assert [record['id'] for record in records] == list(range(1, 51))
+    assert [record['created_at'] for record in records] == sorted(record['created_at'] for record in records)
+    for record in records:
+        assert record['status'] in ('Wanted', 'Arrested', 'Released')
+        assert record['danger_level'] in ('Low', 'Medium', 'High')
+        assert (record['latitude'] is None) == (record['longitude'] is None)
+    # Serializable as-is, the way generate() writes criminals.json
+    json.dumps(records)
+
+
+def test_probe_images_are_noisy_recaptures_of_the_same_subject():
+    face = cv2.imdecode(np.frombuffer(synthetic_face(3), np.uint8), cv2.IMREAD_COLOR)
+    assert face.shape == (160, 160, 3)
+    assert synthetic_face(3) == synthetic_face(3) != synthetic_face(4)
+    assert synthetic_fingerprint(3, noise=1) != synthetic_fingerprint(3)
+    ridges = cv2.imdecode(np.frombuffer(synthetic_fingerprint(3), np.uint8), cv2.IMREAD_GRAYSCALE)
+    assert ridges.shape == (300, 300)
+
+
+# ========== MEASUREMENT ==========
+def test_summary_reports_percentiles_and_throughput():
+    result = summarize([0.001 * n for n in range(1, 101)], wall=2.0, note='x')
+    assert result['count'] == 100 and result['note'] == 'x'
+    assert result['p50_ms'] == 50.5 and result['p99_ms'] == 99.01 and result['max_ms'] == 100.0
+    assert result['throughput_per_s'] == 50.0 and result['peak_rss_mb'] > 0
+    assert 'p50_ms' not in summarize([], wall=0)
+
+
+def test_measure_runs_warmup_calls_untimed():
+    calls = []
+    result = measure(calls.append, 5, warmup=2)
+    assert calls == [0, 1, 0, 1, 2, 3, 4]
+    assert result['count'] == 5 and result['p95_ms'] >= 0
+
+
+# ========== COMPARE ==========
+def test_compare_flags_p95_regressions(tmp_path, capsys):
+    def results(path, p95, seconds):
+        path.write_text(json.dumps({'runs': [{
+            'meta': {'records': 1000, 'commit': path.stem},
+            'store': {'get': {'p95_ms': p95}, 'broken': {'error': 'ImportError'}},
+            'predictors': {'train': {'seconds': seconds}}
+        }]}))
+        return str(path)
+
+    baseline = results(tmp_path / 'old.json', 1.0, 2.0)
+    candidate = results(tmp_path / 'new.json', 1.5, 1.0)
+    compare(argparse.Namespace(baseline=baseline, candidate=candidate, threshold=10))
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == '1000 records (old -> new)'
+    assert 'store.get' in lines[1] and '(+50.0%)' in lines[1] and lines[1].endswith('REGRESSION')
+    assert 'predictors.train' in lines[2] and '(-50.0%)' in lines[2] and 'REGRESSION' not in lines[2]
+    assert len(lines) == 3
@@ -0,0 +1,164 @@
+import threading
+import numpy as np
+import pytest
+from biometrics import (BIFURCATION, RIDGE_ENDING, FaceEmbedder, FaceIndex, FingerprintIndex, decode_template,
+                        encode_template, match_minutiae, normalize_rows, pair_keys)
+from storage import CriminalStore
+
+
+def unit_vectors(n, dim=16, seed=0):
+    return normalize_rows(np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32))
+
+
+# ========== FACE VECTOR INDEX ==========
+def test_face_index_returns_nearest_faces_best_first(tmp_path):
+    vectors = unit_vectors(50)
+    index = FaceIndex(str(tmp_path / 'faces'), 16)
+    for record_id, vector in enumerate(vectors, 1):
+        index.add(record_id, vector)
+
+    hits, = index.search(vectors[9], k=3)
+    assert hits[0][0] == 10
+    assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert [similarity for _, similarity in hits] == sorted((s for _, s in hits), reverse=True)
+    assert [hits[0] for hits in index.search(vectors[[3, 7]], k=1)] == [(4, pytest.approx(1.0, abs=1e-5)),
+                                                                        (8, pytest.approx(1.0, abs=1e-5))]
+
+
+def test_face_index_replaces_and_removes(tmp_path):
+    vectors = unit_vectors(3)
+    index = FaceIndex(str(tmp_path / 'faces'), 16)
+    index.add(1, vectors[0])
+    index.add(1, vectors[1])
+    index.add(2, vectors[2])
+    assert len(index) == 2 and index.count == 2
+    assert index.search(vectors[1], k=1)[0][0][0] == 1
+
+    index.remove(1)
+    assert 1 not in index
+    assert [record_id for record_id, _ in index.search(vectors[1], k=5)[0]] == [2]
+
+
+def test_face_index_is_shared_through_its_files(tmp_path):
+    # A second process sees the first one's writes after refresh()
+    vectors = unit_vectors(1500)
+    writer = FaceIndex(str(tmp_path / 'faces'), 16)
+    reader = FaceIndex(str(tmp_path / 'faces'), 16)
+    for record_id, vector in enumerate(vectors, 1):
+        writer.add(record_id, vector)
+    writer.remove(5)
+
+    assert len(reader) == 1499 and 5 not in reader
+    assert reader.search(vectors[1233], k=1)[0][0][0] == 1234
+    assert len(FaceIndex(str(tmp_path / 'faces'), 16)) == 1499
+
+
+def test_ivf_search_finds_exact_matches(tmp_path):
+    vectors = unit_vectors(2000, dim=32)
+    index = FaceIndex(str(tmp_path / 'faces'), 32, ann_threshold=10 ** 9, nprobe=4)
+    for record_id, vector in enumerate(vectors, 1):
+        index.add(record_id, vector)
+    index._build_ivf()
+    # Rows added after the build are scanned exactly
+    index.add(2001, unit_vectors(1, dim=32, seed=1)[0])
+
+    assert index.search(vectors[500], k=1)[0][0][0] == 501
+    assert index.search(unit_vectors(1, dim=32, seed=1), k=1)[0][0][0] == 2001
+
+
+def test_embedder_fallback_reidentifies_the_same_photo():
+    cv2 = pytest.importorskip('cv2')
+    rng = np.random.default_rng(0)
+    embedder = FaceEmbedder(None)
+    photos = [cv2.imencode('.png', rng.integers(0, 255, (64, 64, 3), dtype=np.uint8))[1].tobytes() for _ in range(2)]
+
+    vectors = embedder.embed_many(photos + photos[:1])
+    assert vectors.shape == (3, embedder.dim)
+    assert float(vectors[0] @ vectors[2]) == pytest.approx(1.0, abs=1e-5)
+    assert float(vectors[0] @ vectors[1]) < 0.5
+    with pytest.raises(ValueError):
+        embedder.embed(b'not an image')
+
+
+# ========== FINGERPRINT MINUTIAE ==========
+def random_minutiae(n=40, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(20, 380, (n, 2)), rng.integers(0, 180, n), rng.choice([RIDGE_ENDING, BIFURCATION], n)
+    ]).astype(np.int16)
+
+
+def postings_of(index, record_id):
+    return sum(list(postings).count(record_id) for postings in index._postings.values())
+
+
+def test_template_round_trips():
+    minutiae = random_minutiae()
+    assert np.array_equal(decode_template(encode_template(minutiae)), minutiae)
+
+
+def test_identical_prints_match_fully():
+    minutiae = random_minutiae()
+    assert match_minutiae(minutiae, minutiae) == pytest.approx(1.0)
+    assert match_minutiae(minutiae, random_minutiae(seed=1)) < 0.2
+
+
+def test_fingerprint_index_finds_the_enrolled_print():
+    index = FingerprintIndex(candidates=5)
+    for record_id in range(1, 21):
+        index.add({'id': record_id, 'fingerprint_template': encode_template(random_minutiae(seed=record_id))})
+    index.add({'id': 21, 'fingerprint_template': None})
+
+    assert len(index) == 20
+    (best, score), *_ = index.search(random_minutiae(seed=7), k=3)
+    assert best == 7 and score == pytest.approx(1.0)
+
+
+def test_reenrolling_replaces_the_postings():
+    index = FingerprintIndex()
+    old, new = random_minutiae(seed=1), random_minutiae(seed=2)
+    index.enroll(1, old)
+    posted = postings_of(index, 1)
+    index.enroll(1, old)
+    assert postings_of(index, 1) == posted
+
+    index.enroll(1, new)
+    assert postings_of(index, 1) == len(pair_keys(new))
+    assert all(score < 0.2 for _, score in index.search(old, k=1))
+
+
+def test_update_through_the_store_does_not_double_vote():
+    # The store tells listeners remove(old) then add(new) on a replace
+    index = FingerprintIndex()
+    store = CriminalStore(listeners=[index])
+    template = encode_template(random_minutiae(seed=3))
+    store.add({'id': 1, 'fingerprint_template': template, 'status': 'Wanted'})
+    store.add({'id': 1, 'fingerprint_template': template, 'status': 'Arrested'})
+    assert postings_of(index, 1) == len(pair_keys(random_minutiae(seed=3)))
+
+    store.remove(1)
+    assert index._postings == {} and len(index) == 0
+
+
+def test_search_runs_while_records_are_reenrolled():
+    index = FingerprintIndex()
+    templates = [random_minutiae(seed=seed) for seed in range(4)]
+    for record_id, minutiae in enumerate(templates):
+        index.enroll(record_id, minutiae)
+    stop = threading.Event()
+
+    def churn():
+        while not stop.is_set():
+            for record_id in range(1, 4):
+                index.remove({'id': record_id})
+                index.enroll(record_id, templates[record_id])
+
+    writer = threading.Thread(target=churn)
+    writer.start()
+    try:
+        for _ in range(200):
+            assert index.search(templates[0], k=1)[0][0] == 0
+    finally:
+        stop.set()
+        writer.join()
+    assert all(postings_of(index, record_id) == len(pair_keys(templates[record_id])) for record_id in range(4))
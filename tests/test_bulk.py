@@ -0,0 +1,87 @@
+import io
+import json
+import pandas as pd
+import pytest
+from bulk import EXPORT_FIELDS, parse_format, read_frames, validate_frame, write_chunks
+
+RECORDS = [
+    {'id': 1, 'name': 'Ann Lee', 'age': 34, 'gender': 'Female', 'crime_type': 'Fraud', 'crime_severity': 'High',
+     'prior_convictions': 2, 'status': 'Wanted', 'latitude': 19.07, 'longitude': 72.87,
+     'recidivism_score': 0.4, 'created_at': '2024-03-01T10:00:00'},
+    {'id': 2, 'name': 'Bo, "the Ox"', 'age': None, 'crime_severity': 'Low', 'prior_convictions': 0,
+     'status': 'Arrested', 'scars_marks': 'line one\nline two', 'created_at': '2024-03-02T10:00:00'}
+]
+
+
+def frame(**columns):
+    return pd.DataFrame(columns, dtype=object)
+
+
+# ========== FORMATS ==========
+def test_format_comes_from_the_argument_then_the_mimetype():
+    assert parse_format('NDJSON', 'text/csv') == 'ndjson'
+    assert parse_format(None, 'application/x-ndjson') == 'ndjson'
+    assert parse_format(None, 'application/json') == 'ndjson'
+    assert parse_format(None, 'multipart/form-data') == 'csv'
+    with pytest.raises(ValueError):
+        parse_format('xlsx')
+
+
+# ========== VALIDATION ==========
+def test_validation_rejects_bad_rows_with_their_numbers():
+    records, errors = validate_frame(frame(
+        name=['Ok', None, 'Old', 'Half', 'Mild', ' Spaced '],
+        age=['40', '30', '130', None, 'x', None],
+        latitude=[None, None, None, '10', None, None],
+        crime_severity=[None, None, None, None, None, 'low']
+    ), first_row=11)
+
+    assert errors == [
+        {'row': 12, 'error': 'name is required'},
+        {'row': 13, 'error': 'age must be a whole number 0-120'},
+        {'row': 14, 'error': 'latitude and longitude go together'},
+        {'row': 15, 'error': 'age must be a number'}
+    ]
+    assert [record['name'] for record in records] == ['Ok', 'Spaced']
+    ok, spaced = records
+    assert ok['age'] == 40 and spaced['age'] is None
+    assert (ok['crime_severity'], ok['status'], ok['prior_convictions']) == ('Medium', 'Wanted', 0)
+    assert spaced['crime_severity'] == 'Low'
+    assert 'id' not in ok
+
+
+# ========== ROUND TRIPS ==========
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson', 'parquet'])
+def test_exports_read_back_as_the_same_records(fmt):
+    if fmt == 'parquet':
+        pytest.importorskip('pyarrow')
+    data = b''.join(write_chunks([RECORDS[:1], [], RECORDS[1:]], fmt))
+    frames = list(read_frames(io.BytesIO(data), fmt, chunk_size=1))
+    assert len(frames) == 2
+
+    records = [record for i, chunk in enumerate(frames) for record in validate_frame(chunk, i + 1)[0]]
+    for original, imported in zip(RECORDS, records):
+        for field in EXPORT_FIELDS:
+            if field != 'id' and original.get(field) is not None:
+                assert imported[field] == original[field], field
+
+
+def test_empty_csv_export_still_has_a_header():
+    assert b''.join(write_chunks([], 'csv')).decode().strip() == ','.join(EXPORT_FIELDS)
+
+
+def test_import_and_export_routes(client, auth):
+    body = 'name,age,crime_type,status\nBulk One,25,Bulk Route,Wanted\n,30,Bulk Route,Wanted\nBulk Two,,Bulk Route,Arrested\n'
+    response = client.post('/api/criminals/import?format=csv', data=body, headers=auth)
+    summary = response.get_json()
+    assert response.status_code == 200
+    assert (summary['imported'], summary['rejected']) == (2, 1)
+    assert summary['errors'] == [{'row': 2, 'error': 'name is required'}]
+
+    response = client.get('/api/criminals/export?format=ndjson&crime_type=bulk route', headers=auth)
+    exported = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert response.mimetype == 'application/x-ndjson'
+    assert [record['name'] for record in exported] == ['Bulk One', 'Bulk Two']
+    assert exported[0]['age'] == 25 and exported[0]['danger_level'] is not None
+
+    assert client.post('/api/criminals/import?format=xlsx', data=body, headers=auth).status_code == 400
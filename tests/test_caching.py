@@ -0,0 +1,55 @@
+from caching import ResponseCache, make_etag
+
+
+# ========== RESPONSE CACHE ==========
+def test_etags_follow_every_part_of_the_key():
+    assert make_etag('list', b'limit=5', '3.10') == make_etag('list', b'limit=5', '3.10')
+    assert make_etag('list', b'limit=5', '3.10') != make_etag('list', b'limit=5', '3.11')
+    assert make_etag('list', b'limit=5', '3.10') != make_etag('list', b'limit=6', '3.10')
+
+
+def test_cache_evicts_least_recently_used_bytes():
+    cache = ResponseCache(max_bytes=40)
+    cache.put('a', b'x' * 10, {})
+    cache.put('b', b'x' * 10, {'X-Next-Cursor': 'c'})
+    cache.put('a', b'x' * 5, {})
+    assert cache.size == 15
+
+    cache.put('c', b'x' * 10, {})
+    cache.put('d', b'x' * 10, {})
+    assert cache.get('b') == (b'x' * 10, {'X-Next-Cursor': 'c'})
+    cache.put('e', b'x' * 10, {})
+    assert cache.get('a') is None and cache.get('c') is not None
+    assert len(cache) == 4 and cache.size == 40
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    # Bodies over a quarter of the budget are not kept
+    cache.put('big', b'x' * 11, {})
+    assert cache.get('big') is None
+    cache.clear()
+    assert len(cache) == 0 and cache.size == 0
+
+
+def test_conditional_get_until_the_data_changes(api, client, auth, add_criminal):
+    first = client.get('/api/stats', headers=auth)
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and 'no-cache' in first.headers['Cache-Control']
+
+    hits = api.response_cache.hits
+    again = client.get('/api/stats', headers=auth)
+    assert again.data == first.data and again.headers['ETag'] == etag
+    assert api.response_cache.hits == hits + 1
+    assert client.get('/api/stats', headers=dict(auth, **{'If-None-Match': etag})).status_code == 304
+
+    add_criminal(name='Invalidates')
+    changed = client.get('/api/stats', headers=dict(auth, **{'If-None-Match': etag}))
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+
+
+def test_cached_pages_keep_their_cursor_header(client, auth, add_criminal):
+    add_criminal(name='Paged one')
+    add_criminal(name='Paged two')
+    first = client.get('/api/criminals?limit=1', headers=auth)
+    cached = client.get('/api/criminals?limit=1', headers=auth)
+    assert first.headers['X-Next-Cursor'] and cached.headers['X-Next-Cursor'] == first.headers['X-Next-Cursor']
+    assert client.get('/api/criminals/999999', headers=auth).status_code == 404
@@ -0,0 +1,101 @@
+import os
+import json
+import time
+import pytest
+from changes import ChangeBus, StaleVersion
+from storage import CriminalStore, LogStorage
+
+
+def sse_events(chunk):
+    # (event, data) pairs of one SSE write; comments and retry: are skipped
+    events = []
+    for block in chunk.decode().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+# ========== CHANGE BUS ==========
+def test_since_returns_the_changes_after_a_version():
+    bus = ChangeBus(capacity=3)
+    start = bus.version
+    bus.publish('put', 1, {'id': 1})
+    bus.publish_many([('put', 2, {'id': 2}), ('delete', 1, None)])
+
+    events = bus.since(start)
+    assert [(event['op'], event['id']) for event in events] == [('put', 1), ('put', 2), ('delete', 1)]
+    assert bus.since(events[0]['version'], 1) == events[1:2]
+    assert bus.since(bus.version) == [] and bus.published == 3
+
+    # Fallen out of the buffer, from another stream, or from the future
+    bus.publish('put', 3, {'id': 3})
+    for version in (start, 'other-1', f"{bus.stream}-99"):
+        with pytest.raises(StaleVersion):
+            bus.since(version)
+    current = bus.version
+    bus.reset()
+    with pytest.raises(StaleVersion):
+        bus.since(current)
+
+
+def test_wait_times_out_when_nothing_happens():
+    bus = ChangeBus()
+    started = time.monotonic()
+    assert bus.wait(bus.version, 0.05) == []
+    assert time.monotonic() - started >= 0.05
+    assert bus.subscribe(1) and not bus.subscribe(1)
+    bus.unsubscribe()
+    assert bus.subscribers == 0
+
+
+# ========== CHANGE ROUTES ==========
+def test_json_feed_pages_through_changes(client, auth, add_criminal):
+    version = client.get('/api/criminals?limit=1', headers=auth).headers['X-Change-Version']
+    first = add_criminal(name='Feed one')
+    add_criminal(name='Feed two')
+    client.delete(f"/api/criminals/{first}", headers=auth)
+
+    body = client.get(f"/api/changes?since={version}&limit=2&fields=id,name", headers=auth).get_json()
+    assert [(change['op'], change['criminal']) for change in body['changes']] == [
+        ('put', {'id': first, 'name': 'Feed one'}), ('put', {'id': first + 1, 'name': 'Feed two'})
+    ]
+    body = client.get(f"/api/changes?since={body['version']}", headers=auth).get_json()
+    assert [(change['op'], change['id']) for change in body['changes']] == [('delete', first)]
+    assert 'criminal' not in body['changes'][0]
+    assert client.get('/api/changes?since=stale-1', headers=auth).status_code == 410
+
+
+def test_streams_unsubscribe_when_closed(api, client, auth):
+    headers = dict(auth, Accept='text/event-stream')
+    subscribers = api.changes.subscribers
+    # Closed before the first write, so the generator never starts
+    client.get('/api/changes', headers=headers, buffered=False).close()
+    assert api.changes.subscribers == subscribers
+
+    response = client.get('/api/changes', headers=headers, buffered=False)
+    assert next(response.iter_encoded()).startswith(b'retry: ')
+    assert api.changes.subscribers == subscribers + 1
+    response.close()
+    assert api.changes.subscribers == subscribers
+
+
+def test_streams_pick_up_other_workers_changes(api, client, auth, monkeypatch):
+    # A second LogStorage over the app's files stands in for another worker
+    monkeypatch.setattr(api.Config, 'CHANGES_POLL_INTERVAL', 0.05)
+    monkeypatch.setattr(api.Config, 'CHANGES_STREAM_SECONDS', 5)
+    other_store = CriminalStore()
+    other = LogStorage(os.path.abspath(api.storage.path), other_store, fsync=False)
+    other.load()
+
+    response = client.get('/api/changes', headers=dict(auth, Accept='text/event-stream'), buffered=False)
+    chunks = response.iter_encoded()
+    try:
+        next(chunks)
+        with other.transaction():
+            record = other_store.add({'name': 'Other worker'})
+            other.put(record)
+        (event, data), = sse_events(next(chunks))
+        assert event == 'put' and data['id'] == record['id'] and data['criminal']['name'] == 'Other worker'
+    finally:
+        response.close()
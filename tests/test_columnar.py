@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+from columnar import ColumnTable, read_snapshot, snapshot_meta, write_snapshot
+from storage import CriminalStore
+
+COLUMNS = {
+    'id': 'int', 'age': 'int', 'score': 'float', 'created_at': 'time',
+    'status': 'category', 'models': 'tags', 'name': 'text'
+}
+
+RECORDS = [
+    {'id': 1, 'age': 30, 'score': 0.5, 'created_at': '2024-01-02T03:04:05', 'status': 'Wanted',
+     'models': ['Decision Tree'], 'name': 'Ann'},
+    {'id': 2, 'age': None, 'score': None, 'created_at': '2024-01-02T03:04:05.123456', 'status': None,
+     'models': None, 'name': None},
+    # Values that do not fit their column, a missing field and an unknown one
+    {'id': 5, 'age': '41', 'score': 2, 'created_at': '2024-01-02T03:04:05+05:30', 'status': 7,
+     'models': ['ok', 3], 'name': 'Nul\x00byte', 'nickname': 'Five'},
+    {'id': 9, 'status': 'Arrested', 'name': 'José'}
+]
+
+
+def table_of(records=RECORDS):
+    table = ColumnTable(COLUMNS, capacity=2)
+    table.put_many([dict(record) for record in records])
+    return table
+
+
+# ========== COLUMNAR RECORD TABLE ==========
+def test_records_come_back_exactly_as_put():
+    table = table_of()
+    assert table.rows() == RECORDS
+    assert table.get_many([9, 3, 1]) == [RECORDS[3], None, RECORDS[0]]
+    assert table.value(5, 'age') == '41' and table.value(2, 'created_at') == '2024-01-02T03:04:05.123456'
+    assert table.value(9, 'age') is None and table.value(4, 'age') is None
+    assert len(table) == 4 and 5 in table and 4 not in table
+
+    # One at a time takes the per-value path
+    single = ColumnTable(COLUMNS)
+    for record in RECORDS:
+        single.put(dict(record))
+    assert single.rows() == RECORDS
+
+
+def test_replace_and_pop_keep_the_slots_dense():
+    table = table_of()
+    table.put({'id': 1, 'age': 31, 'status': 'Released'})
+    assert table.get(1) == {'id': 1, 'age': 31, 'status': 'Released'}
+
+    assert table.pop(1) == {'id': 1, 'age': 31, 'status': 'Released'}
+    assert table.pop(1) is None
+    assert sorted(table.ids().tolist()) == [2, 5, 9]
+    assert table.get(9) == RECORDS[3] and table.get(5) == RECORDS[2]
+    with pytest.raises(ValueError):
+        table.put({'id': -1})
+
+
+def test_vectorized_column_access():
+    table = table_of()
+    ages = dict(zip(table.ids().tolist(), table.numbers('age').tolist()))
+    assert ages[1] == 30 and np.isnan(ages[2]) and np.isnan(ages[5])
+    assert table.between('age', 20, 40).sum() == 1
+    assert table.equals('status', 'wanted', normalize=lambda v: v and v.lower()).sum() == 1
+    assert table.equals('status', None).sum() == 2
+    assert table.value_counts('status') == {'Wanted': 1, 'Arrested': 1, None: 2}
+    assert table.project(['id', 'nickname', 'missing']) == [
+        {'id': 1, 'nickname': None, 'missing': None}, {'id': 2, 'nickname': None, 'missing': None},
+        {'id': 5, 'nickname': 'Five', 'missing': None}, {'id': 9, 'nickname': None, 'missing': None}
+    ]
+
+
+# ========== BINARY SNAPSHOTS ==========
+def test_snapshot_round_trips_with_meta_and_arrays(tmp_path):
+    path = str(tmp_path / 'table.bin')
+    header, arrays = table_of().snapshot({'generation': 3}, {'extra': np.arange(5)})
+    write_snapshot(path, header, arrays)
+    assert snapshot_meta(path) == {'generation': 3}
+
+    restored = ColumnTable(COLUMNS)
+    meta, extra = restored.restore(path)
+    assert meta == {'generation': 3} and extra['extra'].tolist() == [0, 1, 2, 3, 4]
+    assert restored.rows() == RECORDS
+    # Memory-mapped columns are copy-on-write: changes stay in this table
+    restored.put({'id': 1, 'age': 99})
+    again = ColumnTable(COLUMNS)
+    again.restore(path)
+    assert again.value(1, 'age') == 30 and restored.value(1, 'age') == 99
+
+
+def test_text_without_nul_bytes_is_stored_as_an_array(tmp_path):
+    path = str(tmp_path / 'table.bin')
+    write_snapshot(path, *table_of(RECORDS[:2] + RECORDS[3:]).snapshot())
+    header, arrays = read_snapshot(path)
+    assert header['text'] == {} and 'nulls:name' in arrays
+    restored = ColumnTable(COLUMNS)
+    restored.restore(path)
+    assert restored.rows() == RECORDS[:2] + RECORDS[3:]
+
+
+def test_restore_checks_the_schema(tmp_path):
+    path = str(tmp_path / 'table.bin')
+    write_snapshot(path, *ColumnTable(COLUMNS).snapshot())
+    empty = ColumnTable(COLUMNS)
+    empty.restore(path)
+    assert len(empty) == 0
+    with pytest.raises(ValueError):
+        ColumnTable({'id': 'int'}).restore(path)
+
+
+def test_store_snapshot_restores_indexes(tmp_path):
+    path = str(tmp_path / 'criminals.bin')
+    store = CriminalStore()
+    store.load([{'id': i, 'name': f"Person {i}", 'status': ('Wanted', 'Arrested')[i % 2], 'age': 20 + i}
+                for i in range(1, 11)])
+    store.dump(path, {'generation': 1})
+
+    restored = CriminalStore()
+    restored.load_snapshot(path)
+    assert restored.records() == store.records()
+    assert restored.count('status', 'arrested') == 5
+    page, _ = restored.query(sort='age', descending=True, limit=3)
+    assert [record['id'] for record in page] == [10, 9, 8]
+    assert restored.add({'name': 'Next'})['id'] == 11
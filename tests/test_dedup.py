@@ -0,0 +1,116 @@
+import os
+import json
+from concurrent.futures import Future
+import pytest
+from dedup import DEDUP_FIELDS, find_duplicates, height_cm, name_key, prepare, run_dedup, score_pair, soundex
+from storage import JobStore
+
+
+def person(record_id, name, **fields):
+    return dict({'id': record_id, 'name': name, 'age': 30, 'gender': 'Male', 'height': 175, 'weight': 70,
+                 'eye_color': 'Brown', 'hair_color': 'Black', 'crime_type': 'Theft'}, **fields)
+
+
+# ========== ATTRIBUTES ==========
+def test_names_are_keyed_by_sound_in_any_order():
+    assert soundex('robert') == soundex('rupert') == 'R163'
+    assert soundex('tymczak') == 'T522' and soundex('') == ''
+    assert name_key('smith john') == name_key('jon smyth')
+    assert prepare({'id': 1, 'name': 'Unknown Person'})['name'] is None
+
+
+def test_heights_are_read_in_any_unit():
+    assert height_cm(1.75) == pytest.approx(175)
+    assert height_cm(5.75) == pytest.approx(175.26)
+    assert height_cm(175) == 175 and height_cm(None) is None and height_cm(True) is None
+
+
+def test_pairs_need_matching_gender_and_enough_evidence():
+    a, b = prepare(person(1, 'John Smith')), prepare(person(2, 'Jon Smith'))
+    score, evidence = score_pair(a, b)
+    assert 0.9 < score < 1 and evidence['age'] == 1.0 and evidence['name'] == pytest.approx(0.9)
+    assert score_pair(a, prepare(person(2, 'John Smith', gender='Female'))) == (0.0, {})
+    # Matching eye and hair colour alone are too little to go on
+    sparse = [prepare({'id': record_id, 'eye_color': 'Brown', 'hair_color': 'Black'}) for record_id in (1, 2)]
+    assert score_pair(*sparse)[0] == 0.0
+
+
+# ========== DUPLICATE SEARCH ==========
+def test_duplicates_are_found_and_linked_into_clusters():
+    records = [
+        person(1, 'John Smith'), person(2, 'Jon Smith'), person(3, 'Smith John'),
+        person(4, 'Priya Sharma', gender='Female', age=25, height=160, weight=55),
+        # The same photo, under a placeholder name
+        person(5, 'Unknown', age=60, weight=95, photo_hash='abc'),
+        person(6, 'Ravi', age=61, weight=95, photo_hash='abc')
+    ]
+    suggestions, stats = find_duplicates(records, threshold=0.8)
+    pairs = {tuple(suggestion['ids']): suggestion for suggestion in suggestions}
+    assert set(pairs) == {(1, 2), (1, 3), (2, 3), (5, 6)}
+    assert {suggestion['cluster'] for suggestion in suggestions} == {1, 5}
+    assert pairs[(1, 3)]['score'] == 1.0 and suggestions[0]['score'] >= suggestions[-1]['score']
+    assert stats['records'] == 6 and stats['suggestions'] == 4 and stats['clusters'] == 2
+
+
+def test_large_blocks_only_compare_neighbours():
+    records = [person(record_id, 'John Smith', age=20 + record_id * 3) for record_id in range(1, 9)]
+    everything, _ = find_duplicates(records, threshold=0.5)
+    windowed, _ = find_duplicates(records, threshold=0.5, max_block=4, window=1)
+    assert len(windowed) < len(everything)
+    assert {tuple(suggestion['ids']) for suggestion in windowed} >= {(i, i + 1) for i in range(1, 8)}
+
+
+def test_results_are_written_for_every_worker(tmp_path):
+    path = str(tmp_path / 'dedup.json')
+    stats = run_dedup([person(1, 'John Smith'), person(2, 'Jon Smith')], path, max_suggestions=1)
+    with open(path) as f:
+        results = json.load(f)
+    assert results['records'] == 2 and results['generated_at'] == stats['generated_at']
+    assert [suggestion['ids'] for suggestion in results['suggestions']] == [[1, 2]]
+
+
+def test_sample_repeats_are_flagged_with_low_confidence():
+    # Records 4 and 5 of the sample data are the same "Unknown" submission twice
+    with open(os.path.join(os.path.dirname(__file__), '..', 'criminals.json')) as f:
+        sample = json.load(f)['criminals']
+    records = [{field: record.get(field) for field in DEDUP_FIELDS} for record in sample]
+    suggestions, stats = find_duplicates(records, threshold=0.8)
+    assert [(suggestion['ids'], suggestion['kind']) for suggestion in suggestions] == [([4, 5], 'exact_repeat')]
+    assert suggestions[0]['score'] < 0.8 and stats['blocks']['repeat'] >= 1
+
+
+# ========== DEDUP ROUTES ==========
+def test_dedup_status_is_visible_to_every_worker(api, client, auth):
+    # Another worker process sees the same jobs file
+    other_worker = JobStore(api.dedup_jobs.path)
+    job_id = other_worker.create(status='running', records=2)
+    assert client.get(f'/api/dedup/{job_id}', headers=auth).get_json()['status'] == 'running'
+
+    future = Future()
+    future.set_result({'records': 2, 'suggestions': 1})
+    api.finish_dedup(job_id, future)
+    job = other_worker.get(job_id)
+    assert job['status'] == 'completed' and job['result']['suggestions'] == 1 and 'finished_at' in job
+    assert client.get('/api/dedup/unknown', headers=auth).status_code == 404
+    assert client.post('/api/dedup', json={'threshold': 2}, headers=auth).status_code == 400
+
+
+def test_suggestions_skip_deleted_records(api, client, auth, add_criminal):
+    first = add_criminal(name='Dup Candidate')
+    second = add_criminal(name='Dupe Candidate')
+    with open(api.Config.DEDUP_RESULTS_FILE, 'w') as f:
+        json.dump({'records': 3, 'generated_at': '2024-01-01T00:00:00', 'suggestions': [
+            {'ids': [first, second], 'score': 0.95, 'cluster': first, 'evidence': {}},
+            {'ids': [first, 999999], 'score': 0.9, 'cluster': first, 'evidence': {}},
+            {'ids': [second, first], 'score': 0.5, 'cluster': first, 'evidence': {}}
+        ]}, f)
+
+    body = client.get('/api/dedup/suggestions?min_score=0.8', headers=auth).get_json()
+    # total counts the run's pairs; the page holds only the live ones
+    assert body['total'] == 2 and not body['more'] and body['suggestions'][0]['ids'] == [first, second]
+    assert [record['name'] for record in body['suggestions'][0]['records']] == ['Dup Candidate', 'Dupe Candidate']
+    body = client.get('/api/dedup/suggestions?limit=-5', headers=auth).get_json()
+    assert [suggestion['ids'] for suggestion in body['suggestions']] == [[first, second]] and body['more']
+    body = client.get('/api/dedup/suggestions?offset=1', headers=auth).get_json()
+    assert [suggestion['ids'] for suggestion in body['suggestions']] == [[second, first]] and body['total'] == 3
+    assert client.get('/api/dedup/suggestions?limit=x', headers=auth).status_code == 400
@@ -0,0 +1,106 @@
+import pytest
+from geo import Gazetteer, GeoIndex, haversine_km, radius_bboxes
+
+# Either side of the antimeridian, about 21 km apart
+FIJI_EAST = (-17.0, 179.9)
+FIJI_WEST = (-17.0, -179.9)
+
+
+def place(record_id, lat, lon, **fields):
+    return dict({'id': record_id, 'latitude': lat, 'longitude': lon}, **fields)
+
+
+# ========== GEOMETRY ==========
+def test_haversine_wraps_around_the_antimeridian():
+    assert haversine_km(*FIJI_EAST, *FIJI_WEST) == pytest.approx(21.27, abs=0.01)
+    assert haversine_km(18.52, 73.86, 18.52, 73.86) == 0
+
+
+def test_radius_boxes_split_at_the_antimeridian():
+    (box,) = radius_bboxes(18.5, 73.8, 50)
+    assert box[0] < 18.5 < box[2] and box[1] < 73.8 < box[3]
+
+    east, west = radius_bboxes(*FIJI_EAST, 50)
+    assert east[1] < 179.9 and east[3] == 180.0
+    assert west[1] == -180.0 and -180.0 < west[3] < -179
+    east, west = radius_bboxes(*FIJI_WEST, 50)
+    assert 179 < east[1] < 180.0 and east[3] == 180.0
+    assert west[1] == -180.0 and west[3] > -179.9
+
+    # Reaching a pole covers every longitude
+    assert radius_bboxes(89.9, 10, 50) == [(pytest.approx(89.45, abs=0.01), -180.0, 90.0, 180.0)]
+
+
+# ========== SPATIAL INDEX ==========
+def test_radius_search_crosses_the_antimeridian():
+    index = GeoIndex(cell_degrees=0.1)
+    index.add(place(1, *FIJI_EAST))
+    index.add(place(2, *FIJI_WEST))
+    index.add(place(3, -17.0, 170.0))
+
+    for origin, near in ((FIJI_EAST, 1), (FIJI_WEST, 2)):
+        hits = index.within_radius(*origin, 50)
+        assert [record_id for record_id, _ in hits] == [near, 3 - near]
+        assert hits[1][1] == pytest.approx(21.27, abs=0.01)
+    assert [record_id for record_id, _ in index.within_radius(*FIJI_EAST, 10)] == [1]
+
+
+def test_bbox_search_and_removal():
+    index = GeoIndex(cell_degrees=1.0)
+    for record_id, (lat, lon) in enumerate([(10.5, 10.5), (10.2, 11.9), (12.5, 10.5), (10.0, 10.0)], 1):
+        index.add(place(record_id, lat, lon))
+    index.add({'id': 5, 'latitude': None, 'longitude': None})
+
+    assert index.within_bbox((10.0, 10.0, 11.0, 12.0)) == [1, 2, 4]
+    assert index.within_bbox((10.0, 10.0, 11.0, 12.0), limit=2) == [1, 2]
+    index.remove({'id': 2})
+    index.add(place(4, 50.0, 50.0))
+    assert index.within_bbox((10.0, 10.0, 11.0, 12.0)) == [1]
+    assert len(index) == 3
+
+
+def test_hotspots_merge_cells_and_wrapped_boxes():
+    index = GeoIndex(cell_degrees=0.1)
+    for record_id in range(1, 4):
+        index.add(place(record_id, FIJI_EAST[0], FIJI_EAST[1] - record_id / 100))
+    index.add(place(4, *FIJI_WEST))
+    index.add(place(5, 18.52, 73.86))
+
+    assert index.hotspots() == [
+        {'latitude': -17.0, 'longitude': 179.88, 'count': 3},
+        {'latitude': -17.0, 'longitude': -179.9, 'count': 1},
+        {'latitude': 18.52, 'longitude': 73.86, 'count': 1}
+    ]
+    spots = index.hotspots(radius_bboxes(*FIJI_WEST, 50))
+    assert [spot['count'] for spot in spots] == [3, 1]
+    # One-degree heatmap cells over the box east of the antimeridian
+    assert index.hotspots([(-20.0, 170.0, -10.0, 180.0)], cell_degrees=1.0) == [
+        {'latitude': -17.0, 'longitude': 179.88, 'count': 3}
+    ]
+    assert index.hotspots(limit=1)[0]['count'] == 3
+
+
+def test_records_without_coordinates_use_the_gazetteer(tmp_path):
+    path = tmp_path / 'places.csv'
+    path.write_text('name,latitude,longitude\nPune,18.52,73.86\nShivaji Nagar,18.53,73.85\n')
+    gazetteer = Gazetteer(str(path))
+    assert gazetteer.lookup(' pune ') == (18.52, 73.86)
+    assert gazetteer.lookup('Deccan, Pune') == (18.52, 73.86)
+    assert gazetteer.lookup('Shivaji Nagar, Pune') == (18.53, 73.85)
+    assert gazetteer.lookup('Atlantis') is None and len(Gazetteer(str(tmp_path / 'missing.csv'))) == 0
+
+    index = GeoIndex(gazetteer)
+    index.add({'id': 1, 'last_known_location': 'Pune'})
+    assert index.within_radius(18.52, 73.86, 1) == [(1, 0.0)]
+
+
+def test_nearby_route_wraps_the_antimeridian(client, auth, add_criminal):
+    east = add_criminal(name='Date line east', latitude=FIJI_EAST[0], longitude=FIJI_EAST[1])
+    west = add_criminal(name='Date line west', latitude=FIJI_WEST[0], longitude=FIJI_WEST[1])
+    body = client.get('/api/criminals/nearby?lat=-17&lon=179.95&radius_km=30', headers=auth).get_json()
+    assert [result['id'] for result in body['results']] == [east, west]
+
+    body = client.get('/api/criminals/nearby?lat=-17&lon=-179.95&radius_km=30&hotspots=1&cell=0.1',
+                      headers=auth).get_json()
+    assert sorted(spot['longitude'] for spot in body['hotspots']) == [-179.9, 179.9]
+    assert client.get('/api/criminals/nearby?lat=-17&lon=200&radius_km=30', headers=auth).status_code == 400
@@ -0,0 +1,73 @@
+import sys
+import time
+import builtins
+import threading
+import pytest
+from lazy import Warmup, lazy_import
+
+
+# ========== LAZY IMPORTS ==========
+def test_module_code_runs_on_first_attribute_access(tmp_path, monkeypatch):
+    (tmp_path / 'slow_dependency.py').write_text('import builtins\nbuiltins.slow_loaded = True\nVALUE = 42\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, 'slow_dependency', raising=False)
+    monkeypatch.setattr('builtins.slow_loaded', False, raising=False)
+
+    module = lazy_import('slow_dependency')
+    assert sys.modules['slow_dependency'] is module and lazy_import('slow_dependency') is module
+    assert builtins.slow_loaded is False
+    assert module.VALUE == 42 and builtins.slow_loaded is True
+
+
+def test_missing_modules_fail_at_import_time():
+    with pytest.raises(ModuleNotFoundError):
+        lazy_import('no_such_module_anywhere')
+    assert lazy_import('json') is sys.modules['json']
+
+
+# ========== WARM-UP ==========
+def test_everything_is_ready_until_the_warmup_begins():
+    warmup = Warmup()
+    warmup.add('data', lambda progress: None)
+    assert warmup.ready() and warmup.ready('data')
+    assert warmup.status()['steps']['data']['status'] == 'pending'
+
+
+def test_steps_run_in_order_and_report_progress():
+    gate = threading.Event()
+    order = []
+
+    def data(progress):
+        order.append('data')
+
+    def indexes(progress):
+        progress(1, 4)
+        gate.wait(5)
+        order.append('indexes')
+
+    def models(progress):
+        raise RuntimeError('no model files')
+
+    warmup = Warmup()
+    for name, warm in (('data', data), ('indexes', indexes), ('models', models)):
+        warmup.add(name, warm)
+    warmup.run('data')
+    warmup.start()
+    assert warmup.ready('data') and not warmup.ready('indexes') and not warmup.ready()
+    deadline = time.time() + 5
+    while warmup.status()['steps']['indexes']['progress'] != 0.25 and time.time() < deadline:
+        time.sleep(0.001)
+    assert warmup.status()['steps']['indexes'] == {'status': 'warming', 'progress': 0.25}
+
+    gate.set()
+    assert warmup.wait(5)
+    assert order == ['data', 'indexes']
+    status = warmup.status()
+    assert status['warm'] and status['steps']['indexes']['status'] == 'ready'
+    # A failed step counts as done and keeps its error
+    assert status['steps']['models'] == dict(status['steps']['models'], status='failed', error='no model files')
+
+
+def test_ready_route_reports_the_loaded_data(client):
+    body = client.get('/api/ready').get_json()
+    assert body['ready'] and body['warm'] and set(body['steps']) == {'data', 'indexes', 'faces', 'models'}
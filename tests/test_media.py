@@ -0,0 +1,124 @@
+import io
+import os
+import numpy as np
+import pytest
+from media import MediaStore, sniff_image
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def png_bytes(width=300, height=200, seed=0):
+    pixels = np.random.default_rng(seed).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class FailingStream:
+    # Breaks off after the first chunk, like a dropped upload
+    def __init__(self, data):
+        self.chunks = [data[:10]]
+
+    def read(self, size):
+        if not self.chunks:
+            raise IOError('connection reset')
+        return self.chunks.pop()
+
+
+def files_under(root):
+    return sorted(os.path.relpath(os.path.join(d, name), root) for d, _, names in os.walk(root) for name in names)
+
+
+# ========== CONTENT-ADDRESSED STORAGE ==========
+def test_sniff_image_reads_the_signature():
+    assert sniff_image(png_bytes()[:16]) == ('image/png', '.png')
+    assert sniff_image(b'\xff\xd8\xff\xe0rest') == ('image/jpeg', '.jpg')
+    assert sniff_image(b'RIFF\x00\x00\x00\x00WEBPVP8 ') == ('image/webp', '.webp')
+    assert sniff_image(b'not an image') == ('application/octet-stream', '')
+
+
+def test_identical_uploads_are_stored_once(tmp_path):
+    media = MediaStore(str(tmp_path), chunk_size=1024)
+    data = png_bytes()
+    digest, path = media.save(io.BytesIO(data))
+    again, same_path = media.save(io.BytesIO(data))
+
+    assert digest == again and path == same_path
+    assert path.endswith(os.path.join('originals', digest[:2], digest + '.png'))
+    assert files_under(tmp_path) == [os.path.relpath(path, tmp_path)]
+    with open(path, 'rb') as f:
+        assert f.read() == data
+    assert media.original_path(digest) == path
+
+
+def test_failed_upload_leaves_no_file(tmp_path):
+    media = MediaStore(str(tmp_path), chunk_size=10)
+    with pytest.raises(IOError):
+        media.save(FailingStream(png_bytes()))
+    assert files_under(tmp_path) == []
+
+
+def test_derivatives_are_rendered_once_per_content(tmp_path):
+    crops = []
+
+    def crop_face(image):
+        crops.append(image.shape)
+        return image[:50, :40]
+
+    media = MediaStore(str(tmp_path), thumbnail_sizes=(64, 128), crop_face=crop_face)
+    digest, _ = media.save(io.BytesIO(png_bytes()))
+    media.schedule_derivatives(digest).result()
+
+    for size in (64, 128):
+        with Image.open(media.derivative(digest, 'thumb', size)) as thumb:
+            assert max(thumb.size) == size and thumb.format == 'JPEG'
+    with Image.open(media.derivative(digest, 'face')) as face:
+        assert face.size == (40, 50)
+    assert crops == [(200, 300, 3)]
+    # Rendered on demand when nothing was scheduled
+    other, _ = media.save(io.BytesIO(png_bytes(seed=1)))
+    assert os.path.exists(media.derivative(other, 'thumb', 64))
+    assert media.derivative('0' * 64, 'thumb', 64) is None
+    with pytest.raises(ValueError):
+        media.derivative(digest, 'poster')
+
+
+# ========== PHOTO ROUTE ==========
+def test_photo_route_serves_cacheable_variants(api, client, auth):
+    data = png_bytes(seed=2)
+    response = client.post('/api/criminals', data={'name': 'Photographed', 'photo': (io.BytesIO(data), 'photo.png')},
+                           headers=auth, content_type='multipart/form-data')
+    photo_hash = api.criminals.get(response.get_json()['id'])['photo_hash']
+
+    original = client.get(f'/api/photos/{photo_hash}', headers=auth)
+    assert original.status_code == 200 and original.data == data
+    assert 'immutable' in original.headers['Cache-Control']
+    ranged = client.get(f'/api/photos/{photo_hash}', headers=dict(auth, Range='bytes=0-7'))
+    assert ranged.status_code == 206 and ranged.data == data[:8]
+    cached = client.get(f'/api/photos/{photo_hash}', headers=dict(auth, **{'If-None-Match': original.headers['ETag']}))
+    assert cached.status_code == 304
+
+    size = api.Config.THUMBNAIL_SIZES[0]
+    thumb = client.get(f'/api/photos/{photo_hash}?variant=thumb&size={size}', headers=auth)
+    assert thumb.status_code == 200 and thumb.mimetype == 'image/jpeg'
+    assert client.get(f'/api/photos/{photo_hash}?variant=thumb&size=7', headers=auth).status_code == 400
+    assert client.get(f'/api/photos/{"0" * 64}', headers=auth).status_code == 404
+    assert client.get('/api/photos/not-a-hash', headers=auth).status_code == 404
+
+
+def test_signed_photo_urls_load_without_a_token(api, client, auth, monkeypatch):
+    data = png_bytes(seed=3)
+    response = client.post('/api/criminals', data={'name': 'Signed', 'photo': (io.BytesIO(data), 'photo.png')},
+                           headers=auth, content_type='multipart/form-data')
+    criminal = client.get(f"/api/criminals/{response.get_json()['id']}", headers=auth).get_json()
+
+    # As an <img src>: no Authorization header
+    assert client.get(criminal['photo_url']).data == data
+    thumb = client.get(criminal['thumbnail_url'])
+    assert thumb.status_code == 200 and thumb.mimetype == 'image/jpeg'
+    # The signature covers the variant, and the URL expires
+    assert client.get(criminal['thumbnail_url'].replace('variant=thumb', 'variant=face')).status_code == 401
+    assert client.get(criminal['photo_url'].split('&sig=')[0] + '&sig=' + '0' * 32).status_code == 401
+    assert client.get(criminal['photo_url'].split('?')[0]).status_code == 401
+    monkeypatch.setattr(api.time, 'time', lambda: 10 ** 12)
+    assert client.get(criminal['photo_url']).status_code == 401
@@ -0,0 +1,116 @@
+import time
+import threading
+from metrics import Metrics, SamplingProfiler
+
+
+# ========== METRIC TYPES ==========
+def test_counters_and_gauges_render_per_label_set():
+    metrics = Metrics()
+    served = metrics.counter('served_total', 'Requests served', ('route', 'status'))
+    served.inc('/a', 200)
+    served.inc('/a', 200, amount=2)
+    served.inc('/b "quoted"\n', 500)
+    depth = metrics.gauge('depth', 'Queue depth')
+    depth.inc()
+    depth.dec(amount=3)
+
+    text = metrics.render()
+    assert '# TYPE served_total counter' in text
+    assert 'served_total{route="/a",status="200"} 3\n' in text
+    assert 'served_total{route="/b \\"quoted\\"\\n",status="500"} 1\n' in text
+    assert 'depth -2\n' in text
+    depth.set(1.5)
+    assert 'depth 1.5\n' in metrics.render()
+
+
+def test_histograms_render_cumulative_buckets():
+    metrics = Metrics()
+    latency = metrics.histogram('latency_seconds', 'Latency', ('route',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, '/a')
+
+    lines = [line for line in metrics.render().splitlines() if line.startswith('latency_seconds')]
+    assert lines == [
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1.0"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 3.65',
+        'latency_seconds_count{route="/a"} 4'
+    ]
+
+
+def test_snapshots_are_copies():
+    metrics = Metrics()
+    served = metrics.counter('served_total', 'Requests served', ('route',))
+    latency = metrics.histogram('latency_seconds', 'Latency', buckets=(0.1,))
+    served.inc('/a')
+    latency.observe(0.05)
+    counts, latency_before = served.snapshot(), latency.snapshot()
+    served.inc('/b')
+    latency.observe(0.5)
+    assert counts == {('/a',): 1}
+    assert latency_before == {(): ([1, 0], 0.05, 1)}
+    assert latency.snapshot() == {(): ([1, 1], 0.55, 2)}
+
+
+def test_timer_sections_and_collectors():
+    metrics = Metrics()
+    with metrics.timer('save_data'):
+        pass
+    metrics.collector(lambda: [('queue_depth', 'gauge', 'Jobs waiting', [({'kind': 'face'}, 4)])])
+    metrics.collector(lambda: 1 / 0)
+
+    text = metrics.render()
+    assert 'app_section_duration_seconds_count{section="save_data"} 1\n' in text
+    # A failing collector is skipped rather than breaking the scrape
+    assert 'queue_depth{kind="face"} 4\n' in text
+
+
+# ========== SAMPLING PROFILER ==========
+def busy_wait(stop):
+    while not stop.is_set():
+        sum(range(100))
+
+
+def test_profiler_samples_only_the_wanted_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_wait, args=(stop,))
+    worker.start()
+    profiler = SamplingProfiler(interval=0.001, threads=lambda: {worker.ident})
+    try:
+        profiler.start()
+        deadline = time.time() + 5
+        while profiler.samples < 20 and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        profiler.stop()
+        stop.set()
+        worker.join()
+
+    assert not profiler.running and profiler.samples >= 20
+    report = profiler.report()
+    assert report and all(';test_metrics.py:busy_wait' in line for line in report.splitlines())
+    assert len(profiler.report(limit=1).splitlines()) == 1
+    profiler.reset()
+    assert profiler.report() == '' and profiler.samples == 0
+
+
+# ========== ROUTES ==========
+def test_requests_show_up_on_the_metrics_endpoint(client, auth):
+    client.get('/api/stats', headers=auth)
+    response = client.get('/metrics')
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text = response.get_data(as_text=True)
+    assert 'http_requests_total{method="GET",route="/api/stats",status="200"}' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/stats"}' in text
+    assert 'http_requests_in_flight{route="/metrics"} 1' in text
+    assert 'criminal_records ' in text and 'profiler_running 0' in text
+
+
+def test_profiler_route_is_switched_by_admins(client, auth):
+    body = client.post('/api/profiler', json={'enabled': True, 'interval_ms': 2}, headers=auth).get_json()
+    assert body['running'] and body['interval_ms'] == 2
+    client.get('/api/stats', headers=auth)
+    body = client.post('/api/profiler', json={'enabled': False, 'reset': True}, headers=auth).get_json()
+    assert not body['running'] and body['samples'] == 0
+    assert client.get('/api/profiler', headers=auth).content_type.startswith('text/plain')
@@ -0,0 +1,102 @@
+import json
+from concurrent.futures import Future
+import numpy as np
+import pytest
+from predictors import (SimpleCriminalPredictor, SimpleCrimeTypePredictor, encode_features, load_model,
+                        recidivism_risk_batch, train_models)
+from storage import JobStore
+
+ROWS = [
+    {'age': 19, 'gender': 'Male', 'prior_convictions': 0, 'crime_severity': 'Low'},
+    {'age': 28, 'gender': 'Female', 'prior_convictions': 2, 'crime_severity': 'Medium'},
+    {'age': 45, 'prior_convictions': 5, 'crime_severity': 'High'},
+    {'age': 60, 'gender': 'Other', 'prior_convictions': 1, 'crime_severity': 'Low'},
+    {}
+]
+
+
+# ========== BATCH PREDICTION ==========
+def test_encode_features_applies_the_single_record_defaults():
+    X = encode_features([{}, {'age': '41', 'prior_convictions': '', 'gender': 'Female', 'crime_severity': 'High'}])
+    assert X.tolist() == [[30, 0, 0, 1], [41, 1, 0, 2]]
+    assert encode_features([]).shape == (0, 4)
+
+
+def test_batch_predictions_match_single_predictions():
+    X = encode_features(ROWS)
+    for predictor in (SimpleCriminalPredictor(), SimpleCrimeTypePredictor()):
+        assert predictor.predict_batch(X).tolist() == [predictor.predict(row) for row in ROWS]
+    assert recidivism_risk_batch(X).tolist() == ['Low', 'Medium', 'High', 'Low', 'Low']
+
+
+def test_batch_route_accepts_json_arrays_and_ndjson(client, auth):
+    rows = [dict(row, id=i) for i, row in enumerate(ROWS)]
+    response = client.post('/api/predict/batch', json=rows, headers=auth)
+    from_array = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert response.mimetype == 'application/x-ndjson'
+    assert [line['id'] for line in from_array] == list(range(len(ROWS)))
+    assert from_array[2] == {'id': 2, 'danger_level': 'High', 'predicted_crime_type': 'Fraud',
+                             'recidivism_risk': 'High'}
+
+    body = '\n'.join(json.dumps(row) for row in rows) + '\n\n'
+    response = client.post('/api/predict/batch', data=body, content_type='application/x-ndjson', headers=auth)
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == from_array
+
+
+def test_batch_route_rejects_bad_input(client, auth):
+    response = client.post('/api/predict/batch', json={'age': 30}, headers=auth)
+    assert response.status_code == 400
+    response = client.post('/api/predict/batch', data='{"age": 30}\nnot json\n', content_type='application/x-ndjson',
+                           headers=auth)
+    assert response.status_code == 400
+
+
+def test_large_batches_are_predicted_in_chunks(api, client, auth, monkeypatch):
+    monkeypatch.setattr(api, 'BATCH_CHUNK_SIZE', 3)
+    rows = [{'id': i, 'age': 20 + i, 'prior_convictions': i % 5} for i in range(10)]
+    response = client.post('/api/predict/batch', json=rows, headers=auth)
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['id'] for line in lines] == list(range(10))
+    assert np.array_equal([line['recidivism_risk'] for line in lines],
+                          recidivism_risk_batch(encode_features(rows)))
+
+
+# ========== MODEL TRAINING ==========
+def training_rows(n=40):
+    return [{'age': 18 + i, 'gender': ('Male', 'Female')[i % 2], 'prior_convictions': i % 6,
+             'crime_severity': ('Low', 'Medium', 'High')[i % 3], 'danger_level': ('Low', 'High')[i % 3 == 2],
+             'crime_type': ('Theft', 'Fraud')[i % 2]} for i in range(n)]
+
+
+def test_training_writes_loadable_versioned_models(tmp_path):
+    dt_path, nb_path = str(tmp_path / 'dt.pkl'), str(tmp_path / 'nb.pkl')
+    result = train_models(training_rows(), dt_path, nb_path)
+
+    assert result['training_data_size'] == 40
+    decision_tree = load_model(result['decision_tree']['path'])
+    assert decision_tree.version == result['version'] == load_model(dt_path).version
+    assert load_model(nb_path).predict(training_rows()[1]) == 'Fraud'
+    assert decision_tree.predict_batch(encode_features(training_rows(3))).tolist() == ['Low', 'Low', 'High']
+
+
+def test_training_needs_two_classes(tmp_path):
+    rows = [dict(row, danger_level='High') for row in training_rows()]
+    with pytest.raises(ValueError):
+        train_models(rows, str(tmp_path / 'dt.pkl'), str(tmp_path / 'nb.pkl'))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_training_status_is_visible_to_every_worker(api, client, auth):
+    # Another worker process sees the same jobs file
+    other_worker = JobStore(api.training_jobs.path)
+    job_id = other_worker.create(status='running', training_data_size=3)
+    response = client.get(f'/api/train-models/{job_id}', headers=auth)
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'running'
+
+    future = Future()
+    future.set_exception(ValueError('Need at least two danger_level classes'))
+    api.finish_training(job_id, future)
+    job = other_worker.get(job_id)
+    assert job['status'] == 'failed' and 'two danger_level' in job['error'] and 'finished_at' in job
+    assert client.get('/api/train-models/unknown', headers=auth).status_code == 404
@@ -0,0 +1,122 @@
+import io
+import time
+import threading
+import pytest
+from scan_jobs import QueueFull, ScanQueue, latency_summary
+from storage import JobStore
+
+
+class Handler:
+    # Records each batch; payloads that are Exceptions fail their own job,
+    # and an unset `gate` holds the worker inside the handler
+    def __init__(self):
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def __call__(self, payloads):
+        self.gate.wait(5)
+        self.batches.append(list(payloads))
+        return [payload if isinstance(payload, Exception) else payload * 2 for payload in payloads]
+
+
+# ========== SCAN QUEUE ==========
+def test_waiting_jobs_run_as_one_batch():
+    handler = Handler()
+    queue = ScanQueue({'face': handler}, workers=1, max_batch=4, batch_window=2)
+    job_ids = [queue.submit('face', n) for n in range(4)]
+
+    assert [queue.get(job_id, wait=5)['result'] for job_id in job_ids] == [0, 2, 4, 6]
+    assert handler.batches == [[0, 1, 2, 3]]
+    job = queue.get(job_ids[0])
+    assert job['status'] == 'completed' and job['batch_size'] == 4
+    assert job['total_ms'] >= job['queue_ms'] >= 0
+    stats = queue.stats()
+    assert (stats['submitted'], stats['completed'], stats['batches']) == (4, 4, 1)
+    assert stats['latency_ms']['total']['p50'] is not None
+
+
+def test_failures_stay_with_their_job():
+    def broken(payloads):
+        raise RuntimeError('model crashed')
+
+    queue = ScanQueue({'face': Handler(), 'fingerprint': broken}, workers=1, max_batch=8, batch_window=0)
+    bad = queue.submit('face', ValueError('unreadable image'))
+    good = queue.submit('face', 5)
+    crashed = queue.submit('fingerprint', 1)
+
+    assert queue.get(bad, wait=5) == dict(queue.get(bad), status='failed', error='unreadable image')
+    assert queue.get(good, wait=5)['result'] == 10
+    assert queue.get(crashed, wait=5)['error'] == 'model crashed'
+    with pytest.raises(ValueError):
+        queue.submit('iris', 1)
+
+
+def test_full_queue_pushes_back_with_retry_after():
+    handler = Handler()
+    handler.gate.clear()
+    queue = ScanQueue({'face': handler}, max_depth=2, workers=1, max_batch=1, batch_window=0)
+    running = queue.submit('face', 1)
+    while queue.get(running)['status'] != 'running':
+        time.sleep(0.001)
+    queued = [queue.submit('face', n) for n in (2, 3)]
+    assert [queue.get(job_id)['queue_position'] for job_id in queued] == [0, 1]
+
+    with pytest.raises(QueueFull) as full:
+        queue.submit('face', 4)
+    assert full.value.retry_after >= 1
+    assert queue.get(queued[1], wait=0.01)['status'] == 'queued'
+    handler.gate.set()
+    assert queue.get(queued[1], wait=5)['status'] == 'completed'
+    assert queue.stats()['rejected'] == 1
+
+
+def test_finished_jobs_expire():
+    queue = ScanQueue({'face': Handler()}, workers=1, batch_window=0, job_ttl=0)
+    job_id = queue.submit('face', 1)
+    assert queue.get(job_id, wait=5)['status'] == 'completed'
+    queue.submit('face', 2)
+    assert queue.get(job_id) is None
+
+
+def test_jobs_can_be_polled_on_another_worker(tmp_path):
+    # Two queues over one jobs file behave like two worker processes
+    path = str(tmp_path / 'scan_jobs.json')
+    handler = Handler()
+    handler.gate.clear()
+    starter = ScanQueue({'face': handler}, workers=1, batch_window=0, jobs=JobStore(path, fsync=False))
+    poller = ScanQueue({'face': Handler()}, jobs=JobStore(path, fsync=False), poll_interval=0.01)
+    job_id = starter.submit('face', 21)
+    assert poller.get(job_id)['status'] in ('queued', 'running')
+
+    handler.gate.set()
+    job = poller.get(job_id, wait=5)
+    assert job == dict(starter.get(job_id), status='completed', result=42)
+    assert poller.get('unknown', wait=0.05) is None
+
+
+def test_latency_summary_percentiles():
+    assert latency_summary([]) == {'p50': None, 'p95': None, 'p99': None}
+    assert latency_summary(list(range(100, 0, -1))) == {'p50': 51, 'p95': 96, 'p99': 100}
+
+
+# ========== SCAN ROUTES ==========
+def test_scan_routes_queue_and_report_jobs(client, auth):
+    response = client.post('/api/scan/fingerprint/jobs', data={'fingerprint': (io.BytesIO(b'not an image'), 'f.png')},
+                           headers=auth, content_type='multipart/form-data')
+    assert response.status_code == 202
+    assert response.headers['Location'] == f"/api/scan/jobs/{response.get_json()['job_id']}"
+
+    job = client.get(f"{response.headers['Location']}?wait=5", headers=auth).get_json()
+    assert job['status'] == 'failed' and job['kind'] == 'fingerprint'
+    assert client.post('/api/scan/fingerprint/jobs', headers=auth).status_code == 400
+    assert client.post('/api/scan/iris/jobs', headers=auth).status_code == 404
+    assert client.get('/api/scan/jobs/unknown', headers=auth).status_code == 404
+    assert client.get('/api/scan/jobs', headers=auth).get_json()['failed'] >= 1
+
+
+def test_scan_route_reports_other_workers_jobs(api, client, auth):
+    other_worker = JobStore(api.scan_queue.jobs.path)
+    job_id = other_worker.create(kind='face', status='completed', result={'total_matches': 0})
+    job = client.get(f'/api/scan/jobs/{job_id}?wait=5', headers=auth).get_json()
+    assert job == {'job_id': job_id, 'kind': 'face', 'status': 'completed', 'result': {'total_matches': 0}}
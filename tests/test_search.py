@@ -0,0 +1,94 @@
+import math
+import pytest
+from search import SearchIndex, edit_distance, tokenize, trigrams
+
+
+def indexed(*records):
+    index = SearchIndex()
+    for record in records:
+        index.add(record)
+    return index
+
+
+# ========== TOKENS ==========
+def test_tokenize_folds_case_and_accents():
+    assert tokenize("José O'Brien-SMITH") == ['jose', 'o', 'brien', 'smith']
+    assert tokenize(None) == []
+    assert trigrams('ab') == {'  a', ' ab', 'ab '}
+
+
+def test_edit_distance_counts_transpositions_and_stops_at_the_limit():
+    assert edit_distance('kitten', 'sitting', 3) == 3
+    assert edit_distance('johnson', 'jonhson', 2) == 1
+    assert edit_distance('abc', 'abcdef', 2) == 3
+    assert edit_distance('abcdef', 'uvwxyz', 2) == 3
+
+
+# ========== RANKING ==========
+def test_field_weights_and_tokens_add_up():
+    index = indexed(
+        {'id': 1, 'name': 'Mumbai Smith'},
+        {'id': 2, 'name': 'Raj', 'last_known_location': 'Mumbai'},
+        {'id': 3, 'name': 'Vik', 'crime_type': 'Mumbai fraud'},
+        {'id': 4, 'name': 'Raj Mumbai'}
+    )
+    ids, scores = index.search('mumbai')
+    assert ids[:2] == [1, 4] and ids[2:] == [2, 3]
+    assert scores[0] == scores[1] > scores[2] > scores[3]
+    # A second matching token adds to the score
+    assert index.search('raj mumbai')[0][0] == 4
+    assert index.search('nobody') == ([], [])
+
+
+def test_misspellings_match_below_the_exact_term():
+    index = indexed({'id': 1, 'name': 'Johnson'}, {'id': 2, 'name': 'Jonhson'}, {'id': 3, 'name': 'Jensen'})
+    ids, scores = index.search('johnson')
+    assert ids == [1, 2] and scores[0] > scores[1]
+    assert index.search('johnson', fuzzy=False)[0] == [1]
+
+
+def test_a_record_counts_its_best_expansion_once_per_token():
+    # Both spellings expand the token; record 1 holds both and scores the
+    # better of the two, the rarer misspelling, rather than their sum
+    index = indexed({'id': 1, 'name': 'Johnson Jonhson'}, {'id': 2, 'name': 'Johnson'})
+    ids, scores = index.search('johnson')
+    assert ids == [1, 2]
+    assert scores == pytest.approx([3 * math.log(3) * (1 - 1 / 7), 3 * math.log(2)])
+
+
+def test_limit_keeps_the_best_matches():
+    index = indexed(*[
+        {'id': i, 'name': 'Doe' if i in (4, 9) else f"Person {i}", 'crime_type': 'theft'} for i in range(1, 13)
+    ])
+    ids, scores = index.search('doe theft')
+    top_ids, top_scores = index.search('doe theft', limit=2)
+    assert top_ids == ids[:2] == [4, 9]
+    assert top_scores == scores[:2]
+
+
+def test_scoring_does_not_depend_on_id_range():
+    index = indexed({'id': 5, 'name': 'Rare'}, {'id': 10 ** 7, 'name': 'Rare'})
+    assert index.search('rare')[0] == [5, 10 ** 7]
+
+
+# ========== UPDATES ==========
+def test_removed_and_replaced_records_drop_their_old_terms():
+    index = indexed({'id': 1, 'name': 'Old Name'}, {'id': 2, 'name': 'Other'})
+    index.add({'id': 1, 'name': 'New Name'})
+    assert index.search('old', fuzzy=False)[0] == []
+    assert index.search('new')[0] == [1]
+
+    index.remove({'id': 2})
+    assert index.search('other')[0] == [] and len(index) == 1
+    index._purge()
+    assert sum(len(postings) for postings in index._postings) == 2
+    assert index.search('name')[0] == [1]
+
+
+def test_search_route_ranks_matches(client, auth, add_criminal):
+    best = add_criminal(name='Quillfeather Example', crime_type='Quillfeather forgery')
+    other = add_criminal(name='Someone Else', crime_type='Quillfeather forgery')
+    body = client.get('/api/criminals/search?q=quilfeather&limit=2', headers=auth).get_json()
+    assert [result['id'] for result in body['results']] == [best, other]
+    assert body['results'][0]['score'] > body['results'][1]['score']
+    assert client.get('/api/criminals/search?q=', headers=auth).status_code == 400
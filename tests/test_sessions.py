@@ -0,0 +1,88 @@
+import json
+import pytest
+from sessions import SessionCache, SessionManager
+
+USER = {'username': 'tester', 'role': 'admin', 'id': 7}
+
+
+@pytest.fixture
+def managers(api, tmp_path):
+    # Two workers sharing one revocation file
+    path = str(tmp_path / 'revoked.jsonl')
+    with api.app.app_context():
+        yield SessionManager(path), SessionManager(path)
+
+
+# ========== VERIFIED TOKEN CACHE ==========
+def test_cache_expires_entries_with_their_token():
+    cache = SessionCache()
+    cache.put('token', {'jti': 'a', 'exp': 100})
+    assert cache.get('token', 99) == {'jti': 'a', 'exp': 100}
+    assert cache.get('token', 100) is None
+    assert cache.get('other', 0) is None
+
+
+def test_cache_evicts_the_least_recently_used():
+    cache = SessionCache(maxsize=2)
+    cache.put('a', {'jti': 'a', 'exp': 100})
+    cache.put('b', {'jti': 'b', 'exp': 100})
+    cache.get('a', 0)
+    cache.put('c', {'jti': 'c', 'exp': 100})
+    assert len(cache) == 2
+    assert cache.get('b', 0) is None and cache.get('a', 0) is not None
+
+    cache.discard({'a', 'missing'})
+    assert cache.get('a', 0) is None and cache.get('c', 0) is not None
+
+
+# ========== SESSIONS ==========
+def test_tokens_carry_the_user_claims(managers):
+    sessions, _ = managers
+    claims = sessions.verify(sessions.issue(USER))
+    assert (claims['sub'], claims['role'], claims['user_id']) == ('tester', 'admin', 7)
+    assert sessions.verify('not.a.token') is None
+    assert len(sessions.cache) == 1
+
+
+def test_revocation_reaches_every_worker(managers):
+    revoking, other = managers
+    token, kept = revoking.issue(USER), revoking.issue(USER)
+    assert other.verify(token) is not None
+
+    revoking.revoke(revoking.verify(token))
+    assert revoking.verify(token) is None
+    # Cached in the other worker until it syncs
+    other.sync()
+    assert other.verify(token) is None
+    assert other.verify(kept) is not None
+
+
+def test_expired_revocations_are_compacted_away(api, tmp_path):
+    path = tmp_path / 'revoked.jsonl'
+    path.write_text(''.join(json.dumps({'jti': f"old-{n}", 'exp': 1}) + '\n' for n in range(5)))
+    with api.app.app_context():
+        reader = SessionManager(str(path))
+        reader.sync()
+        writer = SessionManager(str(path), compact_threshold=2)
+        token = writer.issue(USER)
+        claims = writer.verify(token)
+        writer.revoke(claims)
+        assert [json.loads(line)['jti'] for line in path.read_text().splitlines()] == [claims['jti']]
+
+        # The reader follows the rewritten file, and the appends after it
+        reader.sync()
+        assert reader.verify(token) is None
+        second = writer.issue(USER)
+        writer.revoke(writer.verify(second))
+        reader.sync()
+        assert reader.verify(second) is None and len(path.read_text().splitlines()) == 2
+
+
+def test_logout_revokes_the_session(api, client):
+    with api.app.app_context():
+        headers = {'Authorization': f"Bearer {api.sessions.issue(USER)}"}
+    assert client.get('/api/stats', headers=headers).status_code == 200
+    assert client.post('/api/logout', headers=headers).status_code == 200
+    assert client.get('/api/stats', headers=headers).status_code == 401
+    assert client.get('/api/stats').status_code == 401
+    assert client.get('/api/stats', headers={'Authorization': 'Bearer garbage'}).status_code == 401
@@ -0,0 +1,158 @@
+import pytest
+from flask import Flask
+from storage import CriminalStore, CriminalStats
+from sql_storage import SQLCriminalStore, configure_database
+
+
+class Recorder:
+    def __init__(self):
+        self.events = []
+
+    def clear(self):
+        self.events.append(('clear', None))
+
+    def add(self, record):
+        self.events.append(('add', record['id']))
+
+    def remove(self, record):
+        self.events.append(('remove', record['id']))
+
+
+def sql_worker(path, listeners=(), **options):
+    # A worker process: its own app and engine over the shared database file
+    class Settings:
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    app = Flask(__name__)
+    configure_database(app, Settings)
+    store = SQLCriminalStore(app, listeners=listeners, **options)
+    store.load()
+    return store
+
+
+def records(n=60):
+    return [{
+        'name': ('Dana', 'bob', 'Alice', 'carl')[i % 4] + f" {i % 9}",
+        'age': None if i % 11 == 0 else 18 + i % 40,
+        'gender': ('Male', 'Female')[i % 2],
+        'status': ('Wanted', 'arrested', 'Released')[i % 3],
+        'danger_level': ('High', 'Low', None)[i % 3],
+        'crime_type': f"type {i % 5}",
+        'last_known_location': ('Mumbai', 'Delhi')[i % 2],
+        'recidivism_score': (i % 10) / 10,
+        'created_at': f"2024-01-{1 + i % 28:02d}T00:00:00"
+    } for i in range(n)]
+
+
+def all_pages(store, limit, **options):
+    ids, after = [], None
+    while True:
+        page, after = store.query(after=after, limit=limit, **options)
+        ids.extend(record['id'] for record in page)
+        if after is None:
+            return ids
+
+
+@pytest.fixture
+def backends(tmp_path):
+    # The same records in the JSON store and the SQL store
+    json_stats, sql_stats = CriminalStats(), CriminalStats()
+    json_store = CriminalStore(listeners=[json_stats])
+    sql_store = sql_worker(tmp_path / 'criminals.db', listeners=[sql_stats])
+    for record in sql_store.add_many(records()):
+        json_store.add(dict(record))
+    json_store.remove(7)
+    sql_store.remove(7)
+    return (json_store, json_stats), (sql_store, sql_stats)
+
+
+# ========== BACKEND PARITY ==========
+@pytest.mark.parametrize('options', [
+    {},
+    {'sort': 'name'},
+    {'sort': 'age', 'descending': True},
+    {'sort': 'created_at'},
+    {'filters': {'status': 'ARRESTED'}, 'sort': 'age'},
+    {'filters': {'danger_level': 'low', 'crime_type': 'Type 1'}, 'age_range': (25, 50)}
+])
+def test_queries_and_cursors_match_the_json_store(backends, options):
+    (json_store, _), (sql_store, _) = backends
+    expected = all_pages(json_store, 1000, **options)
+    assert all_pages(sql_store, 1000, **options) == expected
+    assert all_pages(sql_store, 7, **options) == expected
+
+    _, json_after = json_store.query(limit=5, **options)
+    _, sql_after = sql_store.query(limit=5, **options)
+    assert sql_after == json_after
+
+
+def test_counts_and_stats_match_the_json_store(backends):
+    (json_store, json_stats), (sql_store, sql_stats) = backends
+    assert len(sql_store) == len(json_store) == 59
+    assert sql_store.count('status', 'Arrested') == json_store.count('status', 'arrested')
+    assert [r['id'] for r in sql_store.find(status='released')] == [r['id'] for r in json_store.find(status='Released')]
+    assert sql_stats.total == json_stats.total
+    assert sql_stats.breakdowns() == json_stats.breakdowns()
+
+
+# ========== CHANGE LOG ==========
+def test_workers_follow_each_others_writes(tmp_path):
+    path = tmp_path / 'criminals.db'
+    writer_stats, reader_stats = CriminalStats(), CriminalStats()
+    writer = sql_worker(path, listeners=[writer_stats])
+    reader = sql_worker(path, listeners=[reader_stats])
+    remote = []
+    reader.on_remote_change = remote.append
+    writer.on_remote_change = remote.append
+
+    first = writer.add({'name': 'First', 'status': 'Wanted'})
+    writer.add_many([{'name': 'Second', 'status': 'Arrested'}, {'name': 'Third', 'status': 'Wanted'}])
+    writer.remove(first['id'])
+    reader.sync()
+
+    assert [(entry['op'], entry.get('id') or entry['record']['name']) for entry in remote] == [
+        ('put', 'First'), ('put', 'Second'), ('put', 'Third'), ('delete', first['id'])
+    ]
+    assert reader_stats.breakdowns() == writer_stats.breakdowns()
+    assert reader_stats.count('status', 'Wanted') == 1
+    # The writer applied its own writes as they committed
+    writer.sync()
+    assert len(remote) == 4
+    assert reader.version == writer.version == '4'
+
+
+def test_changes_are_applied_once(tmp_path):
+    # Rows committed between load() reading the seq and scanning the table
+    # come back from the log; their puts are skipped, later deletes are not
+    path = tmp_path / 'criminals.db'
+    writer = sql_worker(path)
+    recorder = Recorder()
+    reader = sql_worker(path, listeners=[recorder])
+    kept = writer.add({'name': 'Kept'})
+    gone = writer.add({'name': 'Gone'})
+    reader.load()
+    reader._seen = 0
+    writer.remove(gone['id'])
+    reader.sync()
+    reader.sync()
+    assert recorder.events == [('clear', None), ('clear', None), ('add', kept['id']), ('add', gone['id']),
+                               ('remove', gone['id'])]
+    assert reader.version == '3'
+
+
+def test_a_pruned_log_reloads_the_listeners(tmp_path):
+    path = tmp_path / 'criminals.db'
+    writer = sql_worker(path, change_log_size=2)
+    recorder = Recorder()
+    reader = sql_worker(path, listeners=[recorder])
+    remote = []
+    reader.on_remote_change = remote.append
+    for name in 'abcd':
+        writer.add({'name': name})
+
+    reader.sync()
+    assert remote == [{'op': 'reload'}]
+    assert recorder.events[-5:] == [('clear', None), ('add', 1), ('add', 2), ('add', 3), ('add', 4)]
+    assert reader.version == '4'
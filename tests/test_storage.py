@@ -0,0 +1,428 @@
+import os
+import json
+import time
+from collections import Counter
+import pytest
+from storage import (LogStorage, CriminalStore, CriminalStats, JobStore, UserStore, BREAKDOWN_FIELDS, age_bucket, decode_cursor,
+                     encode_cursor, index_key, sort_key)
+
+
+def criminal(record_id, **fields):
+    return dict({'id': record_id, 'name': f"Person {record_id}", 'status': 'Wanted'}, **fields)
+
+
+def open_storage(path, **options):
+    store = CriminalStore()
+    storage = LogStorage(str(path), store, **options)
+    storage.load()
+    # Loading from JSON writes the binary snapshot in the background, and
+    # compaction is skipped while that holds the compaction lock
+    deadline = time.monotonic() + 5
+    while not os.path.exists(storage.binary_path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    with storage._compact_lock:
+        pass
+    return storage, store
+
+
+def log_entries(storage):
+    with open(storage.log_path) as f:
+        return [json.loads(line) for line in f]
+
+
+# ========== LOG STORAGE ==========
+def test_round_trip_replays_puts_and_deletes(tmp_path):
+    storage, store = open_storage(tmp_path / 'criminals.json', fsync=False)
+    for record_id in (1, 2, 3):
+        store.add(criminal(record_id))
+        storage.put(store.get(record_id))
+    store.remove(2)
+    storage.delete(2)
+    storage.put_many([store.add(criminal(4)), store.add(criminal(5))])
+
+    _, reloaded = open_storage(tmp_path / 'criminals.json', fsync=False)
+    assert reloaded.records() == store.records()
+    assert reloaded.next_id == 6
+
+
+def test_every_write_appends_to_the_log(tmp_path):
+    storage, store = open_storage(tmp_path / 'criminals.json', fsync=False)
+    storage.put(store.add(criminal(1)))
+    storage.delete(1)
+
+    header, put, delete = log_entries(storage)
+    assert header == {'op': 'generation', 'generation': 1}
+    assert put['op'] == 'put' and put['record']['id'] == 1
+    assert delete == {'op': 'delete', 'id': 1}
+    assert not os.path.exists(storage.path)
+
+
+def test_compaction_folds_the_log_into_a_snapshot(tmp_path):
+    storage, store = open_storage(tmp_path / 'criminals.json', fsync=False, compact_threshold=10 ** 6)
+    for record_id in range(1, 6):
+        storage.put(store.add(criminal(record_id)))
+    store.remove(3)
+    storage.delete(3)
+    storage.compact()
+
+    with open(storage.path) as f:
+        snapshot = json.load(f)
+    assert [record['id'] for record in snapshot['criminals']] == [1, 2, 4, 5]
+    assert snapshot['generation'] == 1
+    assert log_entries(storage) == [{'op': 'generation', 'generation': 2}]
+    assert not os.path.exists(storage.compacting_path)
+
+    storage.put(store.add(criminal(6)))
+    _, reloaded = open_storage(tmp_path / 'criminals.json', fsync=False)
+    assert [record['id'] for record in reloaded.records()] == [1, 2, 4, 5, 6]
+
+
+def test_compaction_starts_past_the_threshold(tmp_path):
+    storage, store = open_storage(tmp_path / 'criminals.json', fsync=False, compact_threshold=3)
+    for record_id in range(1, 4):
+        storage.put(store.add(criminal(record_id)))
+    storage._compactor.join()
+
+    assert os.path.exists(storage.path)
+    assert log_entries(storage) == [{'op': 'generation', 'generation': 2}]
+
+
+def test_unfinished_compaction_is_replayed_on_load(tmp_path):
+    # A crash after the log was rotated but before the snapshot was written
+    storage, store = open_storage(tmp_path / 'criminals.json', fsync=False)
+    storage.put(store.add(criminal(1)))
+    storage.put(store.add(criminal(2)))
+    os.replace(storage.log_path, storage.compacting_path)
+
+    _, reloaded = open_storage(tmp_path / 'criminals.json', fsync=False)
+    assert [record['id'] for record in reloaded.records()] == [1, 2]
+
+
+def test_torn_write_is_dropped_and_truncated(tmp_path):
+    storage, store = open_storage(tmp_path / 'criminals.json', fsync=False)
+    storage.put(store.add(criminal(1)))
+    with open(storage.log_path, 'a') as f:
+        f.write('{"op":"put","record":{"id":2,"na')
+
+    storage, reloaded = open_storage(tmp_path / 'criminals.json', fsync=False)
+    assert [record['id'] for record in reloaded.records()] == [1]
+    # New appends start on a clean line
+    storage.put(reloaded.add(criminal(2)))
+    _, again = open_storage(tmp_path / 'criminals.json', fsync=False)
+    assert [record['id'] for record in again.records()] == [1, 2]
+
+
+# ========== SHARED STATE ==========
+def test_workers_follow_each_others_writes(tmp_path):
+    # Two LogStorage instances over one file behave like two processes
+    path = tmp_path / 'criminals.json'
+    storage_a, store_a = open_storage(path, fsync=False)
+    storage_b, store_b = open_storage(path, fsync=False)
+    remote = []
+    storage_b.on_remote_change = remote.append
+
+    with storage_a.transaction():
+        storage_a.put(store_a.add({'name': 'From A'}))
+    # Ids are allocated after catching up, so they never collide
+    with storage_b.transaction():
+        assert store_b.add({'name': 'From B'})['id'] == 2
+        storage_b.put(store_b.get(2))
+    storage_a.sync()
+    with storage_a.transaction():
+        store_a.remove(1)
+        storage_a.delete(1)
+    storage_b.sync()
+
+    assert store_a.records() == store_b.records() == [store_b.get(2)]
+    assert [entry['op'] for entry in remote] == ['put', 'delete']
+    assert remote[0]['record']['name'] == 'From A'
+    assert storage_a.version == storage_b.version
+
+
+def test_worker_follows_the_log_across_a_rotation(tmp_path):
+    path = tmp_path / 'criminals.json'
+    storage_a, store_a = open_storage(path, fsync=False)
+    storage_b, store_b = open_storage(path, fsync=False)
+    remote = []
+    storage_b.on_remote_change = remote.append
+
+    storage_a.put(store_a.add(criminal(1)))
+    storage_a.compact()
+    storage_a.put(store_a.add(criminal(2)))
+    storage_b.sync()
+    assert [record['id'] for record in store_b.records()] == [1, 2]
+    assert [entry['op'] for entry in remote] == ['put', 'put']
+
+    # Two rotations behind: the skipped log is gone, so reload the snapshot
+    storage_a.compact()
+    storage_a.put(store_a.add(criminal(3)))
+    storage_a.compact()
+    storage_a.put(store_a.add(criminal(4)))
+    storage_b.sync()
+    assert remote[-1] == {'op': 'reload'}
+    assert store_b.records() == store_a.records()
+
+
+def test_users_are_shared_through_their_file(tmp_path):
+    path = str(tmp_path / 'users.json')
+    registering, logging_in = UserStore(path), UserStore(path)
+    assert len(logging_in) == 0
+    registering.add('alice', 'secret', role='admin')
+    logging_in.add('bob', 'hunter2')
+
+    assert 'bob' in registering and len(registering) == 2
+    assert logging_in.authenticate('alice', 'secret')['role'] == 'admin'
+    assert logging_in.authenticate('alice', 'wrong') is None
+    assert UserStore().authenticate('alice', 'secret') is None
+
+
+# ========== INDEXED RECORD STORE ==========
+class Recorder:
+    # Listener that remembers what it was told
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.events = []
+
+    def add(self, record):
+        self.events.append(('add', record['id']))
+
+    def remove(self, record):
+        self.events.append(('remove', record['id']))
+
+
+def test_store_assigns_ids_and_finds_by_indexed_fields():
+    store = CriminalStore()
+    first = store.add({'name': 'A', 'status': 'Wanted', 'crime_type': 'Fraud'})
+    store.add({'name': 'B', 'status': 'Arrested', 'crime_type': 'fraud '})
+    store.add({'name': 'C', 'status': 'wanted', 'crime_type': 'Theft'})
+
+    assert first['id'] == 1 and store.next_id == 4
+    assert [r['name'] for r in store.find(status='Wanted')] == ['A', 'C']
+    assert [r['name'] for r in store.find(status='WANTED', crime_type='theft')] == ['C']
+    assert store.count('crime_type', 'Fraud') == 2
+    assert store.find(status='Released') == []
+
+
+def test_store_reindexes_a_replaced_record():
+    recorder = Recorder()
+    store = CriminalStore(listeners=[recorder])
+    store.add(criminal(1, status='Wanted'))
+    store.add(criminal(1, status='Arrested'))
+
+    assert len(store) == 1
+    assert store.count('status', 'Wanted') == 0
+    assert store.count('status', 'Arrested') == 1
+    assert recorder.events == [('add', 1), ('remove', 1), ('add', 1)]
+
+
+def test_store_remove_updates_indexes_and_listeners():
+    recorder = Recorder()
+    store = CriminalStore(listeners=[recorder])
+    store.load([criminal(1), criminal(2)])
+    assert recorder.events == [('add', 1), ('add', 2)]
+
+    assert store.remove(1)['id'] == 1
+    assert store.remove(1) is None
+    assert 1 not in store and 2 in store
+    assert store.count('status', 'Wanted') == 1
+    assert recorder.events[-1] == ('remove', 1)
+    # Ids are never reused
+    assert store.add({'name': 'New'})['id'] == 3
+
+
+def test_sorted_index_survives_folding():
+    store = CriminalStore()
+    for sorted_index in store._sorted.values():
+        sorted_index.fold_threshold = 4
+    for record_id, age in enumerate([40, 20, 30, 20, 50, 10, 60], 1):
+        store.add(criminal(record_id, age=age))
+    store.remove(5)
+
+    page, _ = store.query(sort='age', limit=10)
+    assert [r['id'] for r in page] == [6, 2, 4, 3, 1, 7]
+
+
+# ========== KEYSET PAGINATION ==========
+def all_pages(store, limit, **options):
+    pages, after = [], None
+    while True:
+        page, after = store.query(after=after, limit=limit, **options)
+        pages.append([record['id'] for record in page])
+        if after is None:
+            return pages
+
+
+def test_paging_visits_every_record_once():
+    store = CriminalStore()
+    store.load([criminal(record_id) for record_id in range(1, 8)])
+
+    assert all_pages(store, 3) == [[1, 2, 3], [4, 5, 6], [7]]
+    # A last page that is exactly full has no next cursor
+    assert all_pages(store, 7) == [[1, 2, 3, 4, 5, 6, 7]]
+    assert all_pages(store, 100) == [[1, 2, 3, 4, 5, 6, 7]]
+
+
+def test_paging_breaks_ties_by_id_and_puts_missing_values_last():
+    store = CriminalStore()
+    ages = {1: 30, 2: None, 3: 20, 4: 30, 5: 30, 6: None, 7: 20}
+    store.load([criminal(record_id, age=age) for record_id, age in ages.items()])
+
+    assert all_pages(store, 2, sort='age') == [[3, 7], [1, 4], [5, 2], [6]]
+    assert all_pages(store, 2, sort='age', descending=True) == [[6, 2], [5, 4], [1, 7], [3]]
+
+
+def test_selective_filters_page_like_the_index_walk():
+    store = CriminalStore()
+    store.load([
+        criminal(record_id, age=record_id % 5, status='Arrested' if record_id % 10 == 0 else 'Wanted')
+        for record_id in range(1, 101)
+    ])
+    # 10 of 100 match: the matches are sorted directly instead of walked
+    pages = all_pages(store, 4, sort='age', filters={'status': 'arrested'})
+    assert pages == [[10, 20, 30, 40], [50, 60, 70, 80], [90, 100]]
+    pages = all_pages(store, 4, sort='age', descending=True, filters={'status': 'Arrested'})
+    assert pages == [[100, 90, 80, 70], [60, 50, 40, 30], [20, 10]]
+    assert all_pages(store, 50, age_range=(4, None), filters={'status': 'Wanted'}) == [
+        [record_id for record_id in range(1, 101) if record_id % 5 == 4]
+    ]
+
+
+def test_cursor_stays_valid_when_its_record_is_deleted():
+    store = CriminalStore()
+    store.load([criminal(record_id, name=name) for record_id, name in enumerate('dbeac', 1)])
+    page, after = store.query(sort='name', limit=2)
+    assert [r['name'] for r in page] == ['a', 'b']
+    store.remove(page[-1]['id'])
+
+    page, after = store.query(sort='name', after=after, limit=2)
+    assert [r['name'] for r in page] == ['c', 'd']
+
+
+def test_cursor_encoding_round_trips_and_rejects_garbage():
+    key = sort_key(criminal(7, name='Élan'), 'name')
+    assert decode_cursor(encode_cursor(key)) == (False, 'élan', 7)
+    for cursor in ('not-base64!', encode_cursor([1, 2]), ''):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+def test_list_route_pages_with_next_cursor(client, auth, add_criminal):
+    ids = [add_criminal(name=f"Pager {i}", crime_type='Paging') for i in range(5)]
+    seen, cursor = [], None
+    while True:
+        query = {'crime_type': 'paging', 'limit': 2, 'fields': 'id,name'}
+        if cursor:
+            query['cursor'] = cursor
+        response = client.get('/api/criminals', query_string=query, headers=auth)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert all(set(item) == {'id', 'name'} for item in page)
+        seen.extend(item['id'] for item in page)
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+    assert seen == ids
+
+    response = client.get('/api/criminals', query_string={'cursor': 'garbage'}, headers=auth)
+    assert response.status_code == 400
+    response = client.get('/api/criminals', query_string={'sort': 'photo_path'}, headers=auth)
+    assert response.status_code == 400
+
+
+def api_point(client, auth, criminal_id):
+    record = client.get(f"/api/criminals/{criminal_id}", headers=auth).get_json()
+    return record['latitude'], record['longitude']
+
+
+def test_search_and_nearby_project_like_the_list(client, auth, add_criminal):
+    criminal_id = add_criminal(name='Zephyrine Projection', last_known_location='Pune')
+    fields = {'fields': 'id,name,thumbnail_url,status'}
+    response = client.get('/api/criminals/search', query_string=dict(fields, q='zephyrine'), headers=auth)
+    result, = response.get_json()['results']
+    assert result == {'id': criminal_id, 'name': 'Zephyrine Projection', 'thumbnail_url': None,
+                      'status': 'Wanted', 'score': result['score']}
+
+    lat, lon = api_point(client, auth, criminal_id)
+    response = client.get('/api/criminals/nearby', headers=auth,
+                          query_string=dict(fields, lat=lat, lon=lon, radius_km=0.01, limit=500))
+    result = next(r for r in response.get_json()['results'] if r['id'] == criminal_id)
+    assert set(result) == {'id', 'name', 'thumbnail_url', 'status', 'latitude', 'longitude', 'distance_km'}
+
+
+# ========== AGGREGATES ==========
+def test_stats_follow_adds_replacements_and_removals():
+    stats = CriminalStats()
+    store = CriminalStore(listeners=[stats])
+    store.load([
+        criminal(1, status='Wanted', danger_level='High', age=17, recidivism_score=0.0),
+        criminal(2, status='wanted ', danger_level='Low', age=30, recidivism_score=1.0, gender='Male'),
+        criminal(3, status='Arrested', age=None, recidivism_score=0.45)
+    ])
+    assert stats.total == 3
+    assert stats.count('status', 'Wanted') == 2
+    assert stats.count('danger_level', 'high') == 1
+
+    store.add(criminal(2, status='Released', danger_level='Low', age=30, recidivism_score=1.0))
+    store.remove(3)
+    breakdowns = stats.breakdowns()
+    assert stats.total == 2
+    assert breakdowns['by_status'] == {'wanted': 1, 'released': 1}
+    assert breakdowns['by_gender'] == {'unknown': 2}
+    assert breakdowns['by_age_bucket'] == {'<18': 1, '25-34': 1}
+    assert breakdowns['recidivism_histogram']['0.0-0.1'] == 1
+    assert breakdowns['recidivism_histogram']['0.9-1.0'] == 1
+    assert sum(breakdowns['recidivism_histogram'].values()) == 2
+
+
+def test_stats_match_a_recount_of_the_records():
+    stats = CriminalStats()
+    store = CriminalStore(listeners=[stats])
+    for record_id in range(1, 201):
+        store.add(criminal(record_id, status=('Wanted', 'Arrested', 'Released')[record_id % 3],
+                           age=record_id % 70, crime_type=f"type {record_id % 7}"))
+    for record_id in range(1, 201, 4):
+        store.remove(record_id)
+
+    records = store.records()
+    assert stats.total == len(records)
+    for field in BREAKDOWN_FIELDS:
+        expected = Counter(index_key(record.get(field)) or 'unknown' for record in records)
+        assert stats.counts[field] == expected
+    assert stats.age_buckets == Counter(age_bucket(record.get('age')) for record in records)
+
+
+def test_stats_route_reports_the_counters(api, client, auth, add_criminal):
+    add_criminal(name='Counted', status='Arrested')
+    body = client.get('/api/stats', headers=auth).get_json()
+    assert body['total_criminals'] == len(api.criminals)
+    assert body['arrested'] == api.criminals.count('status', 'Arrested')
+    assert sum(body['breakdowns']['by_status'].values()) == body['total_criminals']
+
+
+# ========== BACKGROUND JOBS ==========
+def test_jobs_are_shared_through_their_file(tmp_path):
+    path = str(tmp_path / 'jobs.json')
+    starter, poller = JobStore(path), JobStore(path)
+    assert poller.get('missing') is None
+
+    job_id = starter.create(status='running', size=3)
+    assert poller.get(job_id) == {'status': 'running', 'size': 3}
+    poller.update(job_id, status='completed')
+    assert starter.get(job_id) == {'status': 'completed', 'size': 3}
+    assert JobStore(path).get(job_id)['status'] == 'completed'
+
+
+def test_job_updates_can_share_one_write(tmp_path):
+    jobs = JobStore(str(tmp_path / 'jobs.json'), fsync=False)
+    first, second = jobs.create(status='queued'), jobs.create(status='queued')
+    jobs.update_many({first: {'status': 'completed', 'result': 1}, second: {'status': 'failed'}})
+    reader = JobStore(jobs.path)
+    assert reader.get(first) == {'status': 'completed', 'result': 1} and reader.get(second) == {'status': 'failed'}
+
+
+def test_only_the_newest_jobs_are_kept(tmp_path):
+    jobs = JobStore(str(tmp_path / 'jobs.json'), max_jobs=3)
+    job_ids = [jobs.create(status='running') for _ in range(5)]
+    assert [jobs.get(job_id) is not None for job_id in job_ids] == [False, False, True, True, True]
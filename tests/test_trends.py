@@ -0,0 +1,116 @@
+from datetime import date, datetime, timedelta
+import numpy as np
+from trends import TrendRollups, bucket_labels, bucket_of
+
+START = datetime(2024, 3, 1)
+CRIME_TYPES = ('Theft', 'fraud', 'Fraud ', None)
+
+
+def records(n=200):
+    # Every 7 hours from START, cycling through the crime types
+    return [
+        {'id': i, 'crime_type': CRIME_TYPES[i % 4], 'crime_severity': 'High',
+         'created_at': (START + timedelta(hours=7 * i)).isoformat()}
+        for i in range(n)
+    ]
+
+
+def brute_force(rows, granularity, start, end):
+    counts = {}
+    for row in rows:
+        bucket = bucket_of(datetime.fromisoformat(row['created_at']), granularity)
+        if start <= bucket <= end:
+            value = (row['crime_type'] or 'unknown').strip().casefold()
+            counts.setdefault(value, [0] * (end - start + 1))[bucket - start] += 1
+    return counts
+
+
+def as_dict(values, matrix):
+    return {value: row.tolist() for value, row in zip(values, matrix) if row.any()}
+
+
+# ========== BUCKETS ==========
+def test_buckets_are_consecutive_and_labelled():
+    moment = datetime(2024, 12, 31, 23, 30)
+    assert bucket_of(moment + timedelta(hours=1), 'hour') == bucket_of(moment, 'hour') + 1
+    assert bucket_of(datetime(2025, 1, 1), 'month') == bucket_of(moment, 'month') + 1
+    month = bucket_of(moment, 'month')
+    assert bucket_labels(month, month + 1, 'month') == ['2024-12', '2025-01']
+    day = bucket_of(moment, 'day')
+    assert bucket_labels(day, day, 'day') == ['2024-12-31']
+    hour = bucket_of(moment, 'hour')
+    assert bucket_labels(hour, hour + 1, 'hour') == ['2024-12-31T23:00', '2025-01-01T00:00']
+
+
+# ========== ROLLUPS ==========
+def test_counts_match_a_scan_of_the_records():
+    rows = records()
+    # Folding after every few changes and never folding agree
+    for threshold in (1, 16, 10 ** 6):
+        rollups = TrendRollups(fold_threshold=threshold)
+        for row in rows:
+            rollups.add(row)
+        for row in rows[::3]:
+            rollups.remove(row)
+        kept = [row for i, row in enumerate(rows) if i % 3]
+        for granularity in ('hour', 'day', 'month'):
+            start = bucket_of(START, granularity) + 1
+            end = start + 20
+            expected = brute_force(kept, granularity, start, end)
+            assert as_dict(*rollups.counts('crime_type', granularity, start, end)) == expected
+
+
+def test_undated_records_are_counted_apart():
+    rollups = TrendRollups()
+    rollups.add({'id': 1, 'crime_type': 'Theft'})
+    rollups.add({'id': 2, 'crime_type': 'Theft', 'created_at': 'yesterday'})
+    assert rollups.undated == 2
+    rollups.remove({'id': 1, 'crime_type': 'Theft'})
+    assert rollups.undated == 1
+    assert rollups.counts('crime_type', 'day', 0, 10)[1].sum() == 0
+
+
+def test_snapshot_round_trip():
+    rollups = TrendRollups(fold_threshold=10 ** 6)
+    for row in records(50):
+        rollups.add(row)
+    meta, arrays = rollups.snapshot()
+
+    restored = TrendRollups()
+    restored.restore(meta, {name: np.array(array) for name, array in arrays.items()})
+    day = bucket_of(START, 'day')
+    values, matrix = restored.counts('severity', 'day', day, day + 30)
+    assert as_dict(values, matrix) == as_dict(*rollups.counts('severity', 'day', day, day + 30))
+    assert values == ['high'] and matrix.sum() == 50
+    restored.add(records(51)[-1])
+    assert restored.counts('severity', 'day', day, day + 30)[1].sum() == 51
+
+
+# ========== TRENDS ROUTE ==========
+def test_trends_route_counts_new_records(client, auth, add_criminal):
+    query = '/api/analytics/trends?values=Trendlinecrime,nothing&granularity=month'
+    before = client.get(query, headers=auth).get_json()
+    add_criminal(name='Trend one', crime_type='Trendlinecrime')
+    add_criminal(name='Trend two', crime_type='trendlinecrime ')
+    body = client.get(query, headers=auth).get_json()
+
+    assert len(body['buckets']) == 24 and body['buckets'][-1] == date.today().strftime('%Y-%m')
+    assert body['series']['trendlinecrime'][-1] == before['series']['trendlinecrime'][-1] + 2
+    assert body['series']['nothing'] == [0] * 24
+    assert body['total'][-1] >= 2
+
+    body = client.get('/api/analytics/trends?from=2024-01&to=2024-03&granularity=month&top=0',
+                      headers=auth).get_json()
+    assert body['buckets'] == ['2024-01', '2024-02', '2024-03'] and body['series'] == {}
+    assert client.get('/api/analytics/trends?dimension=shoe_size', headers=auth).status_code == 400
+    assert client.get('/api/analytics/trends?from=2024-03-02&to=2024-03-01', headers=auth).status_code == 400
+    assert client.get('/api/analytics/trends?granularity=hour&from=2000-01-01&to=2024-01-01',
+                      headers=auth).status_code == 400
+
+
+def test_month_only_bounds_cover_whole_months(client, auth):
+    body = client.get('/api/analytics/trends?from=2024-01&to=2024-02&granularity=day', headers=auth).get_json()
+    assert len(body['buckets']) == 60
+    assert body['buckets'][0] == '2024-01-01' and body['buckets'][-1] == '2024-02-29'
+    body = client.get('/api/analytics/trends?from=2024-12&to=2024-12&granularity=hour', headers=auth).get_json()
+    assert len(body['buckets']) == 31 * 24 and body['buckets'][-1] == '2024-12-31T23:00'
@@ -0,0 +1,181 @@
+import threading
+from collections import Counter
+from datetime import date, datetime
+import numpy as np
+from storage import index_key
+
+# Dimension name in the API -> record field
+DIMENSIONS = {
+    'crime_type': 'crime_type',
+    'severity': 'crime_severity',
+    'location': 'last_known_location',
+    'danger_level': 'danger_level'
+}
+GRANULARITIES = ('hour', 'day', 'month')
+
+
+def parse_time(value):
+    # created_at as a datetime, or None when missing or unreadable
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def bucket_of(moment, granularity):
+    # Consecutive integers per hour/day/month, in the record's wall-clock time
+    if granularity == 'hour':
+        return moment.toordinal() * 24 + moment.hour
+    if granularity == 'day':
+        return moment.toordinal()
+    return moment.year * 12 + moment.month - 1
+
+
+def bucket_labels(start, end, granularity):
+    if granularity == 'hour':
+        return [f"{date.fromordinal(b // 24).isoformat()}T{b % 24:02d}:00" for b in range(start, end + 1)]
+    if granularity == 'day':
+        return [date.fromordinal(b).isoformat() for b in range(start, end + 1)]
+    return [f"{b // 12:04d}-{b % 12 + 1:02d}" for b in range(start, end + 1)]
+
+
+class TrendRollups:
+    # Store listener that keeps record counts per (dimension value, time
+    # bucket) at every granularity, keyed on created_at, so trend queries
+    # cost the number of populated cells rather than the number of records.
+    # Each (granularity, dimension) rollup is a folded base of parallel
+    # numpy arrays (value code, bucket, count) sorted by bucket, plus a
+    # Counter of changes since the last fold. Writes fold once the Counter
+    # reaches half the base (at least fold_threshold cells), which keeps
+    # bulk loads linear; queries fold first when it is past fold_threshold,
+    # so they scan little in Python. snapshot()/restore() let the store persist the
+    # rollups in its binary snapshot, so they are not rebuilt on restart.
+    name = 'trends'
+
+    def __init__(self, fold_threshold=4096):
+        self.fold_threshold = fold_threshold
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.undated = 0
+            self.values = {dimension: [] for dimension in DIMENSIONS}
+            self._codes = {dimension: {} for dimension in DIMENSIONS}
+            self._base = {key: self._empty() for key in self._keys()}
+            self._delta = {key: Counter() for key in self._keys()}
+
+    @staticmethod
+    def _keys():
+        return [(granularity, dimension) for granularity in GRANULARITIES for dimension in DIMENSIONS]
+
+    @staticmethod
+    def _empty():
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    def add(self, record):
+        self._apply(record, 1)
+
+    def remove(self, record):
+        self._apply(record, -1)
+
+    def _apply(self, record, delta):
+        moment = parse_time(record.get('created_at'))
+        with self._lock:
+            if moment is None:
+                self.undated += delta
+                return
+            buckets = [(granularity, bucket_of(moment, granularity)) for granularity in GRANULARITIES]
+            for dimension, field in DIMENSIONS.items():
+                code = self._code(dimension, index_key(record.get(field)) or 'unknown')
+                for granularity, bucket in buckets:
+                    cells = self._delta[granularity, dimension]
+                    cells[code, bucket] += delta
+                    if len(cells) >= max(self.fold_threshold, len(self._base[granularity, dimension][0]) // 2):
+                        self._fold(granularity, dimension)
+
+    def _code(self, dimension, value):
+        codes = self._codes[dimension]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            self.values[dimension].append(value)
+        return code
+
+    def _fold(self, granularity, dimension):
+        # Caller holds the lock. Sums base and delta per cell, drops empty
+        # cells and re-sorts by bucket.
+        cells = self._delta[granularity, dimension]
+        if not cells:
+            return
+        codes, buckets, counts = self._base[granularity, dimension]
+        pending = np.array([(code, bucket, n) for (code, bucket), n in cells.items()], dtype=np.int64)
+        codes = np.concatenate([codes, pending[:, 0]])
+        buckets = np.concatenate([buckets, pending[:, 1]])
+        counts = np.concatenate([counts, pending[:, 2]])
+        order = np.lexsort((codes, buckets))
+        codes, buckets, counts = codes[order], buckets[order], counts[order]
+        starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (buckets[1:] != buckets[:-1])])
+        counts = np.add.reduceat(counts, starts)
+        codes, buckets = codes[starts], buckets[starts]
+        keep = counts != 0
+        self._base[granularity, dimension] = codes[keep].astype(np.int32), buckets[keep], counts[keep]
+        cells.clear()
+
+    def counts(self, dimension, granularity, start, end):
+        # (values, matrix) of counts per value over buckets start..end
+        # inclusive: matrix[i, j] is the records with values[i] in bucket
+        # start + j
+        with self._lock:
+            if len(self._delta[granularity, dimension]) > self.fold_threshold:
+                self._fold(granularity, dimension)
+            codes, buckets, counts = self._base[granularity, dimension]
+            lo, hi = np.searchsorted(buckets, [start, end + 1])
+            codes, buckets, counts = codes[lo:hi], buckets[lo:hi], counts[lo:hi]
+            pending = [
+                (code, bucket, n) for (code, bucket), n in self._delta[granularity, dimension].items()
+                if n and start <= bucket <= end
+            ]
+            values = list(self.values[dimension])
+        matrix = np.zeros((len(values), end - start + 1), dtype=np.int64)
+        np.add.at(matrix, (codes, buckets - start), counts)
+        if pending:
+            pending = np.array(pending, dtype=np.int64)
+            np.add.at(matrix, (pending[:, 0], pending[:, 1] - start), pending[:, 2])
+        return values, matrix
+
+    def _fold_all(self):
+        for granularity, dimension in self._keys():
+            self._fold(granularity, dimension)
+
+    def snapshot(self):
+        # (meta, {name: array}) for CriminalStore.dump()
+        with self._lock:
+            self._fold_all()
+            arrays = {}
+            for (granularity, dimension), (codes, buckets, counts) in self._base.items():
+                arrays.update({
+                    f"{granularity}:{dimension}:codes": codes,
+                    f"{granularity}:{dimension}:buckets": buckets,
+                    f"{granularity}:{dimension}:counts": counts
+                })
+            return {'undated': self.undated, 'values': {d: list(v) for d, v in self.values.items()}}, arrays
+
+    def restore(self, meta, arrays):
+        # Inverse of snapshot(); the arrays may be read-only memory maps, as
+        # folds always build new ones
+        with self._lock:
+            self.undated = meta['undated']
+            self.values = {dimension: list(meta['values'].get(dimension, [])) for dimension in DIMENSIONS}
+            self._codes = {d: {value: code for code, value in enumerate(v)} for d, v in self.values.items()}
+            self._base = {
+                (granularity, dimension): tuple(
+                    arrays[f"{granularity}:{dimension}:{part}"] for part in ('codes', 'buckets', 'counts')
+                )
+                for granularity, dimension in self._keys()
+            }
+            self._delta = {key: Counter() for key in self._keys()}